@@ -0,0 +1,365 @@
+"""Offline stand-in for the Ollama API, for benchmarking without a GPU
+
+Implements /api/generate and /api/chat (streaming and non-streaming) with
+configurable time-to-first-token, token rate, parallel slots, model load time
+and error injection, plus /api/tags and /api/ps. Planning prompts get
+well-formed JSON (schema-constrained replies can drop a field, see
+invalid_rate), everything else gets prose.
+
+    python -m benchmarks.fake_ollama --port 11434 --tokens-per-sec 40 --slots 2
+    OLLAMA_API_HOST=http://localhost:11434 python main.py
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WORDS = (
+    "the lantern wind harbor silver archive quiet storm memory river glass tower shadow "
+    "promise ember market letter winter signal forest machine voice bridge stranger "
+    "distant bright hollow ancient restless careful sudden gentle bitter golden "
+    "walked watched whispered remembered carried followed opened waited answered "
+    "through beneath across against toward before after while because although"
+).split()
+
+@dataclass
+class FakeOllamaConfig:
+    ttft: float = 0.2  # Seconds before the first token, on top of prompt evaluation
+    tokens_per_sec: float = 200.0  # Generation speed per request
+    prompt_tokens_per_sec: float = 5000.0  # Prompt evaluation speed for tokens not in the slot's prefix cache
+    slots: int = 4  # Requests processed in parallel (like OLLAMA_NUM_PARALLEL); others queue
+    error_rate: float = 0.0  # Probability of answering a request with error_status
+    error_status: int = 503
+    chapter_words: int = 1500  # Length of chapter prose
+    reply_words: int = 120  # Length of other prose replies
+    models: List[str] = field(default_factory=lambda: ["deepseek-r1:14b"])
+    load_seconds: float = 0.0  # Extra delay the first time a model is used, like loading its weights
+    invalid_rate: float = 0.0  # Probability of dropping a field from a schema-constrained reply
+
+class FakeOllamaServer:
+    """In-process fake Ollama server; use as a context manager or call start()/stop()"""
+
+    def __init__(self, config: Optional[FakeOllamaConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeOllamaConfig()
+        self.stats = {"requests": 0, "errors": 0, "prompt_bytes": 0, "response_bytes": 0,
+                      "prompt_tokens": 0, "prompt_eval_tokens": 0, "eval_tokens": 0}
+        self._stats_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.config.slots)
+        self._slot_prompts: List[str] = []  # Last prompt per slot, to model KV prefix reuse
+        self.loaded_models: Dict[str, float] = {}  # Model -> time it finished loading, reported by /api/ps
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeOllamaServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Fake Ollama server listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> 'FakeOllamaServer':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count(self, **increments: int):
+        with self._stats_lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def _load_model(self, model: str) -> float:
+        """Seconds this request waits for the model to load; requests arriving mid-load wait for the rest"""
+        with self._stats_lock:
+            ready = self.loaded_models.setdefault(model, time.time() + self.config.load_seconds)
+        wait = max(0.0, ready - time.time())
+        time.sleep(wait)
+        return wait
+
+    def _prompt_eval_tokens(self, prompt: str) -> int:
+        """Tokens the server would evaluate, crediting the longest prefix shared with a recent prompt"""
+        with self._stats_lock:
+            shared = max((len(os.path.commonprefix([prompt, previous])) for previous in self._slot_prompts), default=0)
+            self._slot_prompts = (self._slot_prompts + [prompt])[-self.config.slots:]
+        return _tokens(prompt[shared:])
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": [{"name": model, "model": model} for model in server.config.models]})
+                elif self.path == "/api/ps":
+                    now = time.time()
+                    self._send_json({"models": [{"name": model, "model": model}
+                                                for model, ready in list(server.loaded_models.items()) if ready <= now]})
+                elif self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-fake"})
+                elif self.path == "/stats":
+                    self._send_json(server.stats)
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server.count(requests=1, prompt_bytes=len(body))
+                if self.path not in ("/api/generate", "/api/chat"):
+                    self._send_json({"error": "not found"}, status=404)
+                    return
+
+                if random.random() < server.config.error_rate:
+                    server.count(errors=1)
+                    self._send_json({"error": "injected failure"}, status=server.config.error_status)
+                    return
+
+                request = json.loads(body)
+                with server._slots:
+                    self._respond(request)
+
+            def _respond(self, request: Dict[str, Any]):
+                chat = self.path == "/api/chat"
+                prompt = _prompt_text(request)
+                reply = fake_reply(prompt, request.get("format"), server.config)
+                tokens = re.findall(r"\S+\s*|\s+", reply)
+
+                prompt_tokens = _tokens(prompt)
+                eval_prompt_tokens = server._prompt_eval_tokens(prompt)
+                prompt_eval_time = eval_prompt_tokens / server.config.prompt_tokens_per_sec
+                server.count(prompt_tokens=prompt_tokens, prompt_eval_tokens=eval_prompt_tokens,
+                             eval_tokens=len(tokens))
+
+                start = time.perf_counter()
+                model = request.get("model", server.config.models[0])
+                load_time = server._load_model(model)
+                time.sleep(server.config.ttft + prompt_eval_time)
+
+                def final(total: float) -> Dict[str, Any]:
+                    return {
+                        "model": model,
+                        "created_at": datetime.now(timezone.utc).isoformat(),
+                        "done": True,
+                        "done_reason": "stop",
+                        "total_duration": int(total * 1e9),
+                        "load_duration": int((load_time + server.config.ttft) * 1e9),
+                        "prompt_eval_count": eval_prompt_tokens,
+                        "prompt_eval_duration": int(prompt_eval_time * 1e9),
+                        "eval_count": len(tokens),
+                        "eval_duration": int(len(tokens) / server.config.tokens_per_sec * 1e9)
+                    }
+
+                def piece(text: str) -> Dict[str, Any]:
+                    if chat:
+                        return {"message": {"role": "assistant", "content": text}}
+                    return {"response": text}
+
+                if not request.get("stream", True):
+                    time.sleep(len(tokens) / server.config.tokens_per_sec)
+                    result = final(time.perf_counter() - start)
+                    result.update(piece(reply))
+                    self._send_json(result)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for token in tokens:
+                    time.sleep(1 / server.config.tokens_per_sec)
+                    chunk = dict(model=model, done=False, **piece(token))
+                    self._write_chunk(json.dumps(chunk).encode() + b"\n")
+                result = final(time.perf_counter() - start)
+                result.update(piece(""))
+                self._write_chunk(json.dumps(result).encode() + b"\n")
+                self._write_chunk(b"")
+
+            def _write_chunk(self, data: bytes):
+                server.count(response_bytes=len(data))
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _send_json(self, data: Any, status: int = 200):
+                payload = json.dumps(data).encode()
+                server.count(response_bytes=len(payload))
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+def _tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+def _prompt_text(request: Dict[str, Any]) -> str:
+    if "messages" in request:
+        return "\n".join(message.get("content", "") for message in request["messages"])
+    return (request.get("system") or "") + request.get("prompt", "")
+
+def _prose(rng: random.Random, words: int) -> str:
+    sentences = []
+    count = 0
+    while count < words:
+        length = rng.randint(8, 18)
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+        count += length
+    paragraphs = [" ".join(sentences[i:i + 5]) for i in range(0, len(sentences), 5)]
+    return "\n\n".join(paragraphs)
+
+def _phrase(rng: random.Random, words: int = 6) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+def from_schema(schema: Dict[str, Any], rng: random.Random) -> Any:
+    """Build a value matching a JSON schema"""
+    kind = schema.get("type")
+    if kind == "object":
+        properties = schema.get("properties", {})
+        if properties:
+            return {name: from_schema(sub, rng) for name, sub in properties.items()}
+        values = schema.get("additionalProperties", {"type": "string"})
+        return {_phrase(rng, 2): from_schema(values, rng) for _ in range(3)}
+    if kind == "array":
+        return [from_schema(schema.get("items", {"type": "string"}), rng) for _ in range(3)]
+    if kind == "integer":
+        return rng.randint(1, 10)
+    if kind == "number":
+        return rng.random()
+    if kind == "boolean":
+        return True
+    return _phrase(rng)
+
+def _edit_script(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    """Edits quoting sentences of the reviewed chapter, some with the slips models make when quoting"""
+    content = prompt.split("Chapter Content:\n", 1)[-1].split("\n\n\nInstead of rewriting", 1)[0]
+    sentences = [sentence.strip() + "." for sentence in content.split(".") if len(sentence.split()) > 3]
+    edits = []
+    for sentence in rng.sample(sentences, min(4, len(sentences))):
+        slip = rng.random()
+        if slip < 0.25:
+            sentence = sentence.replace(" ", "  ", 2)  # Whitespace differs
+        elif slip < 0.4:
+            words = sentence.split()
+            sentence = " ".join(words[:1] + words[2:])  # A word is dropped
+        edits.append({"find": sentence, "replace": sentence[:-1] + ", " + _phrase(rng, 5).lower() + "."})
+    return {"edits": edits}
+
+def fake_reply(prompt: str, response_format: Any, config: FakeOllamaConfig) -> str:
+    """Produce a plausible reply for one of the pipeline's prompts"""
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+
+    outline = re.search(r"creating the (chapter|act|sequence) outline.*? into (\d+) (chapters|acts|sequences)", prompt, re.DOTALL)
+    if outline:
+        entries = [{"title": _phrase(rng, 3), "summary": _phrase(rng, 20)} for _ in range(int(outline.group(2)))]
+        return json.dumps({outline.group(3): entries})
+    if 'output your improvements as a JSON object with an "edits" list' in prompt:
+        return json.dumps(_edit_script(prompt, rng))
+
+    if isinstance(response_format, dict):
+        value = from_schema(response_format, rng)
+        if len(response_format.get("properties", {})) > 1 and rng.random() < config.invalid_rate:
+            del value[rng.choice(sorted(value))]
+        return json.dumps(value)
+
+    if "follow-up questions that would help develop" in prompt:
+        return "\n".join(f"Q{i}: {_phrase(rng, 8)}?" for i in range(1, 7))
+    if "provide a detailed answer to each of the follow-up questions" in prompt:
+        numbers = re.findall(r"^Q(\d+):", prompt, re.MULTILINE)
+        return json.dumps({number: _prose(rng, 40) for number in numbers})
+    if "creating a style guide" in prompt:
+        return json.dumps({"tone": _phrase(rng, 2), "language": _phrase(rng, 2), "narrative_style": _phrase(rng, 3),
+                           "pov": "third-person limited", "tense": "past tense",
+                           "themes": [_phrase(rng, 2) for _ in range(3)]})
+    if "creating detailed world lore" in prompt:
+        return json.dumps({"setting": _prose(rng, 40), "history": _prose(rng, 40), "culture": _prose(rng, 30),
+                           "rules": _prose(rng, 30), "locations": {_phrase(rng, 2): _phrase(rng, 10) for _ in range(4)}})
+    if "building engaging plots" in prompt:
+        return json.dumps({"main_plot": _prose(rng, 60), "subplots": [_phrase(rng, 12) for _ in range(3)],
+                           "arcs": [_phrase(rng, 12) for _ in range(3)]})
+    if "creating vivid characters" in prompt:
+        names = ["Ada", "Bram", "Cora", "Dell"]
+        return json.dumps({name: {"name": name, "description": _phrase(rng, 12), "background": _prose(rng, 30),
+                                  "motivation": _phrase(rng, 10), "arc": _phrase(rng, 10),
+                                  "relationships": {other: _phrase(rng, 5) for other in names if other != name}}
+                           for name in names})
+    if "creating chapter plans" in prompt:
+        return json.dumps({"title": _phrase(rng, 3), "summary": _prose(rng, 40),
+                           "scenes": [_phrase(rng, 12) for _ in range(4)], "pov_character": "Ada",
+                           "goals": [_phrase(rng, 8) for _ in range(2)], "conflicts": [_phrase(rng, 8) for _ in range(2)],
+                           "resolutions": [_phrase(rng, 8)]})
+    if "tasked with writing one scene" in prompt:
+        scenes = int(re.search(r"^Scene \d+ of (\d+)$", prompt, re.MULTILINE).group(1))
+        return "<think>\n" + _prose(rng, 30) + "\n</think>\n\n" + _prose(rng, config.chapter_words // scenes)
+    if "smoothing the transition between two scenes" in prompt:
+        return _prose(rng, 80)
+    if "tasked with writing a chapter" in prompt:
+        return "<think>\n" + _prose(rng, 60) + "\n</think>\n\n" + _prose(rng, config.chapter_words)
+    if "tasked with reviewing and improving a chapter" in prompt:
+        return ("# Chapter Review\n\n## Strengths\n" + _prose(rng, 40) + "\n\n## Areas for Improvement\n"
+                + _prose(rng, 40) + "\n\n## Revised Content:\n" + _prose(rng, config.chapter_words))
+    return _prose(rng, config.reply_words)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the Ollama API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--ttft", type=float, default=FakeOllamaConfig.ttft)
+    parser.add_argument("--tokens-per-sec", type=float, default=FakeOllamaConfig.tokens_per_sec)
+    parser.add_argument("--prompt-tokens-per-sec", type=float, default=FakeOllamaConfig.prompt_tokens_per_sec)
+    parser.add_argument("--slots", type=int, default=FakeOllamaConfig.slots)
+    parser.add_argument("--error-rate", type=float, default=FakeOllamaConfig.error_rate)
+    parser.add_argument("--error-status", type=int, default=FakeOllamaConfig.error_status)
+    parser.add_argument("--chapter-words", type=int, default=FakeOllamaConfig.chapter_words)
+    parser.add_argument("--load-seconds", type=float, default=FakeOllamaConfig.load_seconds)
+    parser.add_argument("--invalid-rate", type=float, default=FakeOllamaConfig.invalid_rate)
+    parser.add_argument("--model", action="append", dest="models", help="Model name to report (repeatable)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    config = FakeOllamaConfig(
+        ttft=args.ttft,
+        tokens_per_sec=args.tokens_per_sec,
+        prompt_tokens_per_sec=args.prompt_tokens_per_sec,
+        slots=args.slots,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        chapter_words=args.chapter_words,
+        load_seconds=args.load_seconds,
+        invalid_rate=args.invalid_rate
+    )
+    if args.models:
+        config.models = args.models
+    server = FakeOllamaServer(config, host=args.host, port=args.port)
+    try:
+        server.start()._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""End-to-end pipeline benchmark against the offline Ollama stand-in
+
+Runs UserInterface.run_headless (idea -> planning -> chapter plans -> writing
+-> review -> export) for each requested novel size, each in a fresh process
+with its own working directory, and writes a JSON report with per-stage wall
+time, request counts, prompt/response bytes, per-stage LLM telemetry, peak RSS
+and save/load times.
+
+    python -m benchmarks.pipeline_benchmark --chapters 5 25 100 --output bench.json
+
+With --hosts N, N stand-in servers are started and the client routes across
+them with a HostPool; the report then includes per-host utilization.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+STAGES = (
+    "develop_idea_headless",
+    "plan_novel_headless",
+    "plan_chapters_headless",
+    "write_novel_headless",
+    "review_novel_headless",
+    "output_novel"
+)
+SAVE_FORMATS = ("pickle", "journal", "archive", "snapshot")
+# Command-line overrides of stage settings: option -> (UserInterface attribute, stage attribute)
+STAGE_SETTINGS = {
+    "pipeline_depth": ("chapter_writing_stage", "pipeline_depth"),
+    "review_mode": ("chapter_writing_stage", "review_mode"),
+    "draft_mode": ("chapter_writing_stage", "draft_mode"),
+    "planning_mode": ("chapter_planning_stage", "mode")
+}
+
+def _server_stats(urls: str) -> Dict[str, int]:
+    """Stats of one server, or summed over a comma-separated list of servers"""
+    totals: Dict[str, int] = {}
+    for url in urls.split(","):
+        with urllib.request.urlopen(f"{url}/stats") as response:
+            for key, value in json.load(response).items():
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+def _delta(after: Dict[str, int], before: Dict[str, int]) -> Dict[str, int]:
+    return {key: after[key] - before.get(key, 0) for key in after}
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_one(chapters: int, server_url: str, settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run the headless pipeline once in this process; the cwd must be a scratch directory"""
+    # Imported here so config resolves its output directories under the scratch cwd
+    import src.novel
+    from src.host_pool import HostPool
+    from src.novel import Novel
+    from src.ollama_client import OllamaClient
+    from src.structured_output import StructuredGenerator
+    from src.telemetry import telemetry
+    from src.user_interface import UserInterface
+    from config import DEFAULT_MODEL
+
+    hosts = server_url.split(",")
+    host_pool = HostPool(hosts).start() if len(hosts) > 1 else None
+    ui = UserInterface(OllamaClient(model=DEFAULT_MODEL, api_host=hosts[0], host_pool=host_pool))
+    ui.chapter_writing_stage.progress_callback = None
+    ui.chapter_planning_stage.num_chapters = chapters
+    ui.chapter_planning_stage.max_chapters = chapters
+    for name, value in (settings or {}).items():
+        stage, attribute = STAGE_SETTINGS[name]
+        setattr(getattr(ui, stage), attribute, value)
+
+    stages: Dict[str, Dict[str, Any]] = {}
+
+    def timed(name, method):
+        def wrapper(*args, **kwargs):
+            before = _server_stats(server_url)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stages[name] = {"seconds": round(time.perf_counter() - start, 3),
+                                **_delta(_server_stats(server_url), before)}
+                logging.info(f"{chapters} chapters: {name} took {stages[name]['seconds']}s")
+        return wrapper
+
+    for name in STAGES:
+        setattr(ui, name, timed(name, getattr(ui, name)))
+
+    novel = Novel(title=f"Benchmark {chapters}", idea="A lighthouse keeper finds letters from a future that never happened.")
+    totals_before = _server_stats(server_url)
+    start = time.perf_counter()
+    ui.run_headless(novel)
+    total_seconds = time.perf_counter() - start
+    totals = _delta(_server_stats(server_url), totals_before)
+
+    persistence = {}
+    for save_format in SAVE_FORMATS:
+        src.novel.SAVE_FORMAT = save_format
+        save_start = time.perf_counter()
+        save_path = ui.novel.save()
+        save_seconds = time.perf_counter() - save_start
+        load_start = time.perf_counter()
+        loaded = Novel.load(save_path)
+        load_seconds = time.perf_counter() - load_start
+        full_start = time.perf_counter()
+        assert loaded == ui.novel  # Touches every chapter body, so lazy formats pay their full cost here
+        persistence[save_format] = {
+            "save_seconds": round(save_seconds, 4),
+            "load_seconds": round(load_seconds, 4),
+            "load_all_content_seconds": round(load_seconds + time.perf_counter() - full_start, 4),
+            "bytes": Path(save_path).stat().st_size
+        }
+
+    return {
+        "chapters": chapters,
+        "chapters_written": len(ui.novel.chapters),
+        "settings": {name: getattr(getattr(ui, stage), attribute) for name, (stage, attribute) in STAGE_SETTINGS.items()},
+        "words": sum(len(chapter.content.split()) for chapter in ui.novel.chapters),
+        "total_seconds": round(total_seconds, 3),
+        "stages": stages,
+        "requests": totals,
+        "client": dict(ui.ollama_client.stats),
+        "telemetry": telemetry.summary(),
+        "structured_output": StructuredGenerator.summary(),
+        "hosts": host_pool.utilization() if host_pool else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "persistence": persistence
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the headless pipeline against the fake Ollama server")
+    parser.add_argument("--chapters", type=int, nargs="+", default=[5, 25, 100])
+    parser.add_argument("--output", default=None, help="JSON report path (default: output/benchmarks/pipeline_<time>.json)")
+    parser.add_argument("--label", default="", help="Free-form label stored in the report, e.g. a git revision")
+    parser.add_argument("--ttft", type=float, default=0.05)
+    parser.add_argument("--tokens-per-sec", type=float, default=2000.0)
+    parser.add_argument("--prompt-tokens-per-sec", type=float, default=50000.0)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--chapter-words", type=int, default=800)
+    parser.add_argument("--hosts", type=int, default=1, help="Stand-in servers to load balance across")
+    parser.add_argument("--load-seconds", type=float, default=0.0, help="Model load time on each server's first request")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="Share of structured replies missing a field")
+    parser.add_argument("--pipeline-depth", type=int, help="Override CHAPTER_PIPELINE_DEPTH (0 = no draft/review overlap)")
+    parser.add_argument("--review-mode", choices=("edits", "rewrite"), help="Override CHAPTER_REVIEW_MODE")
+    parser.add_argument("--draft-mode", choices=("whole", "scenes"), help="Override CHAPTER_DRAFT_MODE")
+    parser.add_argument("--planning-mode", choices=("outline", "hierarchical", "independent"), help="Override CHAPTER_PLANNING_MODE")
+    parser.add_argument("--run-one", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--server-url", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.run_one:
+        settings = {name: getattr(args, name) for name in STAGE_SETTINGS if getattr(args, name) is not None}
+        result = run_one(args.run_one, args.server_url, settings)
+        with open(args.result_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+
+    from benchmarks.fake_ollama import FakeOllamaConfig, FakeOllamaServer
+
+    server_config = FakeOllamaConfig(
+        ttft=args.ttft,
+        tokens_per_sec=args.tokens_per_sec,
+        prompt_tokens_per_sec=args.prompt_tokens_per_sec,
+        slots=args.slots,
+        error_rate=args.error_rate,
+        chapter_words=args.chapter_words,
+        load_seconds=args.load_seconds,
+        invalid_rate=args.invalid_rate
+    )
+    results: List[Dict[str, Any]] = []
+    servers = [FakeOllamaServer(server_config).start() for _ in range(args.hosts)]
+    server_url = ",".join(server.url for server in servers)
+    try:
+        for chapters in args.chapters:
+            with tempfile.TemporaryDirectory(prefix="novel-bench-") as workdir:
+                result_file = Path(workdir) / "result.json"
+                env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(REPO_ROOT), os.environ.get("PYTHONPATH", "")]))
+                command = [sys.executable, "-m", "benchmarks.pipeline_benchmark", "--run-one", str(chapters),
+                           "--server-url", server_url, "--result-file", str(result_file)]
+                for name in STAGE_SETTINGS:
+                    if getattr(args, name) is not None:
+                        command += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+                subprocess.run(
+                    command,
+                    cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL
+                )
+                with open(result_file, 'r', encoding='utf-8') as f:
+                    results.append(json.load(f))
+            logging.info(f"{chapters} chapters: {results[-1]['total_seconds']}s total")
+    finally:
+        for server in servers:
+            server.stop()
+
+    report = {
+        "benchmark": "pipeline",
+        "label": args.label,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "server": vars(server_config),
+        "hosts": args.hosts,
+        "results": results
+    }
+    output = Path(args.output) if args.output else Path("output/benchmarks") / f"pipeline_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Benchmark report written to: {output}")
+
+if __name__ == "__main__":
+    main()
@@ -13,7 +13,30 @@ os.makedirs(SAVE_DIR, exist_ok=True)
 
 # Ollama settings
 DEFAULT_MODEL = "deepseek-r1:14b"  # Default model to use
-OLLAMA_API_HOST = "http://localhost:11434"  # Ollama API host
+OLLAMA_API_HOST = os.environ.get("OLLAMA_API_HOST", "http://localhost:11434")  # Ollama API host
+OLLAMA_API_HOSTS = [host for host in os.environ.get("OLLAMA_API_HOSTS", "").split(",") if host]  # Comma-separated hosts to load balance across (overrides OLLAMA_API_HOST)
+OLLAMA_KEEP_ALIVE = "30m"  # Keep the model (and its prompt KV cache) loaded between calls
+OLLAMA_SEED = None  # Fixed sampling seed (int) for reproducible, cacheable responses
+FAST_MODEL = None  # Small model for auxiliary and structured calls, e.g. "qwen2.5:3b" (None = DEFAULT_MODEL everywhere)
+MODEL_ROUTES = {  # Call type or stage -> model; unlisted or None uses DEFAULT_MODEL
+    "follow_up_questions": FAST_MODEL,
+    "follow_up_answers": FAST_MODEL,
+    "style_guide": FAST_MODEL,
+    "world_lore": FAST_MODEL,
+    "plot": FAST_MODEL,
+    "characters": FAST_MODEL,
+    "chapter_plan": FAST_MODEL,
+    "chapter_outline": FAST_MODEL,
+    "act_outline": FAST_MODEL,
+    "sequence_outline": FAST_MODEL,
+    "chapter_summary": FAST_MODEL,
+    "story_digest": FAST_MODEL,
+    "review_notes": FAST_MODEL,
+    "merge_notes": FAST_MODEL,
+}
+MODEL_CASCADE = True  # Repeat a call on DEFAULT_MODEL when a routed model's output fails validation
+STRUCTURED_OUTPUT = True  # Constrain planning replies with JSON schemas sent as Ollama's format
+STRUCTURED_REPAIR_ATTEMPTS = 2  # Calls that regenerate only the missing or invalid fields of a structured reply
 
 # Logging settings
 LOG_LEVEL = "INFO"  # DEBUG, INFO, WARNING, ERROR, CRITICAL
@@ -21,4 +44,65 @@ LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
 # Application settings
 HEADLESS_MODE = False  # Set to True to run without user interaction
-MAX_CHAPTERS = 25  # Maximum number of chapters to generate
+SAVE_FORMAT = "journal"  # journal: append-only per-novel checkpoint file; archive: versioned zip with lazily loaded chapters; snapshot: deduplicated content-addressed snapshots; pickle: timestamped full copies
+SNAPSHOT_KEEP = 0  # Snapshots kept per novel in snapshot mode, older ones are pruned and their blobs collected (0 = keep all)
+JOURNAL_COMPACT_RECORDS = 200  # Rewrite a journal as a single snapshot after this many appended records
+MAX_CHAPTERS = 300  # Maximum number of chapters to generate
+NUM_CHAPTERS = 10  # Number of chapters to plan (capped at MAX_CHAPTERS)
+CHAPTER_PLANNING_CONCURRENCY = 4  # Chapter plans generated in parallel (1 = sequential)
+CHAPTER_PLANNING_MODE = "outline"  # outline: one call outlines every chapter, then each plan is expanded from the outline alone; hierarchical: acts are outlined first, then the sequences of each act from the act alone, then the chapters of each sequence from the sequence alone; independent: each plan is generated from the full novel context
+HIERARCHICAL_PLANNING_CHAPTERS = 30  # Outline mode switches to hierarchical planning for novels with more chapters than this (0 = never)
+PLANNING_ACTS = 3  # Acts in hierarchical planning
+PLANNING_SEQUENCE_CHAPTERS = 5  # Target chapters per sequence in hierarchical planning
+CHAPTER_OUTLINE_WINDOW = 5  # Outline entries on each side of a chapter included when expanding its plan (0 = the whole outline)
+CHAPTER_OUTLINE_ATTEMPTS = 2  # Outline calls made while the chapter outline is shorter than requested; still short after that fails chapter planning
+CHAPTER_DRAFT_MODE = "whole"  # whole: one streamed generation per chapter; scenes: the plan's scenes drafted in parallel, then their seams smoothed
+SCENE_DRAFT_CONCURRENCY = 4  # Scenes (and seams) of a chapter generated in parallel in scenes mode
+CHAPTER_PIPELINE_DEPTH = 1  # Drafted chapters queued for review while the next one is drafted (0 = draft and review one chapter at a time)
+IDEA_ANSWER_CONCURRENCY = 4  # Follow-up questions answered in parallel (1 = sequential)
+STORY_MEMORY_BUDGET_TOKENS = 1500  # Token budget for recent chapter summaries in a chapter prompt
+STORY_DIGEST_TOKENS = 800  # Token budget for the digest of older chapters
+IDEA_BATCH_ANSWERS = False  # Answer all follow-up questions in one JSON call, falling back to per-question calls
+REVIEW_CONCURRENCY = 4  # Chapter reviews and note merges run in parallel during the final review
+REVIEW_GROUP_SIZE = 5  # Review notes merged per reduce call
+REVIEW_NOTES_WORDS = 250  # Word limit for each chapter's or group's review notes
+CHAPTER_REVIEW_MODE = "edits"  # edits: the review returns targeted find/replace edits applied locally; rewrite: the review returns the whole revised chapter
+REVIEW_EDIT_MATCH_RATIO = 0.85  # Minimum similarity for an edit whose passage is not found verbatim
+REVIEW_EDIT_MIN_APPLIED = 0.5  # Share of a review's edits that must apply, else the chapter is rewritten in full
+
+# Ollama transport settings
+OLLAMA_POOL_SIZE = 10  # Keep-alive connections kept per host
+OLLAMA_CONNECT_TIMEOUT = 10.0  # Seconds to establish a connection
+OLLAMA_READ_TIMEOUT = 600.0  # Seconds to wait for response data (long generations)
+OLLAMA_MAX_RETRIES = 3  # Retries on transient errors (connection, timeout, 5xx, 429)
+OLLAMA_BACKOFF_BASE = 1.0  # First retry delay in seconds, doubled per attempt
+OLLAMA_BACKOFF_MAX = 30.0  # Upper bound for a single retry delay
+OLLAMA_CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive failures before the circuit opens
+OLLAMA_CIRCUIT_RESET_TIMEOUT = 60.0  # Seconds before an open circuit lets a trial request through
+OLLAMA_MAX_IN_FLIGHT = 4  # Concurrent requests per AsyncOllamaClient (match OLLAMA_NUM_PARALLEL on the server)
+OLLAMA_HOST_SLOTS = 4  # Outstanding requests per pooled host before routing spills over to hosts without the model loaded
+OLLAMA_HEALTH_CHECK_INTERVAL = 15.0  # Seconds between /api/ps health checks of pooled hosts
+OLLAMA_HOST_EJECT_FAILURES = 3  # Consecutive failed requests before a pooled host is ejected
+OLLAMA_HOST_EJECT_SECONDS = 30.0  # Seconds an ejected host is left out of routing
+
+# LLM response cache settings
+LLM_CACHE_ENABLED = False  # Cache responses on disk so reruns skip identical requests
+LLM_CACHE_DIR = BASE_DIR / "cache"
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Least recently used entries are evicted above this size
+LLM_CACHE_POLICY = "deterministic"  # deterministic: only when a seed is set or temperature is 0; always: every request
+
+# Batch settings
+BATCH_DB = BASE_DIR / "batch.sqlite3"  # SQLite job queue used by main.py --batch
+BATCH_WORKERS = 2  # Novels generated concurrently in batch mode
+BATCH_MAX_ATTEMPTS = 3  # Attempts per job before it is marked failed
+
+# Tracing settings
+TRACE_ENABLED = False  # Record spans for stages, LLM calls, saves and exports as Chrome/Perfetto trace JSON
+TRACE_OUTPUT = BASE_DIR / "traces"  # Directory for trace files (open them in ui.perfetto.dev or chrome://tracing)
+TRACE_MEMORY = False  # Add tracemalloc memory to spans and top allocation sites to stage spans (slows the run)
+
+# Telemetry settings
+TELEMETRY_ENABLED = True  # Record Ollama's per-request timings, tagged with stage and chapter
+TELEMETRY_DIR = BASE_DIR / "telemetry"
+TELEMETRY_JSON = True  # Write a per-run JSON report (p50/p95 latency, throughput, token totals, every call)
+TELEMETRY_PROMETHEUS = True  # Write a per-run Prometheus text-format file (for node_exporter's textfile collector)
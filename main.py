@@ -1,9 +1,19 @@
+import argparse
 import logging
 import sys
 
 from src.user_interface import UserInterface
 from src.ollama_client import OllamaClient
-from config import LOGS_DIR, LOG_FORMAT, LOG_LEVEL, DEFAULT_MODEL
+from src.host_pool import HostPool
+from src.model_router import ModelRouter
+from src.structured_output import StructuredGenerator
+from src.response_cache import ResponseCache
+from src.novel import Novel
+from src.telemetry import telemetry
+from src.tracing import tracer
+from config import (
+    LOGS_DIR, LOG_FORMAT, LOG_LEVEL, DEFAULT_MODEL, LLM_CACHE_ENABLED, BATCH_DB, BATCH_WORKERS, OLLAMA_API_HOSTS
+)
 
 # Configure logging
 logging.basicConfig(
@@ -16,16 +26,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="AI Novel Maker")
+    parser.add_argument("--title", help="Title of a new novel to write headlessly (with --idea)")
+    parser.add_argument("--idea", help="Initial idea of the new novel")
+    parser.add_argument("--batch", metavar="JOBS_FILE", nargs="?", const="",
+                        help="Work through the batch queue; jobs in a JSON or JSON Lines file of "
+                             "{title, idea, model?, chapters?} objects are queued first")
+    parser.add_argument("--queue", default=str(BATCH_DB), help="SQLite job queue used by --batch")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Novels generated concurrently by --batch")
+    parser.add_argument("--retry-failed", action="store_true", help="Give failed batch jobs another set of attempts")
+    return parser.parse_args()
+
+def run_batch(args: argparse.Namespace, cache, host_pool):
+    """Queue jobs from a file if given, then work through the queue"""
+    from src.batch import BatchQueue, BatchRunner
+
+    queue = BatchQueue(args.queue)
+    if args.batch:
+        queue.add_from_file(args.batch)
+    if args.retry_failed:
+        queue.retry_failed()
+    runner = BatchRunner(queue, args.workers, lambda model: OllamaClient(model=model, cache=cache, host_pool=host_pool))
+    report = runner.run()
+    print(f"Batch finished: {report['jobs_done']} novels in {report['elapsed_seconds']}s "
+          f"({report['novels_per_hour']} novels/hour, {report['words_per_minute']} words/minute), "
+          f"queue {report['queue']}")
+
 def main():
     """Main program entry"""
+    args = parse_args()
+    host_pool = HostPool(OLLAMA_API_HOSTS).start() if OLLAMA_API_HOSTS else None
     try:
-        ollama_client = OllamaClient(model=DEFAULT_MODEL)
-        ui = UserInterface(ollama_client)
-        ui.run()
+        cache = ResponseCache() if LLM_CACHE_ENABLED else None
+        if args.batch is not None:
+            run_batch(args, cache, host_pool)
+        else:
+            ollama_client = OllamaClient(model=DEFAULT_MODEL, cache=cache, host_pool=host_pool)
+            ui = UserInterface(ollama_client)
+            if args.title and args.idea:
+                ui.run_headless(Novel(title=args.title, idea=args.idea))
+            else:
+                ui.run()
+        if cache:
+            logger.info(f"Response cache stats: {cache.stats}")
+        logger.info(f"Model routing stats: {ModelRouter.stats}")
+        logger.info(f"Structured output stats: {StructuredGenerator.summary()}")
     except Exception as e:
         logger.error(f"Program error: {e}", exc_info=True)
         print(f"Program error: {e}")
     finally:
+        if host_pool:
+            for host, usage in host_pool.utilization().items():
+                logger.info(f"Ollama host {host}: {usage}")
+            host_pool.stop()
+        for path in telemetry.write_reports():
+            logger.info(f"Telemetry report written to: {path}")
+        trace_path = tracer.write()
+        if trace_path:
+            logger.info(f"Trace written to: {trace_path}")
         logger.info("Program ended")
 
 if __name__ == "__main__":
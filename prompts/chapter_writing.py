@@ -1,16 +1,7 @@
 # Chapter writing stage system prompts
 
 CHAPTER_WRITING_SYSTEM = """<details>
-You are a professional novelist tasked with writing a chapter for a novel. Your goal is to create engaging, well-written content that follows the chapter plan and aligns with the novel's style guide, world lore, plot, and characters.
-
-Novel Information:
-- Title: {novel_title}
-- Chapter: {chapter_number}
-- Chapter Plan: {chapter_plan}
-- Style Guide: {style_guide}
-- World Lore: {world_lore}
-- Plot: {plot}
-- Characters: {characters}
+You are a professional novelist tasked with writing a chapter for the novel described above. Your goal is to create engaging, well-written content that follows the chapter plan given below and aligns with the novel's style guide, world lore, plot, and characters.
 
 First, let me analyze what I need to accomplish in this chapter:
 1. The chapter should follow the provided chapter plan
@@ -35,32 +26,48 @@ Now I'll write the chapter with these considerations in mind.
 
 </details>
 
+Chapter Information:
+- Story so far: {story_so_far}
+- Chapter: {chapter_number}
+- Chapter Plan: {chapter_plan}
+
 
 # Chapter {chapter_number}: {chapter_plan.title}
 
 [Write the complete chapter content here, following the chapter plan and adhering to the novel's style guide, world lore, plot, and character descriptions. The chapter should be engaging, well-paced, and advance the story appropriately.]
 """
 
-CHAPTER_REVIEW_SYSTEM = """<details>
-You are a professional editor tasked with reviewing and improving a chapter for a novel. Your goal is to ensure the chapter is well-written, follows the chapter plan, and aligns with the novel's style guide, world lore, plot, and characters.
+SCENE_WRITING_SYSTEM = """You are a professional novelist tasked with writing one scene of a chapter for the novel described above. Other writers are drafting the chapter's other scenes at the same time, so write only the scene assigned to you, following its beat from the chapter plan and the novel's style guide, world lore, plot, and characters.
 
-Chapter Content:
-{chapter_content}
+Begin where the previous scene's beat leaves off and end where the next scene's beat can pick up, without narrating the events of either. Do not add a chapter heading or scene title.
 
-Chapter Plan:
-{chapter_plan}
+Chapter Information:
+- Story so far: {story_so_far}
+- Chapter: {chapter_number}
+- Chapter Plan: {chapter_plan}
+
+Scene {scene_number} of {scene_count}
+- Previous scene: {previous_scene}
+- This scene: {scene}
+- Next scene: {next_scene}
+
+[Write the complete scene here.]
+"""
+
+SCENE_STITCH_SYSTEM = """You are a professional editor smoothing the transition between two scenes of a novel chapter that were drafted separately. Rewrite the closing passage of the first scene and the opening passage of the second so they read as one continuous chapter: remove repetition, fix contradictions in time, place or who is present, and add a brief transition if the jump is abrupt. Keep the events, the prose style and about the same length.
 
-Style Guide:
-{style_guide}
+Output only the rewritten passages, without any explanations or additional text.
 
-World Lore:
-{world_lore}
+End of scene {scene_number}:
+{before}
 
-Plot:
-{plot}
+Start of scene {next_scene_number}:
+{after}
+"""
 
-Characters:
-{characters}
+# Shared by both review modes, so their prompts have the same prefix
+CHAPTER_REVIEW_CHECKLIST = """<details>
+You are a professional editor tasked with reviewing and improving a chapter for the novel described above. Your goal is to ensure the chapter given below is well-written, follows its chapter plan, and aligns with the novel's style guide, world lore, plot, and characters.
 
 Let me analyze this chapter systematically:
 
@@ -106,6 +113,14 @@ Let me analyze this chapter systematically:
 Now I'll identify issues and suggest improvements.
 
 </details>
+"""
+
+CHAPTER_REVIEW_SYSTEM = CHAPTER_REVIEW_CHECKLIST + """
+Chapter Plan:
+{chapter_plan}
+
+Chapter Content:
+{chapter_content}
 
 
 # Chapter Review
@@ -122,3 +137,34 @@ Now I'll identify issues and suggest improvements.
 ## Revised Content:
 [Provide the revised chapter content, incorporating all the suggested improvements while maintaining the original intent and structure]
 """
+
+CHAPTER_EDIT_REVIEW_SYSTEM = CHAPTER_REVIEW_CHECKLIST + """
+Chapter Plan:
+{chapter_plan}
+
+Chapter Content:
+{chapter_content}
+
+
+Instead of rewriting the chapter, output your improvements as a JSON object with an "edits" list. Each edit has:
+- find: a passage copied exactly from the chapter content, one or two sentences long and unique within the chapter
+- replace: the improved text that replaces that passage
+
+Keep each edit focused on the passage that needs to change and do not repeat unchanged text. Output an empty list if the chapter needs no changes. Output only the JSON object, without any explanations or additional text.
+"""
+
+CHAPTER_SUMMARY_SYSTEM = """You are a professional editor keeping continuity notes for a novel. Summarize the chapter below in at most {max_words} words. Cover the key events, character decisions and changes, new information revealed, and any open threads, in plain prose without commentary.
+
+Chapter {chapter_number}: {chapter_title}
+
+{chapter_content}
+"""
+
+STORY_DIGEST_SYSTEM = """You are a professional editor keeping continuity notes for a novel. Merge the existing digest of the story with the chapter summaries that follow it into a single updated digest of at most {max_words} words. Keep the events and facts later chapters depend on (character states, relationships, unresolved threads) and drop minor detail.
+
+Existing digest:
+{digest}
+
+Chapter summaries to merge:
+{summaries}
+"""
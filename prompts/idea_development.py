@@ -22,3 +22,15 @@ Please analyze these answers and develop a comprehensive, structured concept for
 
 Your goal is to create a solid foundation that can be used for detailed planning of the novel.
 """
+
+FOLLOW_UP_ANSWER = """Based on the novel idea: '{idea}', please provide a detailed answer to this question: {question}"""
+
+FOLLOW_UP_ANSWERS_BATCH = """You are a creative writing assistant. Based on the following initial novel idea, provide a detailed answer to each of the follow-up questions below.
+
+Initial idea: {idea}
+
+Questions:
+{questions}
+
+Output a JSON object whose keys are the question numbers (as strings) and whose values are the answers, without any explanations or additional text.
+"""
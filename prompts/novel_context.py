@@ -0,0 +1,12 @@
+# Shared novel context, emitted first and byte-identical in every chapter-level prompt
+# so the server can reuse its KV cache for it across calls
+
+NOVEL_CONTEXT = """Novel Information:
+- Title: {novel_title}
+- Initial idea: {idea}
+- Style Guide: {style_guide}
+- World Lore: {world_lore}
+- Plot: {plot}
+- Characters: {characters}
+
+"""
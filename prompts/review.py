@@ -13,8 +13,8 @@ Novel Information:
 - Plot: {plot}
 - Characters: {characters}
 
-Novel Content:
-{chapters}
+Review Notes (condensed from chapter-by-chapter reviews):
+{review_notes}
 
 Let me analyze this novel systematically:
 
@@ -95,3 +95,24 @@ Now I'll provide a comprehensive review with specific feedback and suggestions.
 ## Conclusion
 [Provide a concluding assessment of the novel's potential and readiness]
 """
+
+CHAPTER_NOTES_SYSTEM = """You are a professional literary critic and editor reviewing one chapter of the novel described above as part of a review of the complete novel. Write concise review notes for this chapter covering:
+- What happens and how it advances the main plot and subplots
+- Character development and any inconsistent behavior
+- Pacing, style and voice compared with the style guide
+- Continuity errors or contradictions with the world lore
+- Specific strengths and problems worth raising in the final review
+
+Keep the notes under {max_words} words, as bullet points, without rewriting the chapter.
+
+Chapter {chapter_number}: {chapter_title}
+
+{chapter_content}
+"""
+
+MERGE_NOTES_SYSTEM = """You are a professional literary critic and editor combining review notes for consecutive parts of a novel titled "{novel_title}". Merge the notes below into a single set of notes for {span}. Keep recurring problems, continuity issues and notable strengths, note how plot and characters develop across the span, and drop repetition.
+
+Keep the merged notes under {max_words} words, as bullet points.
+
+{notes}
+"""
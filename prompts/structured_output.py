@@ -0,0 +1,12 @@
+# Structured output repair prompts
+
+FIELD_REPAIR_SYSTEM = """{prompt}
+
+Your previous reply was missing or had invalid values for some fields of {subject}:
+{problems}
+
+These fields were valid and are kept as they are:
+{valid}
+
+Output only the missing or invalid fields as a JSON object, without any explanations or additional text.
+"""
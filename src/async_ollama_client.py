@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import weakref
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from config import OLLAMA_MAX_IN_FLIGHT
+from src.ollama_client import OllamaClient
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+class AsyncOllamaClient:
+    """Asyncio front end for OllamaClient
+
+    Requests run on worker threads over the wrapped client's pooled session, so
+    they share its timeouts, retries and circuit breaker. A semaphore bounds the
+    number of requests in flight; set it to the server's OLLAMA_NUM_PARALLEL.
+    The async stage methods gather their calls freely and rely on this bound,
+    so every stage built on the same OllamaClient shares one client (see
+    for_client) and one bound per event loop.
+    """
+
+    def __init__(self, client: OllamaClient, max_in_flight: int = OLLAMA_MAX_IN_FLIGHT):
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+        logger.info(f"Initialized async Ollama client with {max_in_flight} requests in flight")
+
+    @classmethod
+    def for_client(cls, client: OllamaClient) -> 'AsyncOllamaClient':
+        """Return the async client attached to a sync client, creating it on first use"""
+        async_client = getattr(client, "_async_client", None)
+        if async_client is None:
+            async_client = cls(client)
+            client._async_client = async_client
+        return async_client
+
+    @classmethod
+    def for_model(cls, model: str, max_in_flight: int = OLLAMA_MAX_IN_FLIGHT, **kwargs) -> 'AsyncOllamaClient':
+        """Create an async client together with the sync client it wraps"""
+        return cls(OllamaClient(model=model, **kwargs), max_in_flight=max_in_flight)
+
+    @property
+    def model(self) -> str:
+        return self.client.model
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # One per event loop, a semaphore cannot be shared across loops
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_in_flight)
+        return semaphore
+
+    async def generate(self, prompt: str, system: Optional[str] = None, temperature: float = 0.7,
+                       on_token: Optional[Callable[[str], None]] = None,
+                       options: Optional[Dict[str, Any]] = None, model: Optional[str] = None,
+                       response_format: Optional[Any] = None) -> str:
+        """Generate text using Ollama API"""
+        async with self.semaphore:
+            return await asyncio.to_thread(self.client.generate, prompt, system, temperature, on_token,
+                                           options, model, response_format)
+
+    async def chat(self, messages: List[Dict[str, str]], system: Optional[str] = None, temperature: float = 0.7,
+                   on_token: Optional[Callable[[str], None]] = None,
+                   options: Optional[Dict[str, Any]] = None, model: Optional[str] = None,
+                   response_format: Optional[Any] = None) -> str:
+        """Chat using Ollama API"""
+        async with self.semaphore:
+            return await asyncio.to_thread(self.client.chat, messages, system, temperature, on_token,
+                                           options, model, response_format)
+
+    async def stream_generate(self, prompt: str, system: Optional[str] = None,
+                              temperature: float = 0.7,
+                              options: Optional[Dict[str, Any]] = None,
+                              model: Optional[str] = None,
+                              response_format: Optional[Any] = None) -> AsyncIterator[str]:
+        """Stream generated text chunk by chunk, with think spans removed"""
+        async with self.semaphore:
+            chunks = self.client.stream_generate(prompt, system, temperature, options, model, response_format)
+            async for chunk in self._iterate(chunks):
+                yield chunk
+
+    async def stream_chat(self, messages: List[Dict[str, str]], system: Optional[str] = None,
+                          temperature: float = 0.7,
+                          options: Optional[Dict[str, Any]] = None,
+                          model: Optional[str] = None,
+                          response_format: Optional[Any] = None) -> AsyncIterator[str]:
+        """Stream a chat reply chunk by chunk, with think spans removed"""
+        async with self.semaphore:
+            chunks = self.client.stream_chat(messages, system, temperature, options, model, response_format)
+            async for chunk in self._iterate(chunks):
+                yield chunk
+
+    async def close(self):
+        """Close pooled connections"""
+        await asyncio.to_thread(self.client.close)
+
+    @staticmethod
+    async def _iterate(chunks) -> AsyncIterator[str]:
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, _END)
+            if chunk is _END:
+                return
+            yield chunk
@@ -0,0 +1,304 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from src.novel import Novel
+from src.ollama_client import OllamaClient
+from src.telemetry import tag, telemetry
+from config import BATCH_DB, BATCH_WORKERS, BATCH_MAX_ATTEMPTS, DEFAULT_MODEL, NUM_CHAPTERS
+
+logger = logging.getLogger(__name__)
+
+JOB_STATES = ("pending", "running", "done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL UNIQUE,
+    idea TEXT NOT NULL,
+    model TEXT,
+    chapters INTEGER,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    save_path TEXT,
+    words INTEGER,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+)
+"""
+
+@dataclass
+class Job:
+    id: int
+    title: str
+    idea: str
+    model: Optional[str]
+    chapters: Optional[int]
+    state: str
+    attempts: int
+    save_path: Optional[str] = None
+    words: Optional[int] = None
+    error: Optional[str] = None
+    created_at: str = ""
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+class BatchQueue:
+    """Durable queue of novel jobs in a local SQLite database
+
+    Job state changes are committed transactions, so a crashed run leaves
+    every job either pending, done, failed or running; running jobs are put
+    back to pending by recover() and resume from their latest save.
+    """
+
+    def __init__(self, path: Path = BATCH_DB, max_attempts: int = BATCH_MAX_ATTEMPTS):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived autocommit connection per operation, so worker threads never share one
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def add(self, title: str, idea: str, model: Optional[str] = None, chapters: Optional[int] = None) -> Optional[int]:
+        """Queue a job; returns its id, or None if a job with this title already exists"""
+        with self._connect() as db:
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO jobs (title, idea, model, chapters, created_at) VALUES (?, ?, ?, ?, ?)",
+                (title, idea, model, chapters, _now())
+            )
+            if cursor.rowcount == 0:
+                logger.warning(f"Job '{title}' is already queued, skipping")
+                return None
+            return cursor.lastrowid
+
+    def add_from_file(self, path: Path) -> List[int]:
+        """Queue jobs from a JSON array or JSON Lines file of {title, idea, model?, chapters?} objects"""
+        text = Path(path).read_text(encoding="utf-8").strip()
+        if text.startswith("["):
+            entries = json.loads(text)
+        else:
+            entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+        ids = []
+        for entry in entries:
+            job_id = self.add(entry["title"], entry["idea"], entry.get("model"), entry.get("chapters"))
+            if job_id is not None:
+                ids.append(job_id)
+        logger.info(f"Queued {len(ids)} of {len(entries)} jobs from {path}")
+        return ids
+
+    def claim(self) -> Optional[Job]:
+        """Atomically move the oldest pending job to running and return it"""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT id FROM jobs WHERE state = 'pending' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute("UPDATE jobs SET state = 'running', attempts = attempts + 1, started_at = ?, error = NULL "
+                       "WHERE id = ?", (_now(), row["id"]))
+            job = self._get(db, row["id"])
+            db.execute("COMMIT")
+            return job
+
+    def complete(self, job_id: int, save_path: str, words: int):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET state = 'done', save_path = ?, words = ?, finished_at = ? WHERE id = ?",
+                       (save_path, words, _now(), job_id))
+
+    def fail(self, job_id: int, error: str, save_path: Optional[str] = None) -> str:
+        """Record a failed attempt; the job is retried until it runs out of attempts. Returns the new state"""
+        with self._connect() as db:
+            attempts = db.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()["attempts"]
+            state = "pending" if attempts < self.max_attempts else "failed"
+            db.execute("UPDATE jobs SET state = ?, error = ?, save_path = COALESCE(?, save_path), finished_at = ? "
+                       "WHERE id = ?", (state, error, save_path, _now() if state == "failed" else None, job_id))
+        return state
+
+    def recover(self) -> int:
+        """Return jobs left running by a crashed process to pending; returns how many
+
+        Only one batch process may work on a queue, since its running jobs would be taken over.
+        """
+        with self._connect() as db:
+            count = db.execute("UPDATE jobs SET state = 'pending' WHERE state = 'running'").rowcount
+        if count:
+            logger.info(f"Recovered {count} interrupted jobs")
+        return count
+
+    def retry_failed(self) -> int:
+        """Give failed jobs a fresh set of attempts"""
+        with self._connect() as db:
+            return db.execute("UPDATE jobs SET state = 'pending', attempts = 0 WHERE state = 'failed'").rowcount
+
+    def jobs(self, state: Optional[str] = None) -> List[Job]:
+        with self._connect() as db:
+            if state is None:
+                rows = db.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+            else:
+                rows = db.execute("SELECT * FROM jobs WHERE state = ? ORDER BY id", (state,)).fetchall()
+        return [Job(**dict(row)) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as db:
+            rows = db.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+        counts = {state: 0 for state in JOB_STATES}
+        counts.update({row["state"]: row["n"] for row in rows})
+        return counts
+
+    @staticmethod
+    def _get(db: sqlite3.Connection, job_id: int) -> Job:
+        return Job(**dict(db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()))
+
+class BatchRunner:
+    """Run queued jobs through the headless pipeline on a pool of worker threads
+
+    Each job gets its own OllamaClient and UserInterface. A job that was
+    interrupted resumes from the newest save of its title, so finished stages
+    and chapters are not generated again.
+    """
+
+    def __init__(self, queue: BatchQueue, workers: int = BATCH_WORKERS,
+                 client_factory: Optional[Callable[[str], OllamaClient]] = None):
+        self.queue = queue
+        self.workers = max(1, workers)
+        self.client_factory = client_factory or (lambda model: OllamaClient(model=model))
+        self.results: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._started = 0.0
+
+    def run(self) -> Dict[str, Any]:
+        """Process jobs until the queue has no pending work; returns the throughput report"""
+        self.queue.recover()
+        self._started = time.perf_counter()
+        logger.info(f"Starting batch with {self.workers} workers: {self.queue.counts()}")
+
+        threads = [threading.Thread(target=self._worker, name=f"batch-worker-{i + 1}") for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        report = self.report()
+        logger.info(f"Batch finished: {report}")
+        return report
+
+    def _worker(self):
+        while True:
+            job = self.queue.claim()
+            if job is None:
+                return
+            self._run_job(job)
+
+    def _run_job(self, job: Job):
+        # Imported here because the interface module pulls in every stage
+        from src.user_interface import UserInterface
+
+        logger.info(f"Job {job.id} '{job.title}': attempt {job.attempts}")
+        start = time.perf_counter()
+        client = ui = None
+
+        try:
+            # A client that cannot be built fails the attempt like any other error, not the worker
+            client = self.client_factory(job.model or DEFAULT_MODEL)
+            ui = UserInterface(client)
+            ui.chapter_writing_stage.progress_callback = None
+            ui.chapter_planning_stage.num_chapters = job.chapters or NUM_CHAPTERS
+            with tag(job=job.title):
+                ui.run_headless(self._resume(job))
+            if ui.novel.status != "completed":
+                raise RuntimeError(f"pipeline stopped at status '{ui.novel.status}'")
+
+            save_path = ui.novel.save()
+            words = sum(len(chapter.content.split()) for chapter in ui.novel.chapters)
+            self.queue.complete(job.id, save_path, words)
+            self._record(job, "done", time.perf_counter() - start, len(ui.novel.chapters), words)
+            logger.info(f"Job {job.id} '{job.title}' done: {len(ui.novel.chapters)} chapters, {words} words "
+                        f"in {time.perf_counter() - start:.1f}s")
+        except (Exception, SystemExit) as e:  # Headless stages exit on invalid state, that must not kill the worker
+            save_path = self._save_partial(ui.novel if ui else None)
+            state = self.queue.fail(job.id, repr(e), save_path)
+            self._record(job, state, time.perf_counter() - start, 0, 0)
+            logger.error(f"Job {job.id} '{job.title}' failed ({state}): {e}", exc_info=not isinstance(e, SystemExit))
+        finally:
+            if client is not None:
+                client.close()
+
+    @staticmethod
+    def _resume(job: Job) -> Novel:
+        """Load the newest save of the job's novel, or start a new one"""
+        # Match file names rather than the save catalog, which would open saves other workers are writing
+        prefix = re.escape(job.title.replace(' ', '_'))
+        pattern = re.compile(rf"{prefix}(\.journal|_\d{{8}}_\d{{6}}(_\d+)?\.(journal|pkl|novel|snapshot))")
+        saves = [path for path in Novel.list_saves() if pattern.fullmatch(path.name)]
+        if saves:
+            latest = max(saves, key=lambda path: path.stat().st_mtime)
+            novel = Novel.load(str(latest))
+            logger.info(f"Job {job.id} '{job.title}': resuming from {latest.name} [{novel.status}]")
+            return novel
+        return Novel(title=job.title, idea=job.idea)
+
+    @staticmethod
+    def _save_partial(novel: Optional[Novel]) -> Optional[str]:
+        """Save whatever a failed attempt produced, so the retry resumes from it"""
+        if novel is None:
+            return None
+        try:
+            return novel.save()
+        except Exception as e:
+            logger.error(f"Could not save partial progress of '{novel.title}': {e}")
+            return None
+
+    def _record(self, job: Job, state: str, seconds: float, chapters: int, words: int):
+        with self._lock:
+            self.results.append({"job": job.id, "title": job.title, "state": state, "seconds": round(seconds, 1),
+                                 "chapters": chapters, "words": words})
+            done = sum(1 for result in self.results if result["state"] == "done")
+        elapsed = time.perf_counter() - self._started
+        logger.info(f"Batch progress: {done} novels done in {elapsed:.0f}s "
+                    f"({done / elapsed * 3600:.1f} novels/hour), queue {self.queue.counts()}")
+
+    def report(self) -> Dict[str, Any]:
+        """Throughput of this run: jobs, chapters, words and generated tokens per unit of time"""
+        elapsed = time.perf_counter() - self._started
+        with self._lock:
+            done = [result for result in self.results if result["state"] == "done"]
+            failed = sum(1 for result in self.results if result["state"] != "done")
+        chapters = sum(result["chapters"] for result in done)
+        words = sum(result["words"] for result in done)
+        eval_tokens = telemetry.summary()["overall"]["eval_tokens"]
+        hours = elapsed / 3600 or 1e-9
+        return {
+            "workers": self.workers,
+            "elapsed_seconds": round(elapsed, 1),
+            "jobs_done": len(done),
+            "failed_attempts": failed,
+            "novels_per_hour": round(len(done) / hours, 2),
+            "chapters_per_hour": round(chapters / hours, 1),
+            "words_per_minute": round(words / (elapsed / 60 or 1e-9), 1),
+            "eval_tokens_per_second": round(eval_tokens / elapsed, 1) if elapsed else 0.0,
+            "queue": self.queue.counts()
+        }
@@ -1,41 +1,360 @@
+import asyncio
 import logging
-from typing import List
+from typing import List, Optional, Tuple
 
 from src.ollama_client import OllamaClient
-from src.novel import Novel, ChapterPlan, Chapter
-from prompts.chapter_planning import CHAPTER_PLAN_SYSTEM
+from src.novel import (
+    Novel, ChapterPlan, Chapter, ChapterOutline, OutlineEntry, ActOutline, SequenceOutline, Act, ActSequence
+)
+from src.model_router import ModelRouter
+from src.structured_output import StructuredGenerator
+from src.prompt_builder import build_prompt
+from src.telemetry import tag, tagged
+from src.utils import map_concurrently
+from prompts.chapter_planning import (
+    CHAPTER_PLAN_SYSTEM,
+    CHAPTER_OUTLINE_SYSTEM,
+    CHAPTER_EXPAND_SYSTEM,
+    ACT_OUTLINE_SYSTEM,
+    SEQUENCE_OUTLINE_SYSTEM,
+    SEQUENCE_CHAPTERS_SYSTEM
+)
+from config import (
+    MAX_CHAPTERS,
+    NUM_CHAPTERS,
+    CHAPTER_PLANNING_CONCURRENCY,
+    CHAPTER_PLANNING_MODE,
+    CHAPTER_OUTLINE_WINDOW,
+    CHAPTER_OUTLINE_ATTEMPTS,
+    HIERARCHICAL_PLANNING_CHAPTERS,
+    PLANNING_ACTS,
+    PLANNING_SEQUENCE_CHAPTERS
+)
 
 logger = logging.getLogger(__name__)
 
+def _split(total: int, parts: int) -> List[int]:
+    """Sizes of parts dividing total as evenly as possible, larger parts first"""
+    return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+def _first_chapters(first_chapter: int, sizes: List[int]) -> List[int]:
+    """First chapter of each consecutive part, plus the chapter after the last part"""
+    firsts = [first_chapter]
+    for size in sizes:
+        firsts.append(firsts[-1] + size)
+    return firsts
+
 class ChapterPlanningStage:
-    def __init__(self, ollama_client: OllamaClient):
+    def __init__(self, ollama_client: OllamaClient, num_chapters: int = NUM_CHAPTERS, max_chapters: int = MAX_CHAPTERS,
+                 concurrency: int = CHAPTER_PLANNING_CONCURRENCY, mode: str = CHAPTER_PLANNING_MODE,
+                 outline_window: int = CHAPTER_OUTLINE_WINDOW,
+                 hierarchical_chapters: int = HIERARCHICAL_PLANNING_CHAPTERS, acts: int = PLANNING_ACTS,
+                 sequence_chapters: int = PLANNING_SEQUENCE_CHAPTERS, outline_attempts: int = CHAPTER_OUTLINE_ATTEMPTS):
         self.ollama_client = ollama_client
+        self.router = ModelRouter(ollama_client)
+        self.structured = StructuredGenerator(self.router)
+        self.num_chapters = num_chapters
+        self.max_chapters = max_chapters
+        self.concurrency = concurrency
+        self.mode = mode
+        self.outline_window = outline_window
+        self.hierarchical_chapters = hierarchical_chapters
+        self.acts = acts
+        self.sequence_chapters = max(1, sequence_chapters)
+        self.outline_attempts = max(1, outline_attempts)
     
-    def generate_chapter_plans(self, novel: Novel) -> List[Chapter]:
+    @tagged(stage="chapter_planning")
+    def generate_chapter_plans(self, novel: Novel, num_chapters: Optional[int] = None) -> List[Chapter]:
         """Generate chapter plans for the novel"""
-        chapters: List[Chapter] = []
-        
-        for i in range(1, 11):  # Assuming max 10 chapters, adjust as needed
-            prompt = CHAPTER_PLAN_SYSTEM.format(
-                chapter_number=i,
-                novel_title=novel.title,
-                idea=novel.idea,
-                style_guide=novel.style_guide,
-                world_lore=novel.world_lore,
-                plot=novel.plot,
-                characters=novel.characters
-            )
-            
-            chapter_plan_str = self.ollama_client.generate(prompt)
-            
-            try:
-                chapter_plan_data = eval(chapter_plan_str)
-                chapter_plan = ChapterPlan(**chapter_plan_data)
-                chapter = Chapter(number=i, title=chapter_plan.title, plan=chapter_plan)
-                chapters.append(chapter)
-            except (SyntaxError, TypeError):
-                logger.error(f"Chapter {i}: JSON parsing failed, skipping")
-                # Could choose to skip or handle error manually
-                continue
+        num_chapters, mode = self._start(novel, num_chapters)
+        
+        if mode in ("outline", "hierarchical"):
+            if mode == "hierarchical":
+                outline = self.generate_hierarchical_outline(novel, num_chapters)
+            else:
+                outline = self.generate_outline(novel, num_chapters)
+            if outline.chapters:
+                return map_concurrently(
+                    lambda i: self._expand_chapter(novel, outline, i),
+                    range(1, len(outline.chapters) + 1),
+                    self.concurrency
+                )
+            logger.warning("Chapter outline is empty, planning chapters independently")
+        
+        # Plans are independent of each other, so fan them out and keep chapter order
+        results = map_concurrently(
+            lambda i: self._plan_chapter(novel, i),
+            range(1, num_chapters + 1),
+            self.concurrency
+        )
+        
+        return results
+    
+    @tagged(stage="chapter_planning")
+    async def generate_chapter_plans_async(self, novel: Novel, num_chapters: Optional[int] = None) -> List[Chapter]:
+        """generate_chapter_plans() awaiting the async client, with each level's calls gathered"""
+        num_chapters, mode = self._start(novel, num_chapters)
+        
+        if mode in ("outline", "hierarchical"):
+            if mode == "hierarchical":
+                outline = await self.generate_hierarchical_outline_async(novel, num_chapters)
+            else:
+                outline = await self.generate_outline_async(novel, num_chapters)
+            if outline.chapters:
+                return list(await asyncio.gather(*(self._expand_chapter_async(novel, outline, i)
+                                                   for i in range(1, len(outline.chapters) + 1))))
+            logger.warning("Chapter outline is empty, planning chapters independently")
+        
+        return list(await asyncio.gather(*(self._plan_chapter_async(novel, i) for i in range(1, num_chapters + 1))))
+    
+    def _start(self, novel: Novel, num_chapters: Optional[int]) -> Tuple[int, str]:
+        """The number of chapters to plan and the planning mode for that many"""
+        num_chapters = min(num_chapters or self.num_chapters, self.max_chapters)
+        mode = self.mode
+        if mode == "outline" and 0 < self.hierarchical_chapters < num_chapters:
+            mode = "hierarchical"
+        logger.info(f"Planning {num_chapters} chapters ({mode}) with concurrency {self.concurrency}")
+        novel.acts = []
+        return num_chapters, mode
+    
+    def _plan_chapter(self, novel: Novel, i: int) -> Chapter:
+        """Generate the plan for a single chapter"""
+        prompt = build_prompt(novel, CHAPTER_PLAN_SYSTEM, chapter_number=i)
+        
+        # Fields that stay invalid after repair get defaults, so a bad reply never drops the chapter
+        with tag(chapter=i):
+            chapter_plan = self.structured.generate("chapter_plan", prompt, ChapterPlan,
+                                                    fallback={"title": f"Chapter {i}"})
+        return Chapter(number=i, title=chapter_plan.title, plan=chapter_plan)
+    
+    async def _plan_chapter_async(self, novel: Novel, i: int) -> Chapter:
+        prompt = build_prompt(novel, CHAPTER_PLAN_SYSTEM, chapter_number=i)
+        with tag(chapter=i):
+            chapter_plan = await self.structured.generate_async("chapter_plan", prompt, ChapterPlan,
+                                                                fallback={"title": f"Chapter {i}"})
+        return Chapter(number=i, title=chapter_plan.title, plan=chapter_plan)
+    
+    def generate_outline(self, novel: Novel, num_chapters: int) -> ChapterOutline:
+        """Outline every chapter (title and one-liner) in a single call, asking again while the outline is short"""
+        prompt = build_prompt(novel, CHAPTER_OUTLINE_SYSTEM, num_chapters=num_chapters)
+        for attempt in range(1, self.outline_attempts + 1):
+            outline = self._checked_outline(self.structured.generate("chapter_outline", prompt, ChapterOutline),
+                                            num_chapters, attempt)
+            if outline is not None:
+                return outline
+    
+    async def generate_outline_async(self, novel: Novel, num_chapters: int) -> ChapterOutline:
+        """generate_outline() awaiting the async client"""
+        prompt = build_prompt(novel, CHAPTER_OUTLINE_SYSTEM, num_chapters=num_chapters)
+        for attempt in range(1, self.outline_attempts + 1):
+            outline = await self.structured.generate_async("chapter_outline", prompt, ChapterOutline)
+            outline = self._checked_outline(outline, num_chapters, attempt)
+            if outline is not None:
+                return outline
+    
+    def _checked_outline(self, outline: ChapterOutline, num_chapters: int, attempt: int) -> Optional[ChapterOutline]:
+        """The outline cut to num_chapters, or None to ask again; raises ValueError if it is still short on the last attempt
+        
+        An empty outline is returned as it is on the last attempt, so the
+        chapters are planned independently instead.
+        """
+        count = len(outline.chapters)
+        if count > num_chapters:
+            logger.warning(f"Outline has {count} chapters instead of {num_chapters}, dropping the extra chapters")
+            outline.chapters = outline.chapters[:num_chapters]
+        if count >= num_chapters or (count == 0 and attempt == self.outline_attempts):
+            return outline
+        if attempt == self.outline_attempts:
+            raise ValueError(f"Outline has {count} chapters instead of {num_chapters} after {attempt} attempts")
+        logger.warning(f"Outline has {count} chapters instead of {num_chapters}, asking again")
+        return None
+    
+    def generate_hierarchical_outline(self, novel: Novel, num_chapters: int) -> ChapterOutline:
+        """Outline acts, then each act's sequences, then each sequence's chapters, and record the acts on the novel
+        
+        Only the act outline sees the full novel context; every later prompt holds
+        just its parent's summary and its neighbours', so prompt size stays flat
+        and the number of calls grows linearly with the chapter count.
+        """
+        num_acts = max(1, min(self.acts, num_chapters))
+        prompt = build_prompt(novel, ACT_OUTLINE_SYSTEM, num_acts=num_acts, num_chapters=num_chapters)
+        entries = self._act_entries(self.structured.generate("act_outline", prompt, ActOutline), num_acts)
+        if not entries:
+            return self.generate_outline(novel, num_chapters)
+        
+        first_chapters = _first_chapters(1, _split(num_chapters, len(entries)))
+        acts = map_concurrently(
+            lambda i: self._outline_act(novel, entries, i, first_chapters[i], first_chapters[i + 1] - 1),
+            range(len(entries)),
+            self.concurrency
+        )
+        
+        sequences = [(act, sequence) for act in acts for sequence in act.sequences]
+        logger.info(f"Outlining {num_chapters} chapters in {len(sequences)} sequences across {len(acts)} acts")
+        chapter_lists = map_concurrently(lambda pair: self._outline_sequence(novel, *pair), sequences, self.concurrency)
         
+        novel.acts = acts
+        return ChapterOutline(chapters=[entry for chapters in chapter_lists for entry in chapters])
+    
+    async def generate_hierarchical_outline_async(self, novel: Novel, num_chapters: int) -> ChapterOutline:
+        """generate_hierarchical_outline() awaiting the async client"""
+        num_acts = max(1, min(self.acts, num_chapters))
+        prompt = build_prompt(novel, ACT_OUTLINE_SYSTEM, num_acts=num_acts, num_chapters=num_chapters)
+        entries = self._act_entries(await self.structured.generate_async("act_outline", prompt, ActOutline), num_acts)
+        if not entries:
+            return await self.generate_outline_async(novel, num_chapters)
+        
+        first_chapters = _first_chapters(1, _split(num_chapters, len(entries)))
+        acts = await asyncio.gather(*(
+            self._outline_act_async(novel, entries, i, first_chapters[i], first_chapters[i + 1] - 1)
+            for i in range(len(entries))
+        ))
+        
+        sequences = [(act, sequence) for act in acts for sequence in act.sequences]
+        logger.info(f"Outlining {num_chapters} chapters in {len(sequences)} sequences across {len(acts)} acts")
+        chapter_lists = await asyncio.gather(*(self._outline_sequence_async(novel, *pair) for pair in sequences))
+        
+        novel.acts = list(acts)
+        return ChapterOutline(chapters=[entry for chapters in chapter_lists for entry in chapters])
+    
+    @staticmethod
+    def _act_entries(outline: ActOutline, num_acts: int) -> List[OutlineEntry]:
+        entries = outline.acts[:num_acts]
+        if not entries:
+            logger.warning("Act outline is empty, outlining chapters in a single call")
+        elif len(entries) != num_acts:
+            logger.warning(f"Act outline has {len(entries)} acts instead of {num_acts}")
+        return entries
+    
+    def _outline_act(self, novel: Novel, entries: List[OutlineEntry], index: int,
+                     first_chapter: int, last_chapter: int) -> Act:
+        """Divide one act into sequences of consecutive chapters, from the act outline alone"""
+        prompt, num_sequences = self._act_prompt(novel, entries, index, last_chapter - first_chapter + 1)
+        with tag(act=index + 1):
+            outline = self.structured.generate("sequence_outline", prompt, SequenceOutline)
+        return self._build_act(entries[index], index, outline.sequences[:num_sequences], first_chapter, last_chapter)
+    
+    async def _outline_act_async(self, novel: Novel, entries: List[OutlineEntry], index: int,
+                                 first_chapter: int, last_chapter: int) -> Act:
+        prompt, num_sequences = self._act_prompt(novel, entries, index, last_chapter - first_chapter + 1)
+        with tag(act=index + 1):
+            outline = await self.structured.generate_async("sequence_outline", prompt, SequenceOutline)
+        return self._build_act(entries[index], index, outline.sequences[:num_sequences], first_chapter, last_chapter)
+    
+    def _act_prompt(self, novel: Novel, entries: List[OutlineEntry], index: int, num_chapters: int) -> Tuple[str, int]:
+        """The sequence outline prompt of an act, and the number of sequences it asks for"""
+        entry = entries[index]
+        num_sequences = -(-num_chapters // self.sequence_chapters)
+        prompt = SEQUENCE_OUTLINE_SYSTEM.format(
+            novel_title=novel.title,
+            character_names=", ".join(novel.characters) or "Not specified",
+            num_sequences=num_sequences,
+            act_number=index + 1,
+            act_count=len(entries),
+            act_title=entry.title,
+            act_summary=entry.summary,
+            previous_act=entries[index - 1].summary if index > 0 else "None, this is the first act.",
+            next_act=entries[index + 1].summary if index + 1 < len(entries) else "None, this is the last act."
+        )
+        return prompt, num_sequences
+    
+    @staticmethod
+    def _build_act(entry: OutlineEntry, index: int, sequences: List[OutlineEntry],
+                   first_chapter: int, last_chapter: int) -> Act:
+        if not sequences:
+            logger.warning(f"Act {index + 1} has no sequences, treating the act as one sequence")
+            sequences = [OutlineEntry(title=entry.title, summary=entry.summary)]
+        
+        firsts = _first_chapters(first_chapter, _split(last_chapter - first_chapter + 1, len(sequences)))
+        return Act(
+            number=index + 1,
+            title=entry.title,
+            summary=entry.summary,
+            sequences=[ActSequence(number=i + 1, title=sequence.title, summary=sequence.summary,
+                                   first_chapter=firsts[i], last_chapter=firsts[i + 1] - 1)
+                       for i, sequence in enumerate(sequences)]
+        )
+    
+    def _outline_sequence(self, novel: Novel, act: Act, sequence: ActSequence) -> List[OutlineEntry]:
+        """Outline the chapters of one sequence, from the sequence outline alone"""
+        with tag(act=act.number):
+            outline = self.structured.generate("chapter_outline", self._sequence_prompt(novel, act, sequence),
+                                               ChapterOutline)
+        return self._sequence_chapters(act, sequence, outline)
+    
+    async def _outline_sequence_async(self, novel: Novel, act: Act, sequence: ActSequence) -> List[OutlineEntry]:
+        with tag(act=act.number):
+            outline = await self.structured.generate_async("chapter_outline", self._sequence_prompt(novel, act, sequence),
+                                                           ChapterOutline)
+        return self._sequence_chapters(act, sequence, outline)
+    
+    @staticmethod
+    def _sequence_prompt(novel: Novel, act: Act, sequence: ActSequence) -> str:
+        index = sequence.number - 1
+        return SEQUENCE_CHAPTERS_SYSTEM.format(
+            novel_title=novel.title,
+            character_names=", ".join(novel.characters) or "Not specified",
+            num_chapters=sequence.last_chapter - sequence.first_chapter + 1,
+            first_chapter=sequence.first_chapter,
+            last_chapter=sequence.last_chapter,
+            act_number=act.number,
+            act_title=act.title,
+            sequence_title=sequence.title,
+            sequence_summary=sequence.summary,
+            previous_sequence=act.sequences[index - 1].summary if index > 0 else "None, this sequence opens the act.",
+            next_sequence=(act.sequences[index + 1].summary if index + 1 < len(act.sequences)
+                           else "None, this sequence closes the act.")
+        )
+    
+    @staticmethod
+    def _sequence_chapters(act: Act, sequence: ActSequence, outline: ChapterOutline) -> List[OutlineEntry]:
+        num_chapters = sequence.last_chapter - sequence.first_chapter + 1
+        chapters = outline.chapters[:num_chapters]
+        # Chapter numbers are fixed by the sequence ranges, so a short reply is padded rather than renumbered
+        if len(chapters) < num_chapters:
+            logger.warning(f"Act {act.number} sequence {sequence.number} outline has {len(chapters)} chapters "
+                           f"instead of {num_chapters}")
+            chapters += [OutlineEntry(title=f"Chapter {i}", summary=sequence.summary)
+                         for i in range(sequence.first_chapter + len(chapters), sequence.last_chapter + 1)]
         return chapters
+    
+    def _expand_chapter(self, novel: Novel, outline: ChapterOutline, i: int) -> Chapter:
+        """Expand one outline entry into a full plan; the prompt holds only the outline, not the novel context"""
+        entry = outline.chapters[i - 1]
+        with tag(chapter=i):
+            chapter_plan = self.structured.generate("chapter_plan", self._expand_prompt(novel, outline, i), ChapterPlan,
+                                                    fallback={"summary": entry.summary})
+        chapter_plan.title = entry.title  # The outline's title keeps chapter references consistent
+        return Chapter(number=i, title=entry.title, plan=chapter_plan)
+    
+    async def _expand_chapter_async(self, novel: Novel, outline: ChapterOutline, i: int) -> Chapter:
+        entry = outline.chapters[i - 1]
+        with tag(chapter=i):
+            chapter_plan = await self.structured.generate_async("chapter_plan", self._expand_prompt(novel, outline, i),
+                                                                ChapterPlan, fallback={"summary": entry.summary})
+        chapter_plan.title = entry.title
+        return Chapter(number=i, title=entry.title, plan=chapter_plan)
+    
+    def _expand_prompt(self, novel: Novel, outline: ChapterOutline, i: int) -> str:
+        entry = outline.chapters[i - 1]
+        return CHAPTER_EXPAND_SYSTEM.format(
+            novel_title=novel.title,
+            character_names=", ".join(novel.characters) or "Not specified",
+            outline=self._format_outline(outline, i),
+            chapter_number=i,
+            chapter_title=entry.title,
+            chapter_summary=entry.summary
+        )
+    
+    def _format_outline(self, outline: ChapterOutline, chapter_number: int) -> str:
+        """The outline entries around a chapter, so expansion prompts stay bounded for long novels"""
+        first, last = 1, len(outline.chapters)
+        if self.outline_window > 0:
+            first = max(first, chapter_number - self.outline_window)
+            last = min(last, chapter_number + self.outline_window)
+        
+        lines = ["..."] if first > 1 else []
+        lines += [f"{i}. {outline.chapters[i - 1].title}: {outline.chapters[i - 1].summary}" for i in range(first, last + 1)]
+        if last < len(outline.chapters):
+            lines.append("...")
+        return "\n".join(lines)
@@ -1,61 +1,468 @@
+import asyncio
+import contextlib
+import contextvars
 import logging
-from typing import List
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
 
 from src.ollama_client import OllamaClient
 from src.novel import Novel, Chapter
-from prompts.chapter_writing import CHAPTER_WRITING_SYSTEM, CHAPTER_REVIEW_SYSTEM
-from src.utils import remove_think_tags
+from prompts.chapter_writing import (
+    CHAPTER_WRITING_SYSTEM,
+    CHAPTER_REVIEW_SYSTEM,
+    CHAPTER_EDIT_REVIEW_SYSTEM,
+    SCENE_WRITING_SYSTEM,
+    SCENE_STITCH_SYSTEM
+)
+from src.prompt_builder import build_prompt
+from src.story_memory import StoryMemory
+from src.model_router import ModelRouter, ValidationFailed
+from src.patching import TextEdit, apply_edits, edits_schema, parse_edits
+from src.telemetry import tag, tagged
+from src.utils import estimate_tokens, map_concurrently, remove_think_tags
+from config import (
+    CHAPTER_DRAFT_MODE,
+    CHAPTER_PIPELINE_DEPTH,
+    CHAPTER_REVIEW_MODE,
+    REVIEW_EDIT_MIN_APPLIED,
+    SCENE_DRAFT_CONCURRENCY
+)
 
 logger = logging.getLogger(__name__)
 
+class DraftStopped(Exception):
+    """The pipeline told its drafter to stop in the middle of a draft"""
+
+@dataclass
+class WritingProgress:
+    chapter: Chapter
+    characters: int = 0
+    elapsed: float = 0.0
+    time_to_first_token: Optional[float] = None
+    done: bool = False
+
 class ChapterWritingStage:
-    def __init__(self, ollama_client: OllamaClient):
+    def __init__(self, ollama_client: OllamaClient, progress_callback: Optional[Callable[[WritingProgress], None]] = None,
+                 checkpoint_callback: Optional[Callable[[Novel], None]] = None,
+                 pipeline_depth: int = CHAPTER_PIPELINE_DEPTH, review_mode: str = CHAPTER_REVIEW_MODE,
+                 draft_mode: str = CHAPTER_DRAFT_MODE, scene_concurrency: int = SCENE_DRAFT_CONCURRENCY):
         self.ollama_client = ollama_client
+        self.progress_callback = progress_callback
+        self.checkpoint_callback = checkpoint_callback
+        self.pipeline_depth = pipeline_depth
+        self.review_mode = review_mode
+        self.draft_mode = draft_mode
+        self.scene_concurrency = scene_concurrency
+        self._checkpoint_lock = threading.Lock()
+        self.router = ModelRouter(ollama_client)
+        self.memory = StoryMemory(ollama_client)
     
+    @tagged(stage="chapter_writing")
     def write_chapters(self, novel: Novel) -> Novel:
         """Write chapters for the novel"""
-        for chapter in novel.chapters:
-            if chapter.status == "completed":
-                continue  # Skip already completed chapters
-            
-            logger.info(f"Writing Chapter {chapter.number}: {chapter.title}")
-            
-            prompt = CHAPTER_WRITING_SYSTEM.format(
-                chapter_number=chapter.number,
-                novel_title=novel.title,
-                chapter_plan=chapter.plan,
-                style_guide=novel.style_guide,
-                world_lore=novel.world_lore,
-                plot=novel.plot,
-                characters=novel.characters
-            )
-            
-            chapter_content = self.ollama_client.generate(prompt)
-            chapter_content = remove_think_tags(chapter_content)
-            chapter.content = chapter_content
-            chapter.status = "writing"  # Set chapter status to writing
-            
-            # Review chapter
-            self.review_chapter(novel, chapter)
-            
-            logger.info(f"Chapter {chapter.number}: {chapter.title} completed")
+        pending = [chapter for chapter in novel.chapters if chapter.status != "completed"]  # Skip completed chapters
+        if self.pipeline_depth > 0 and len(pending) > 1:
+            self._write_pipelined(novel, pending)
+            return novel
+        
+        for chapter in pending:
+            with tag(chapter=chapter.number):
+                self._write_chapter(novel, chapter)
         
         return novel
     
+    @tagged(stage="chapter_writing")
+    async def write_chapters_async(self, novel: Novel) -> Novel:
+        """write_chapters() awaiting the async client, with the pipeline's drafter as a task instead of a thread"""
+        pending = [chapter for chapter in novel.chapters if chapter.status != "completed"]
+        if self.pipeline_depth > 0 and len(pending) > 1:
+            await self._write_pipelined_async(novel, pending)
+            return novel
+        
+        for chapter in pending:
+            with tag(chapter=chapter.number):
+                await self._write_chapter_async(novel, chapter)
+        
+        return novel
+    
+    def _write_pipelined(self, novel: Novel, pending: List[Chapter]):
+        """Draft chapters on a background thread while this thread reviews the previous drafts in order
+        
+        The drafter summarizes each draft before moving on, since the next
+        chapter's prompt needs it, so the review never holds up drafting; at
+        most pipeline_depth drafts wait for review. A review that changes the
+        chapter replaces that summary, so only the chapters drafted meanwhile
+        see the draft's version.
+        """
+        drafts: queue.Queue = queue.Queue(maxsize=self.pipeline_depth)
+        stop = threading.Event()
+        context = contextvars.copy_context()
+        drafter = threading.Thread(target=context.run, args=(self._draft_all, novel, pending, drafts, stop),
+                                   name="chapter-drafter", daemon=True)
+        drafter.start()
+        
+        try:
+            while True:
+                item = drafts.get()
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                with tag(chapter=item.number):
+                    self.review_chapter(novel, item)
+                    if not self.memory.is_current(item):
+                        self.memory.summarize_chapter(novel, item)
+                    self._checkpoint(novel)
+                logger.info(f"Chapter {item.number}: {item.title} completed")
+        finally:
+            # Unblock and wait for the drafter, it stops at the next streamed chunk of the draft in progress
+            stop.set()
+            while drafter.is_alive():
+                try:
+                    drafts.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+    
+    async def _write_pipelined_async(self, novel: Novel, pending: List[Chapter]):
+        drafts: asyncio.Queue = asyncio.Queue(maxsize=self.pipeline_depth)
+        drafter = asyncio.create_task(self._draft_all_async(novel, pending, drafts))
+        
+        try:
+            while True:
+                item = await drafts.get()
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                with tag(chapter=item.number):
+                    await self.review_chapter_async(novel, item)
+                    if not self.memory.is_current(item):
+                        await self.memory.summarize_chapter_async(novel, item)
+                    await self._checkpoint_async(novel)
+                logger.info(f"Chapter {item.number}: {item.title} completed")
+        finally:
+            # Cancelling stops the drafter at its next await, in the middle of a streamed draft too
+            drafter.cancel()
+            await asyncio.gather(drafter, return_exceptions=True)
+    
+    def _draft_all(self, novel: Novel, pending: List[Chapter], drafts: queue.Queue, stop: threading.Event):
+        """Drafter thread of the pipeline: draft and summarize chapters in order, queueing them for review"""
+        try:
+            for chapter in pending:
+                if stop.is_set():
+                    return
+                with tag(chapter=chapter.number):
+                    self._draft_chapter(novel, chapter, stop)
+                    if not chapter.summary:
+                        self.memory.summarize_chapter(novel, chapter)
+                    self._checkpoint(novel)
+                drafts.put(chapter)
+            drafts.put(None)
+        except DraftStopped as e:
+            logger.info(f"Drafter stopped: {e}")
+        except BaseException as e:
+            drafts.put(e)
+    
+    async def _draft_all_async(self, novel: Novel, pending: List[Chapter], drafts: asyncio.Queue):
+        try:
+            for chapter in pending:
+                with tag(chapter=chapter.number):
+                    await self._draft_chapter_async(novel, chapter)
+                    if not chapter.summary:
+                        await self.memory.summarize_chapter_async(novel, chapter)
+                    await self._checkpoint_async(novel)
+                await drafts.put(chapter)
+            await drafts.put(None)
+        except Exception as e:
+            await drafts.put(e)
+    
+    def _write_chapter(self, novel: Novel, chapter: Chapter):
+        """Draft, review and summarize a single chapter"""
+        self._draft_chapter(novel, chapter)
+        self._checkpoint(novel)
+        
+        # Review chapter
+        self.review_chapter(novel, chapter)
+        self.memory.summarize_chapter(novel, chapter)
+        self._checkpoint(novel)
+        
+        logger.info(f"Chapter {chapter.number}: {chapter.title} completed")
+    
+    async def _write_chapter_async(self, novel: Novel, chapter: Chapter):
+        await self._draft_chapter_async(novel, chapter)
+        await self._checkpoint_async(novel)
+        
+        await self.review_chapter_async(novel, chapter)
+        await self.memory.summarize_chapter_async(novel, chapter)
+        await self._checkpoint_async(novel)
+        
+        logger.info(f"Chapter {chapter.number}: {chapter.title} completed")
+    
+    def _draft_chapter(self, novel: Novel, chapter: Chapter, stop: Optional[threading.Event] = None):
+        """Draft a chapter unless it was resumed with its draft already written; raises DraftStopped once stop is set"""
+        # Give the chapter a bounded memory of what has been written before it
+        self.memory.ensure_summaries(novel, before=chapter.number)
+        
+        if self._drafted(chapter):
+            return
+        
+        logger.info(f"Writing Chapter {chapter.number}: {chapter.title}")
+        story_so_far = self.memory.context_for(novel, chapter)
+        
+        if self._by_scenes(chapter):
+            chapter.content = self._draft_scenes(novel, chapter, story_so_far, stop)
+        else:
+            chapter.content = self._stream_chapter(chapter, self._chapter_prompt(novel, chapter, story_so_far), stop)
+        chapter.status = "writing"  # Set chapter status to writing
+    
+    async def _draft_chapter_async(self, novel: Novel, chapter: Chapter):
+        await self.memory.ensure_summaries_async(novel, before=chapter.number)
+        
+        if self._drafted(chapter):
+            return
+        
+        logger.info(f"Writing Chapter {chapter.number}: {chapter.title}")
+        story_so_far = self.memory.context_for(novel, chapter)
+        
+        if self._by_scenes(chapter):
+            chapter.content = await self._draft_scenes_async(novel, chapter, story_so_far)
+        else:
+            chapter.content = await self._stream_chapter_async(chapter,
+                                                               self._chapter_prompt(novel, chapter, story_so_far))
+        chapter.status = "writing"
+    
+    @staticmethod
+    def _drafted(chapter: Chapter) -> bool:
+        if chapter.status == "writing" and chapter.content:
+            # Resumed from a checkpoint taken after drafting, only the review is missing
+            logger.info(f"Resuming Chapter {chapter.number}: {chapter.title} at review")
+            return True
+        return False
+    
+    def _by_scenes(self, chapter: Chapter) -> bool:
+        return self.draft_mode == "scenes" and chapter.plan and len(chapter.plan.scenes) > 1
+    
+    @staticmethod
+    def _chapter_prompt(novel: Novel, chapter: Chapter, story_so_far: str) -> str:
+        return build_prompt(
+            novel,
+            CHAPTER_WRITING_SYSTEM,
+            story_so_far=story_so_far,
+            chapter_number=chapter.number,
+            chapter_plan=chapter.plan
+        )
+    
+    def _checkpoint(self, novel: Novel):
+        if self.checkpoint_callback:
+            # The pipeline's drafter and reviewer both checkpoint
+            with self._checkpoint_lock:
+                self.checkpoint_callback(novel)
+    
+    async def _checkpoint_async(self, novel: Novel):
+        if self.checkpoint_callback:
+            await asyncio.to_thread(self._checkpoint, novel)
+    
+    def _stream_chapter(self, chapter: Chapter, prompt: str, stop: Optional[threading.Event] = None) -> str:
+        """Stream a chapter draft, reporting time-to-first-token and progress"""
+        progress = WritingProgress(chapter=chapter)
+        start = time.perf_counter()
+        parts: List[str] = []
+
+        # Closing the stream as soon as stop is set releases its connection instead of reading the draft out
+        with contextlib.closing(self.router.stream_generate("chapter_draft", prompt)) as chunks:
+            for chunk in chunks:
+                if stop is not None and stop.is_set():
+                    raise DraftStopped(f"Chapter {chapter.number} abandoned after {progress.characters} characters")
+                parts.append(chunk)
+                self._advance(progress, start, len(chunk))
+
+        self._finish(progress, start)
+        logger.info(f"Chapter {chapter.number}: drafted {progress.characters} characters in {progress.elapsed:.2f}s")
+
+        return "".join(parts)
+
+    async def _stream_chapter_async(self, chapter: Chapter, prompt: str) -> str:
+        progress = WritingProgress(chapter=chapter)
+        start = time.perf_counter()
+        parts: List[str] = []
+
+        async for chunk in self.router.stream_generate_async("chapter_draft", prompt):
+            parts.append(chunk)
+            self._advance(progress, start, len(chunk))
+
+        self._finish(progress, start)
+        logger.info(f"Chapter {chapter.number}: drafted {progress.characters} characters in {progress.elapsed:.2f}s")
+
+        return "".join(parts)
+
+    def _advance(self, progress: WritingProgress, start: float, characters: int):
+        """Count newly drafted characters and report the progress"""
+        progress.elapsed = time.perf_counter() - start
+        if progress.time_to_first_token is None:
+            progress.time_to_first_token = progress.elapsed
+            logger.info(f"Chapter {progress.chapter.number}: first token after {progress.elapsed:.2f}s")
+        progress.characters += characters
+        if self.progress_callback:
+            self.progress_callback(progress)
+
+    def _finish(self, progress: WritingProgress, start: float):
+        progress.elapsed = time.perf_counter() - start
+        progress.done = True
+        if self.progress_callback:
+            self.progress_callback(progress)
+
+    def _draft_scenes(self, novel: Novel, chapter: Chapter, story_so_far: str,
+                      stop: Optional[threading.Event] = None) -> str:
+        """Draft the plan's scenes in parallel, then smooth the seams between them"""
+        progress = WritingProgress(chapter=chapter)
+        progress_lock = threading.Lock()
+        start = time.perf_counter()
+        
+        def draft(index: int) -> str:
+            if stop is not None and stop.is_set():
+                raise DraftStopped(f"Chapter {chapter.number} abandoned before scene {index + 1}")
+            prompt = self._scene_prompt(novel, chapter, story_so_far, index)
+            text = remove_think_tags(self.router.generate("chapter_draft", prompt)).strip()
+            with progress_lock:
+                self._advance(progress, start, len(text))
+            return text
+        
+        drafts = map_concurrently(draft, range(len(chapter.plan.scenes)), self.scene_concurrency)
+        content = self._stitch_scenes(self._paragraphs(drafts))
+        
+        self._finish(progress, start)
+        logger.info(f"Chapter {chapter.number}: drafted {len(drafts)} scenes, {len(content)} characters "
+                    f"in {progress.elapsed:.2f}s")
+        return content
+    
+    async def _draft_scenes_async(self, novel: Novel, chapter: Chapter, story_so_far: str) -> str:
+        progress = WritingProgress(chapter=chapter)
+        start = time.perf_counter()
+        
+        async def draft(index: int) -> str:
+            prompt = self._scene_prompt(novel, chapter, story_so_far, index)
+            text = remove_think_tags(await self.router.generate_async("chapter_draft", prompt)).strip()
+            self._advance(progress, start, len(text))
+            return text
+        
+        drafts = await asyncio.gather(*(draft(i) for i in range(len(chapter.plan.scenes))))
+        content = await self._stitch_scenes_async(self._paragraphs(drafts))
+        
+        self._finish(progress, start)
+        logger.info(f"Chapter {chapter.number}: drafted {len(drafts)} scenes, {len(content)} characters "
+                    f"in {progress.elapsed:.2f}s")
+        return content
+    
+    @staticmethod
+    def _scene_prompt(novel: Novel, chapter: Chapter, story_so_far: str, index: int) -> str:
+        scenes = chapter.plan.scenes
+        return build_prompt(
+            novel,
+            SCENE_WRITING_SYSTEM,
+            story_so_far=story_so_far,
+            chapter_number=chapter.number,
+            chapter_plan=chapter.plan,
+            scene_number=index + 1,
+            scene_count=len(scenes),
+            previous_scene=scenes[index - 1] if index > 0 else "None, this scene opens the chapter",
+            scene=scenes[index],
+            next_scene=scenes[index + 1] if index + 1 < len(scenes) else "None, this scene closes the chapter"
+        )
+    
+    @staticmethod
+    def _paragraphs(drafts: List[str]) -> List[List[str]]:
+        return [[paragraph for paragraph in draft.split("\n\n") if paragraph.strip()] for draft in drafts]
+    
+    def _stitch_scenes(self, scenes: List[List[str]]) -> str:
+        """Join scene drafts (as paragraph lists), rewriting the paragraphs on each side of every seam
+        
+        Seams are independent, so they are smoothed in parallel; a seam whose
+        paragraph is also part of the previous seam (a one-paragraph scene) is
+        left as it is.
+        """
+        seams = self._seams(scenes)
+        
+        def stitch(i: int) -> str:
+            return remove_think_tags(self.router.generate("scene_stitch", self._stitch_prompt(scenes, i))).strip()
+        
+        return self._join_scenes(scenes, dict(zip(seams, map_concurrently(stitch, seams, self.scene_concurrency))))
+    
+    async def _stitch_scenes_async(self, scenes: List[List[str]]) -> str:
+        seams = self._seams(scenes)
+        
+        async def stitch(i: int) -> str:
+            text = await self.router.generate_async("scene_stitch", self._stitch_prompt(scenes, i))
+            return remove_think_tags(text).strip()
+        
+        return self._join_scenes(scenes, dict(zip(seams, await asyncio.gather(*(stitch(i) for i in seams)))))
+    
+    @staticmethod
+    def _seams(scenes: List[List[str]]) -> List[int]:
+        seams = []
+        for i in range(len(scenes) - 1):
+            if not scenes[i] or not scenes[i + 1]:
+                continue
+            if seams and seams[-1] == i - 1 and len(scenes[i]) == 1:
+                continue
+            seams.append(i)
+        return seams
+    
+    @staticmethod
+    def _stitch_prompt(scenes: List[List[str]], i: int) -> str:
+        return SCENE_STITCH_SYSTEM.format(scene_number=i + 1, before=scenes[i][-1],
+                                          next_scene_number=i + 2, after=scenes[i + 1][0])
+    
+    @staticmethod
+    def _join_scenes(scenes: List[List[str]], stitched: Dict[int, str]) -> str:
+        paragraphs: List[str] = []
+        for i, scene in enumerate(scenes):
+            body = list(scene)
+            if i - 1 in stitched:
+                body = body[1:]  # The opening paragraph was rewritten with the previous seam
+            if i in stitched:
+                body = body[:-1] + [stitched[i]] if body else [stitched[i]]
+            paragraphs.extend(body)
+        return "\n\n".join(paragraph for paragraph in paragraphs if paragraph.strip())
+    
+    @tagged(stage="chapter_review")
     def review_chapter(self, novel: Novel, chapter: Chapter):
         """Review chapter content"""
         logger.info(f"Reviewing Chapter {chapter.number}: {chapter.title}")
         
-        review_prompt = CHAPTER_REVIEW_SYSTEM.format(
-            chapter_content=chapter.content,
+        if self.review_mode == "edits" and self._review_with_edits(novel, chapter):
+            self._reviewed(chapter)
+            return
+        
+        with tag(chapter=chapter.number):
+            review_result = self.router.generate("chapter_review", self._review_prompt(novel, chapter))
+        self._apply_review(chapter, review_result)
+    
+    @tagged(stage="chapter_review")
+    async def review_chapter_async(self, novel: Novel, chapter: Chapter):
+        """review_chapter() awaiting the async client"""
+        logger.info(f"Reviewing Chapter {chapter.number}: {chapter.title}")
+        
+        if self.review_mode == "edits" and await self._review_with_edits_async(novel, chapter):
+            self._reviewed(chapter)
+            return
+        
+        with tag(chapter=chapter.number):
+            review_result = await self.router.generate_async("chapter_review", self._review_prompt(novel, chapter))
+        self._apply_review(chapter, review_result)
+    
+    @staticmethod
+    def _review_prompt(novel: Novel, chapter: Chapter) -> str:
+        return build_prompt(
+            novel,
+            CHAPTER_REVIEW_SYSTEM,
             chapter_plan=chapter.plan,
-            style_guide=novel.style_guide,
-            world_lore=novel.world_lore,
-            plot=novel.plot,
-            characters=novel.characters
+            chapter_content=chapter.content
         )
-        
-        review_result = self.ollama_client.generate(review_prompt)
+    
+    def _apply_review(self, chapter: Chapter, review_result: str):
         review_result = remove_think_tags(review_result)
         
         # Assuming the review result contains the revised chapter content
@@ -66,5 +473,56 @@ class ChapterWritingStage:
             except IndexError:
                 logger.warning("Could not find revised content in review result, keeping original")
         
+        self._reviewed(chapter)
+    
+    @staticmethod
+    def _reviewed(chapter: Chapter):
         chapter.status = "completed"  # Set chapter status to completed
         logger.info(f"Chapter {chapter.number}: {chapter.title} review completed")
+    
+    def _review_with_edits(self, novel: Novel, chapter: Chapter) -> bool:
+        """Review a chapter as an edit script applied locally; returns False if a full rewrite is needed"""
+        try:
+            with tag(chapter=chapter.number):
+                edits = self.router.generate("chapter_review", self._edit_review_prompt(novel, chapter),
+                                             parse=parse_edits, response_format=edits_schema())
+        except ValidationFailed as e:
+            logger.warning(f"Chapter {chapter.number}: unusable edit script ({e}), rewriting in full")
+            return False
+        
+        return self._apply_edit_script(chapter, edits)
+    
+    async def _review_with_edits_async(self, novel: Novel, chapter: Chapter) -> bool:
+        try:
+            with tag(chapter=chapter.number):
+                edits = await self.router.generate_async("chapter_review", self._edit_review_prompt(novel, chapter),
+                                                         parse=parse_edits, response_format=edits_schema())
+        except ValidationFailed as e:
+            logger.warning(f"Chapter {chapter.number}: unusable edit script ({e}), rewriting in full")
+            return False
+        
+        return self._apply_edit_script(chapter, edits)
+    
+    @staticmethod
+    def _edit_review_prompt(novel: Novel, chapter: Chapter) -> str:
+        return build_prompt(
+            novel,
+            CHAPTER_EDIT_REVIEW_SYSTEM,
+            chapter_plan=chapter.plan,
+            chapter_content=chapter.content
+        )
+    
+    @staticmethod
+    def _apply_edit_script(chapter: Chapter, edits: List[TextEdit]) -> bool:
+        result = apply_edits(chapter.content, edits)
+        if result.total and result.applied < result.total * REVIEW_EDIT_MIN_APPLIED:
+            logger.warning(f"Chapter {chapter.number}: only {result.applied} of {result.total} edits applied, "
+                           f"rewriting in full")
+            return False
+        
+        # A full rewrite would have generated the whole revised chapter
+        saved = estimate_tokens(result.text) - sum(estimate_tokens(edit.find + edit.replace) for edit in edits)
+        chapter.content = result.text
+        logger.info(f"Chapter {chapter.number}: applied {result.applied} of {result.total} edits "
+                    f"({result.fuzzy} fuzzy), ~{saved} output tokens saved over a full rewrite")
+        return True
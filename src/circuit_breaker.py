@@ -0,0 +1,61 @@
+import logging
+import threading
+import time
+
+import requests
+
+from config import OLLAMA_CIRCUIT_FAILURE_THRESHOLD, OLLAMA_CIRCUIT_RESET_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised when the circuit breaker rejects a request"""
+
+class CircuitBreaker:
+    """Stop calling a failing server until a cool-down has passed"""
+
+    def __init__(self, failure_threshold: int = OLLAMA_CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = OLLAMA_CIRCUIT_RESET_TIMEOUT, name: str = ""):
+        self.name = name  # Server the circuit guards, for log messages
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = "closed"  # closed, open, half-open
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def _for(self) -> str:
+        return f" for {self.name}" if self.name else ""
+
+    def allow(self) -> bool:
+        """Return whether a request may be sent now"""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half-open"
+                logger.info(f"Circuit{self._for} half-open, sending a trial request")
+                return True
+            return self.state == "closed"
+
+    def ready(self) -> bool:
+        """Return whether allow() would let a request through now, without starting a trial"""
+        with self._lock:
+            if self.state == "open":
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return self.state == "closed"
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"Circuit{self._for} closed")
+            self.failures = 0
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.error(f"Circuit{self._for} opened after {self.failures} consecutive failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
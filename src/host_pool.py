@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+import requests
+
+from src.circuit_breaker import CircuitBreaker, CircuitOpenError
+from config import (
+    OLLAMA_HEALTH_CHECK_INTERVAL,
+    OLLAMA_HOST_EJECT_FAILURES,
+    OLLAMA_HOST_EJECT_SECONDS,
+    OLLAMA_HOST_SLOTS,
+    OLLAMA_CONNECT_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class HostState:
+    url: str
+    outstanding: int = 0
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    busy_seconds: float = 0.0  # Sum of request durations, so busy_seconds / elapsed is the mean concurrency
+    loaded_models: Set[str] = field(default_factory=set)
+    ejected_until: float = 0.0
+    breaker: Optional[CircuitBreaker] = None  # Each host's circuit opens on its own failures
+
+    def __post_init__(self):
+        if self.breaker is None:
+            self.breaker = CircuitBreaker(name=self.url)
+
+    def available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+@dataclass
+class HostLease:
+    """A request in progress on a host, returned by HostPool.acquire"""
+    host: HostState
+    model: str
+    started: float
+
+    @property
+    def url(self) -> str:
+        return self.host.url
+
+class HostPool:
+    """Route requests across several Ollama hosts
+
+    Each request goes to the available host with the fewest outstanding
+    requests among those that already have the model loaded (as reported by
+    /api/ps), spilling over to the other hosts once every loaded host has
+    `slots` requests outstanding. Hosts that fail `eject_failures` requests in
+    a row, or fail a health check, are ejected for `eject_seconds`; a
+    background thread re-checks every host periodically. Every host also has
+    its own circuit breaker, so one dead host never opens the circuit for the
+    others.
+    """
+
+    def __init__(self, hosts: List[str], slots: int = OLLAMA_HOST_SLOTS,
+                 health_check_interval: float = OLLAMA_HEALTH_CHECK_INTERVAL,
+                 eject_failures: int = OLLAMA_HOST_EJECT_FAILURES, eject_seconds: float = OLLAMA_HOST_EJECT_SECONDS):
+        if not hosts:
+            raise ValueError("A host pool needs at least one host")
+        self.hosts = [HostState(url=host.rstrip("/")) for host in hosts]
+        self.slots = slots
+        self.health_check_interval = health_check_interval
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._created = time.monotonic()
+
+    def start(self) -> 'HostPool':
+        """Check every host once, then keep checking them on a background thread"""
+        self.check_all()
+        self._thread = threading.Thread(target=self._health_loop, name="ollama-health-check", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.session.close()
+
+    def acquire(self, model: str) -> HostLease:
+        """Pick a host for a request and count it as outstanding until release()
+
+        Raises CircuitOpenError when every host's circuit is open.
+        """
+        with self._lock:
+            host = self._choose(model, time.monotonic())
+            if not host.breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {host.url}, not sending request")
+            host.outstanding += 1
+            host.requests += 1
+            return HostLease(host, model, time.monotonic())
+
+    def release(self, lease: HostLease, success: bool, answered: bool = False):
+        """Finish a request started with acquire(); success means the host served the model
+        
+        answered marks a request the host rejected itself (a 4xx such as an
+        unknown model): the client is at fault, so it counts against neither
+        the host's health nor its loaded models.
+        """
+        host = lease.host
+        with self._lock:
+            host.busy_seconds += time.monotonic() - lease.started
+            host.outstanding -= 1
+            if success or answered:
+                host.consecutive_failures = 0
+                if success:
+                    host.loaded_models.add(lease.model)  # Serving a request loads the model
+                return
+            host.failures += 1
+            host.consecutive_failures += 1
+            if host.consecutive_failures >= self.eject_failures:
+                self._eject(host, f"{host.consecutive_failures} consecutive failures")
+
+    def _choose(self, model: str, now: float) -> HostState:
+        ready = [host for host in self.hosts if host.breaker.ready()]
+        if not ready:
+            raise CircuitOpenError("Circuit open for every Ollama host, not sending request")
+        available = [host for host in ready if host.available(now)]
+        if not available:
+            # Every host is ejected; try the one due back first rather than failing outright
+            return min(ready, key=lambda host: host.ejected_until)
+
+        loaded = [host for host in available if model in host.loaded_models]
+        if loaded and min(host.outstanding for host in loaded) < self.slots:
+            candidates = loaded
+        else:
+            candidates = available
+        # Ties go to the host that has served fewest requests, which spreads cold starts
+        return min(candidates, key=lambda host: (host.outstanding, host.requests))
+
+    def _eject(self, host: HostState, reason: str):
+        if host.available(time.monotonic()):
+            logger.warning(f"Ejecting Ollama host {host.url} for {self.eject_seconds:.0f}s: {reason}")
+        host.ejected_until = time.monotonic() + self.eject_seconds
+
+    def check(self, host: HostState) -> bool:
+        """Refresh a host's loaded models from /api/ps; ejects the host if it does not answer"""
+        try:
+            response = self.session.get(f"{host.url}/api/ps", timeout=OLLAMA_CONNECT_TIMEOUT)
+            response.raise_for_status()
+            models = {entry.get("model") or entry.get("name") for entry in response.json().get("models", [])}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            with self._lock:
+                self._eject(host, f"health check failed: {e}")
+            return False
+
+        with self._lock:
+            # An ejection for failed requests runs its course even if the host answers health checks
+            if host.ejected_until and host.available(time.monotonic()):
+                logger.info(f"Ollama host {host.url} is back in the pool")
+                host.ejected_until = 0.0
+                host.consecutive_failures = 0
+            host.loaded_models = models
+        return True
+
+    def check_all(self):
+        for host in self.hosts:
+            self.check(host)
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_check_interval):
+            self.check_all()
+
+    def utilization(self) -> Dict[str, Dict[str, Any]]:
+        """Per-host request counts, failures and mean concurrency since the pool was created"""
+        elapsed = max(time.monotonic() - self._created, 1e-9)
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host.url: {
+                    "requests": host.requests,
+                    "failures": host.failures,
+                    "outstanding": host.outstanding,
+                    "busy_seconds": round(host.busy_seconds, 2),
+                    "mean_concurrency": round(host.busy_seconds / elapsed, 2),
+                    "available": host.available(now),
+                    "circuit": host.breaker.state,
+                    "loaded_models": sorted(host.loaded_models)
+                }
+                for host in self.hosts
+            }
@@ -1,44 +1,54 @@
+import asyncio
+import json
 import logging
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 
 from src.ollama_client import OllamaClient
 from src.novel import Novel
-from prompts.idea_development import IDEA_DEVELOPMENT_SYSTEM, FOLLOW_UP_QUESTIONS
+from src.model_router import ModelRouter, ValidationFailed
+from src.telemetry import tagged
+from src.utils import map_concurrently
+from prompts.idea_development import (
+    IDEA_DEVELOPMENT_SYSTEM,
+    FOLLOW_UP_QUESTIONS,
+    FOLLOW_UP_ANSWER,
+    FOLLOW_UP_ANSWERS_BATCH
+)
+from config import IDEA_ANSWER_CONCURRENCY, IDEA_BATCH_ANSWERS
 
 logger = logging.getLogger(__name__)
 
 class IdeaDevelopmentStage:
-    def __init__(self, ollama_client: OllamaClient):
+    def __init__(self, ollama_client: OllamaClient, concurrency: int = IDEA_ANSWER_CONCURRENCY,
+                 batch_answers: bool = IDEA_BATCH_ANSWERS):
         self.ollama_client = ollama_client
+        self.router = ModelRouter(ollama_client)
+        self.concurrency = concurrency
+        self.batch_answers = batch_answers
     
+    @tagged(stage="idea_development")
     def develop_idea(self, novel: Novel) -> Novel:
         """Develop the initial idea into a more structured concept"""
         logger.info("Starting idea development stage")
         
         # Generate follow-up questions based on the initial idea
         follow_up_prompt = FOLLOW_UP_QUESTIONS.format(idea=novel.idea)
-        follow_up_questions = self.ollama_client.generate(follow_up_prompt)
+        try:
+            questions = self.router.generate("follow_up_questions", follow_up_prompt, parse=self._require_questions)
+        except ValidationFailed as e:
+            logger.warning(f"{e}, continuing without follow-up questions")
+            questions = {}
         
         # In headless mode, we'll generate answers to these questions automatically
         # In interactive mode, we'd ask the user to answer these questions
         
         # For now, let's assume we're in headless mode and generate answers
-        questions = self._parse_questions(follow_up_questions)
-        answers = {}
-        
-        for q_id, question in questions.items():
-            logger.info(f"Generating answer for question: {question}")
-            # Generate an answer for each question
-            answer = self.ollama_client.generate(f"Based on the novel idea: '{novel.idea}', please provide a detailed answer to this question: {question}")
-            answers[q_id] = answer
+        answers = self._answer_questions(novel, questions)
         
         # Develop the idea based on the answers
-        idea_development_prompt = IDEA_DEVELOPMENT_SYSTEM.format(
-            idea=novel.idea,
-            answers="\n".join([f"Q{q_id}: {q}\nA{q_id}: {answers[q_id]}" for q_id, q in questions.items()])
-        )
+        idea_development_prompt = self._development_prompt(novel, questions, answers)
         
-        developed_idea = self.ollama_client.generate(idea_development_prompt)
+        developed_idea = self.router.generate("idea_development", idea_development_prompt)
         
         # Update the novel with the developed idea
         novel.idea = developed_idea
@@ -46,6 +56,98 @@ class IdeaDevelopmentStage:
         
         return novel
     
+    @tagged(stage="idea_development")
+    async def develop_idea_async(self, novel: Novel) -> Novel:
+        """Develop the idea, awaiting each LLM call so one event loop can drive several novels"""
+        logger.info("Starting idea development stage")
+        
+        follow_up_prompt = FOLLOW_UP_QUESTIONS.format(idea=novel.idea)
+        try:
+            questions = await self.router.generate_async("follow_up_questions", follow_up_prompt,
+                                                         parse=self._require_questions)
+        except ValidationFailed as e:
+            logger.warning(f"{e}, continuing without follow-up questions")
+            questions = {}
+        
+        answers = await self._answer_questions_async(novel, questions)
+        novel.idea = await self.router.generate_async("idea_development",
+                                                      self._development_prompt(novel, questions, answers))
+        logger.info("Idea development completed")
+        
+        return novel
+    
+    @staticmethod
+    def _development_prompt(novel: Novel, questions: Dict[int, str], answers: Dict[int, str]) -> str:
+        return IDEA_DEVELOPMENT_SYSTEM.format(
+            idea=novel.idea,
+            answers="\n".join([f"Q{q_id}: {q}\nA{q_id}: {answers[q_id]}" for q_id, q in questions.items()])
+        )
+    
+    def _answer_questions(self, novel: Novel, questions: Dict[int, str]) -> Dict[int, str]:
+        """Answer the follow-up questions, keeping question order"""
+        if self.batch_answers and len(questions) > 1:
+            answers = self._answer_questions_batch(novel, questions)
+            if answers is not None:
+                return answers
+            logger.warning("Batch answer parsing failed, answering questions individually")
+        
+        # Each answer depends only on the idea and its question, so they can run concurrently
+        def answer(item):
+            q_id, question = item
+            logger.info(f"Generating answer for question: {question}")
+            prompt = FOLLOW_UP_ANSWER.format(idea=novel.idea, question=question)
+            return q_id, self.router.generate("follow_up_answers", prompt)
+        
+        return dict(map_concurrently(answer, questions.items(), self.concurrency))
+    
+    async def _answer_questions_async(self, novel: Novel, questions: Dict[int, str]) -> Dict[int, str]:
+        """Answer the follow-up questions concurrently, bounded by the async client"""
+        if self.batch_answers and len(questions) > 1:
+            logger.info(f"Generating answers for {len(questions)} questions in one call")
+            try:
+                return await self.router.generate_async("follow_up_answers", self._batch_prompt(novel, questions),
+                                                        parse=self._batch_parser(questions))
+            except ValidationFailed:
+                logger.warning("Batch answer parsing failed, answering questions individually")
+        
+        async def answer(question: str) -> str:
+            logger.info(f"Generating answer for question: {question}")
+            prompt = FOLLOW_UP_ANSWER.format(idea=novel.idea, question=question)
+            return await self.router.generate_async("follow_up_answers", prompt)
+        
+        answers = await asyncio.gather(*(answer(question) for question in questions.values()))
+        return dict(zip(questions, answers))
+    
+    def _answer_questions_batch(self, novel: Novel, questions: Dict[int, str]) -> Optional[Dict[int, str]]:
+        """Answer all questions in a single structured call, or None if the reply is unusable"""
+        logger.info(f"Generating answers for {len(questions)} questions in one call")
+        try:
+            return self.router.generate("follow_up_answers", self._batch_prompt(novel, questions),
+                                        parse=self._batch_parser(questions))
+        except ValidationFailed:
+            return None
+    
+    @staticmethod
+    def _batch_prompt(novel: Novel, questions: Dict[int, str]) -> str:
+        return FOLLOW_UP_ANSWERS_BATCH.format(
+            idea=novel.idea,
+            questions="\n".join([f"Q{q_id}: {q}" for q_id, q in questions.items()])
+        )
+    
+    @staticmethod
+    def _batch_parser(questions: Dict[int, str]) -> Callable[[str], Dict[int, str]]:
+        def parse(answers_str: str) -> Dict[int, str]:
+            answers_data = json.loads(answers_str)
+            return {q_id: str(answers_data[str(q_id)]).strip() for q_id in questions}
+        return parse
+    
+    def _require_questions(self, questions_text: str) -> Dict[int, str]:
+        """Parse the follow-up questions, rejecting output that contains none"""
+        questions = self._parse_questions(questions_text)
+        if not questions:
+            raise ValueError("no questions found")
+        return questions
+    
     def _parse_questions(self, questions_text: str) -> Dict[str, str]:
         """Parse the follow-up questions from the generated text"""
         questions = {}
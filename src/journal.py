@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, fields
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from src.novel import Novel, Chapter
+from config import SAVE_DIR, JOURNAL_COMPACT_RECORDS
+
+logger = logging.getLogger(__name__)
+
+class NovelJournal:
+    """Append-only checkpoint journal for a single novel
+
+    Each checkpoint appends one JSON line per changed artifact or chapter, so
+    saving costs what changed rather than the size of the novel. The journal is
+    rewritten as a single snapshot record once enough records pile up.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._written: Dict[str, str] = {}  # key -> JSON last written for it
+        self._records = 0
+        self._lock = threading.Lock()
+        # chapter number -> (field values, record, encoded) from the last time the chapter was encoded
+        self._chapter_parts: Dict[int, Tuple[Tuple[Any, ...], Dict[str, Any], str]] = {}
+
+    @staticmethod
+    def path_for(novel: Novel) -> Path:
+        """Path for a new journal; a title that already has one gets a timestamped name instead"""
+        stem = novel.title.replace(' ', '_')
+        path = SAVE_DIR / f"{stem}.journal"
+        if path.exists():
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = SAVE_DIR / f"{stem}_{timestamp}.journal"
+            suffix = 1
+            while path.exists():
+                suffix += 1
+                path = SAVE_DIR / f"{stem}_{timestamp}_{suffix}.journal"
+        return path
+
+    @classmethod
+    def for_novel(cls, novel: Novel) -> 'NovelJournal':
+        """Return the journal attached to a novel, creating it on first save"""
+        journal = getattr(novel, "_journal", None)
+        if journal is None:
+            journal = cls(cls.path_for(novel))
+            novel._journal = journal
+        return journal
+
+    def checkpoint(self, novel: Novel) -> str:
+        """Append records for everything that changed since the last checkpoint"""
+        parts = self._parts(novel)
+        with self._lock:
+            if not self._written:
+                # First save of a novel that was not loaded from this journal; never replace another novel's journal
+                if self.path.exists():
+                    raise FileExistsError(f"Journal {self.path} already exists and was not loaded by this process")
+                self._compact(novel, parts)
+                return str(self.path)
+
+            changed = [(key, record, encoded) for key, (record, encoded) in parts.items()
+                       if self._written.get(key) != encoded]
+            if changed:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    for _, record, _ in changed:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                for key, _, encoded in changed:
+                    self._written[key] = encoded
+                self._records += len(changed)
+            logger.debug(f"Journal checkpoint: {len(changed)} records appended to {self.path}")
+
+            if self._records >= JOURNAL_COMPACT_RECORDS:
+                self._compact(novel, parts)
+
+        return str(self.path)
+
+    def compact(self, novel: Novel):
+        """Rewrite the journal as a single snapshot of the novel"""
+        with self._lock:
+            self._compact(novel, self._parts(novel))
+
+    def _compact(self, novel: Novel, parts: Dict[str, Tuple[Dict[str, Any], str]]):
+        tmp_path = self.path.with_suffix(".journal.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"op": "snapshot", "novel": asdict(novel)}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._written = {key: encoded for key, (_, encoded) in parts.items()}
+        self._records = 1
+        logger.info(f"Compacted journal {self.path}")
+
+    def load(self) -> Novel:
+        """Replay the journal into a novel and attach the journal to it"""
+        state: Dict[str, Any] = {}
+        chapters: Dict[int, Dict[str, Any]] = {}
+        order: List[int] = []
+        records = 0
+        intact_bytes = 0
+
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if record is None or not line.endswith(b"\n"):
+                    # A torn final line from a crash mid-append; drop it so later appends start clean
+                    logger.warning(f"Discarding incomplete record at the end of {self.path}")
+                    break
+                intact_bytes += len(line)
+                records += 1
+                op = record["op"]
+                if op == "snapshot":
+                    state = dict(record["novel"])
+                    chapter_list = state.pop("chapters", [])
+                    chapters = {c["number"]: c for c in chapter_list}
+                    order = [c["number"] for c in chapter_list]
+                elif op == "set":
+                    state[record["key"]] = record["value"]
+                elif op == "chapter":
+                    chapters[record["value"]["number"]] = record["value"]
+                elif op == "chapters":
+                    order = record["numbers"]
+
+        if intact_bytes < self.path.stat().st_size:
+            os.truncate(self.path, intact_bytes)
+
+        state["chapters"] = [chapters[number] for number in order if number in chapters]
+        novel = Novel.from_dict(state)
+
+        with self._lock:
+            self._written = {key: encoded for key, (_, encoded) in self._parts(novel).items()}
+            self._records = records
+        novel._journal = self
+        return novel
+
+    def _parts(self, novel: Novel) -> Dict[str, Tuple[Dict[str, Any], str]]:
+        """Split a novel into journal records keyed by what they describe"""
+        parts: Dict[str, Tuple[Dict[str, Any], str]] = {}
+        for f in fields(novel):
+            if f.name == "chapters":
+                continue
+            value = getattr(novel, f.name)
+            value = asdict(value) if hasattr(value, "__dataclass_fields__") else value
+            if f.name == "characters":
+                value = {name: asdict(c) for name, c in value.items()}
+            elif f.name == "acts":
+                value = [asdict(act) for act in value]
+            parts[f.name] = ({"op": "set", "key": f.name, "value": value}, _encode(value))
+
+        numbers = [chapter.number for chapter in novel.chapters]
+        parts["chapters"] = ({"op": "chapters", "numbers": numbers}, _encode(numbers))
+        for chapter in novel.chapters:
+            parts[f"chapter:{chapter.number}"] = self._chapter_part(chapter)
+        return parts
+
+    def _chapter_part(self, chapter: Chapter) -> Tuple[Dict[str, Any], str]:
+        """A chapter's record, re-encoded only if one of its fields was reassigned since the last checkpoint
+
+        Chapters are updated by assigning new values (plans are replaced, never
+        edited in place), so comparing field identities is enough. Without this,
+        every checkpoint would re-encode every chapter and saving a long novel
+        chapter by chapter would grow quadratically.
+        """
+        values = tuple(getattr(chapter, f.name) for f in fields(chapter))
+        cached = self._chapter_parts.get(chapter.number)
+        if cached is not None and len(cached[0]) == len(values) and all(a is b for a, b in zip(cached[0], values)):
+            return cached[1], cached[2]
+        value = asdict(chapter)
+        record, encoded = {"op": "chapter", "value": value}, _encode(value)
+        self._chapter_parts[chapter.number] = (values, record, encoded)
+        return record, encoded
+
+def _encode(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
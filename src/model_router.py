@@ -0,0 +1,105 @@
+import logging
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from src.ollama_client import OllamaClient
+from src.async_ollama_client import AsyncOllamaClient
+from src.telemetry import current_tags
+from config import MODEL_ROUTES, MODEL_CASCADE
+
+logger = logging.getLogger(__name__)
+
+# Exceptions a parse function may raise to reject a model's output
+PARSE_ERRORS = (ValueError, SyntaxError, TypeError, KeyError, AttributeError, NameError)
+
+class ValidationFailed(ValueError):
+    """Raised when a call's output failed validation on every model tried; carries the last output"""
+
+    def __init__(self, message: str, text: str):
+        super().__init__(message)
+        self.text = text
+
+class ModelRouter:
+    """Choose the model for each call type, escalating when the output fails validation
+
+    Routes map a call type (e.g. "follow_up_questions", "chapter_plan") or a
+    telemetry stage name to a model; anything unrouted uses the client's model.
+    When a parse function rejects the routed model's output and cascading is
+    on, the call is repeated once on the client's model.
+    """
+
+    # Process-wide counters, shared by every router
+    stats: Dict[str, int] = {"calls": 0, "escalations": 0, "validation_failures": 0}
+    _stats_lock = threading.Lock()
+
+    def __init__(self, ollama_client: OllamaClient, routes: Optional[Dict[str, Optional[str]]] = None,
+                 cascade: bool = MODEL_CASCADE):
+        self.ollama_client = ollama_client
+        self.routes = MODEL_ROUTES if routes is None else routes
+        self.cascade = cascade
+
+    @property
+    def default_model(self) -> str:
+        return self.ollama_client.model
+
+    @property
+    def async_client(self) -> AsyncOllamaClient:
+        return AsyncOllamaClient.for_client(self.ollama_client)
+
+    def model_for(self, call_type: str) -> str:
+        """The model routed for a call type, else for the current stage, else the client's model"""
+        return (self.routes.get(call_type) or self.routes.get(current_tags().get("stage", ""))
+                or self.default_model)
+
+    def generate(self, call_type: str, prompt: str, parse: Optional[Callable[[str], Any]] = None, **kwargs) -> Any:
+        """Generate on the routed model; with parse, return its parsed value, escalating on failure"""
+        model = self.model_for(call_type)
+        text = self.ollama_client.generate(prompt, model=model, **kwargs)
+        escalate, value = self._accept(call_type, model, text, parse)
+        if not escalate:
+            return value
+        text = self.ollama_client.generate(prompt, model=self.default_model, **kwargs)
+        return self._accept(call_type, self.default_model, text, parse)[1]
+
+    async def generate_async(self, call_type: str, prompt: str, parse: Optional[Callable[[str], Any]] = None,
+                             **kwargs) -> Any:
+        """generate() awaiting the async client"""
+        model = self.model_for(call_type)
+        text = await self.async_client.generate(prompt, model=model, **kwargs)
+        escalate, value = self._accept(call_type, model, text, parse)
+        if not escalate:
+            return value
+        text = await self.async_client.generate(prompt, model=self.default_model, **kwargs)
+        return self._accept(call_type, self.default_model, text, parse)[1]
+
+    def _accept(self, call_type: str, model: str, text: str,
+                parse: Optional[Callable[[str], Any]]) -> Tuple[bool, Any]:
+        """Count a reply and parse it; returns (True, None) if the call should be repeated on the default model"""
+        self._count("calls")
+        if parse is None:
+            return False, text
+        try:
+            return False, parse(text)
+        except PARSE_ERRORS as e:
+            self._count("validation_failures")
+            if not self.cascade or model == self.default_model:
+                raise ValidationFailed(f"{call_type} output from {model} failed validation: {e}", text) from e
+            logger.warning(f"{call_type}: output from {model} failed validation ({e}), "
+                           f"escalating to {self.default_model}")
+            self._count("escalations")
+            return True, None
+
+    def stream_generate(self, call_type: str, prompt: str, **kwargs):
+        """Stream from the routed model"""
+        self._count("calls")
+        return self.ollama_client.stream_generate(prompt, model=self.model_for(call_type), **kwargs)
+
+    def stream_generate_async(self, call_type: str, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream from the routed model through the async client"""
+        self._count("calls")
+        return self.async_client.stream_generate(prompt, model=self.model_for(call_type), **kwargs)
+
+    @classmethod
+    def _count(cls, key: str):
+        with cls._stats_lock:
+            cls.stats[key] += 1
@@ -1,12 +1,15 @@
 import json
 import pickle
-from dataclasses import dataclass, field, asdict
-from typing import Dict, List, Optional
+from dataclasses import MISSING, dataclass, field, fields, asdict
+from typing import Any, Callable, Dict, List, Optional
 from pathlib import Path
 from datetime import datetime
 import os
 
-from config import SAVE_DIR
+from config import SAVE_DIR, SAVE_FORMAT
+from src.tracing import traced
+
+SAVE_PATTERNS = ("*.pkl", "*.journal", "*.novel", "*.snapshot")
 
 @dataclass
 class StyleGuide:
@@ -50,6 +53,54 @@ class ChapterPlan:
     conflicts: List[str] = field(default_factory=list)
     resolutions: List[str] = field(default_factory=list)
 
+@dataclass
+class OutlineEntry:
+    title: str = ""
+    summary: str = ""  # One or two sentences
+
+@dataclass
+class ChapterOutline:
+    chapters: List[OutlineEntry] = field(default_factory=list)
+
+@dataclass
+class ActOutline:
+    acts: List[OutlineEntry] = field(default_factory=list)
+
+@dataclass
+class SequenceOutline:
+    sequences: List[OutlineEntry] = field(default_factory=list)
+
+@dataclass
+class ActSequence:
+    """A run of consecutive chapters within an act"""
+    number: int
+    title: str = ""
+    summary: str = ""
+    first_chapter: int = 0
+    last_chapter: int = 0
+
+@dataclass
+class Act:
+    number: int
+    title: str = ""
+    summary: str = ""
+    sequences: List[ActSequence] = field(default_factory=list)
+    
+    @property
+    def first_chapter(self) -> int:
+        return self.sequences[0].first_chapter if self.sequences else 0
+    
+    @property
+    def last_chapter(self) -> int:
+        return self.sequences[-1].last_chapter if self.sequences else 0
+    
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> 'Act':
+        """Rebuild an act from its asdict() form"""
+        data = dict(data)
+        data["sequences"] = [ActSequence(**s) for s in data.get("sequences", [])]
+        return Act(**data)
+
 @dataclass
 class Chapter:
     number: int
@@ -57,6 +108,44 @@ class Chapter:
     plan: Optional[ChapterPlan] = None
     content: str = ""
     status: str = "planned"  # planned, writing, completed
+    summary: str = ""  # Compact summary used as memory when writing later chapters
+    
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> 'Chapter':
+        """Rebuild a chapter from its asdict() form"""
+        data = dict(data)
+        if data.get("plan") is not None:
+            data["plan"] = ChapterPlan(**data["plan"])
+        return Chapter(**data)
+    
+    def set_content_loader(self, loader: Callable[[], str]):
+        """Defer loading the chapter body until content is first read"""
+        self.__dict__.pop("content", None)
+        self.__dict__["_content_loader"] = loader
+    
+    def __getstate__(self):
+        # Materialize lazily loaded content, the loader itself cannot be pickled
+        self.content
+        state = self.__dict__.copy()
+        state.pop("_content_loader", None)
+        return state
+
+class _LazyContent:
+    """Chapter.content descriptor that loads the chapter body on first access"""
+    
+    def __get__(self, chapter: Optional[Chapter], owner=None) -> str:
+        if chapter is None:
+            return ""
+        loader = chapter.__dict__.pop("_content_loader", None)
+        if loader is not None:
+            chapter.__dict__["content"] = loader()
+        return chapter.__dict__.get("content", "")
+    
+    def __set__(self, chapter: Chapter, value: str):
+        chapter.__dict__.pop("_content_loader", None)
+        chapter.__dict__["content"] = value
+
+Chapter.content = _LazyContent()
 
 @dataclass
 class Novel:
@@ -68,21 +157,79 @@ class Novel:
     characters: Dict[str, Character] = field(default_factory=dict)
     chapters: List[Chapter] = field(default_factory=list)
     status: str = "idea"  # idea, planning, writing, reviewing, completed
+    story_digest: str = ""  # Compressed summary of chapters 1..digest_through
+    digest_through: int = 0
+    acts: List[Act] = field(default_factory=list)  # Act and sequence structure over the chapters, if planned hierarchically
+    
+    def __getstate__(self):
+        # The open journal is tied to this process, never pickle it
+        state = self.__dict__.copy()
+        state.pop("_journal", None)
+        return state
     
-    def save(self) -> str:
-        """Save the novel to a file"""
+    def __setstate__(self, state):
+        # Pickles from before a field existed lack it; fields with a default factory have no class-level fallback
+        for f in fields(self):
+            if f.name not in state and f.default_factory is not MISSING:
+                state[f.name] = f.default_factory()
+        self.__dict__.update(state)
+    
+    @traced("Novel.save", "io")
+    def save(self, update_catalog: bool = True) -> str:
+        """Save the novel to a file
+        
+        Mid-stage journal checkpoints pass update_catalog=False: rewriting the
+        catalog would cost the size of the novel on every chapter, and a stale
+        entry is re-indexed on the next listing anyway.
+        """
+        from src.save_format import SaveCatalog, write_archive
+        
+        if SAVE_FORMAT == "journal":
+            from src.journal import NovelJournal
+            save_path = Path(NovelJournal.for_novel(self).checkpoint(self))
+            if update_catalog:
+                SaveCatalog().update(save_path, self)
+            return str(save_path)
+        
+        if SAVE_FORMAT == "snapshot":
+            from src.snapshot_store import SnapshotStore
+            save_path = SnapshotStore().save(self)
+            SaveCatalog().update(save_path, self)
+            return str(save_path)
+        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        
+        if SAVE_FORMAT == "archive":
+            save_path = SAVE_DIR / f"{self.title.replace(' ', '_')}_{timestamp}.novel"
+            write_archive(self, save_path)
+            SaveCatalog().update(save_path, self)
+            return str(save_path)
+        
         filename = f"{self.title.replace(' ', '_')}_{timestamp}.pkl"
         save_path = SAVE_DIR / filename
         
         with open(save_path, 'wb') as f:
             pickle.dump(self, f)
         
+        SaveCatalog().update(save_path, self)
         return str(save_path)
     
     @staticmethod
+    @traced("Novel.load", "io")
     def load(filepath: str) -> 'Novel':
         """Load a novel from a file"""
+        if Path(filepath).suffix == ".journal":
+            from src.journal import NovelJournal
+            return NovelJournal(Path(filepath)).load()
+        
+        if Path(filepath).suffix == ".novel":
+            from src.save_format import read_archive
+            return read_archive(Path(filepath))
+        
+        if Path(filepath).suffix == ".snapshot":
+            from src.snapshot_store import SnapshotStore
+            return SnapshotStore(Path(filepath).parent).load(Path(filepath))
+        
         with open(filepath, 'rb') as f:
             novel = pickle.load(f)
         
@@ -91,12 +238,35 @@ class Novel:
     @staticmethod
     def list_saves() -> List[Path]:
         """List all saved novels"""
-        return sorted(Path(SAVE_DIR).glob("*.pkl"))
+        save_dir = Path(SAVE_DIR)
+        return sorted(path for pattern in SAVE_PATTERNS for path in save_dir.glob(pattern))
+    
+    @staticmethod
+    def list_save_info() -> List[Dict[str, Any]]:
+        """List saved novels with their metadata, without loading chapter content"""
+        from src.save_format import SaveCatalog
+        return SaveCatalog().entries(Novel.list_saves())
     
     def to_json(self) -> str:
         """Convert the novel to JSON string"""
         return json.dumps(asdict(self), ensure_ascii=False, indent=2)
     
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> 'Novel':
+        """Rebuild a novel from its asdict() form"""
+        data = dict(data)
+        if data.get("style_guide") is not None:
+            data["style_guide"] = StyleGuide(**data["style_guide"])
+        if data.get("world_lore") is not None:
+            data["world_lore"] = WorldLore(**data["world_lore"])
+        if data.get("plot") is not None:
+            data["plot"] = Plot(**data["plot"])
+        data["characters"] = {name: Character(**c) for name, c in data.get("characters", {}).items()}
+        data["chapters"] = [Chapter.from_dict(c) for c in data.get("chapters", [])]
+        data["acts"] = [Act.from_dict(a) for a in data.get("acts", [])]
+        return Novel(**data)
+    
+    @traced("Novel.export_to_markdown", "io")
     def export_to_markdown(self, output_path: Optional[str] = None) -> str:
         """Export the novel to a Markdown file"""
         if output_path is None:
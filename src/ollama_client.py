@@ -1,74 +1,356 @@
 import json
 import logging
+import random
+import threading
+import time
 import requests
-from typing import Dict, List, Optional, Any
-import re
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, Iterator, List, Optional, Any
 
-from config import OLLAMA_API_HOST
+from config import (
+    OLLAMA_API_HOST,
+    OLLAMA_POOL_SIZE,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_READ_TIMEOUT,
+    OLLAMA_MAX_RETRIES,
+    OLLAMA_BACKOFF_BASE,
+    OLLAMA_BACKOFF_MAX,
+    OLLAMA_SEED,
+    OLLAMA_KEEP_ALIVE,
+    TELEMETRY_ENABLED
+)
+from src.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.host_pool import HostLease, HostPool
+from src.response_cache import ResponseCache
+from src.telemetry import current_tags, telemetry
+from src.tracing import span
+from src.utils import filter_think_stream, remove_think_tags
 
 logger = logging.getLogger(__name__)
 
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
 class OllamaClient:
-    def __init__(self, model: str, api_host: str = OLLAMA_API_HOST):
+    def __init__(self, model: str, api_host: str = OLLAMA_API_HOST, session: Optional[requests.Session] = None,
+                 connect_timeout: float = OLLAMA_CONNECT_TIMEOUT, read_timeout: float = OLLAMA_READ_TIMEOUT,
+                 max_retries: int = OLLAMA_MAX_RETRIES, circuit_breaker: Optional[CircuitBreaker] = None,
+                 cache: Optional[ResponseCache] = None, host_pool: Optional[HostPool] = None):
         self.model = model
         self.api_host = api_host
+        self.host_pool = host_pool  # When set, requests are routed across its hosts instead of api_host
+        self.session = session or self._create_session()
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.cache = cache
+        self.stats = {"requests": 0, "retries": 0, "timeouts": 0, "failures": 0}
+        self._stats_lock = threading.Lock()
         logger.info(f"Initialized Ollama client with model: {model}")
-    
-    def generate(self, prompt: str, system: Optional[str] = None, temperature: float = 0.7) -> str:
-        """Generate text using Ollama API"""
-        url = f"{self.api_host}/api/generate"
-        
+
+    @staticmethod
+    def _create_session() -> requests.Session:
+        """Create a keep-alive session with a bounded connection pool"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=OLLAMA_POOL_SIZE, pool_maxsize=OLLAMA_POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+
+    def generate(self, prompt: str, system: Optional[str] = None, temperature: float = 0.7,
+                 on_token: Optional[Callable[[str], None]] = None, options: Optional[Dict[str, Any]] = None,
+                 model: Optional[str] = None, response_format: Optional[Any] = None) -> str:
+        """Generate text using Ollama API
+
+        If on_token is given the response is streamed and on_token is called
+        with each visible chunk as it arrives. model overrides the client's
+        model for this call. response_format is sent as Ollama's format, "json"
+        or a JSON schema the reply must follow.
+        """
+        if on_token is not None:
+            return self._collect(self.stream_generate(prompt, system, temperature, options, model, response_format),
+                                 on_token)
+
+        model = model or self.model
+        with span("ollama.generate", "llm", **self._span_args(len(prompt), model)):
+            return self._generate(prompt, system, temperature, options, model, response_format)
+
+    def _generate(self, prompt: str, system: Optional[str], temperature: float,
+                  options: Optional[Dict[str, Any]], model: str, response_format: Optional[Any] = None) -> str:
+        payload = self._generate_payload(prompt, system, self._options(temperature, options), model, stream=False,
+                                         response_format=response_format)
+
+        def request() -> str:
+            try:
+                logger.debug("Sending request to Ollama API: /api/generate")
+                started = time.perf_counter()
+                response = self._post("/api/generate", payload)
+                result = response.json()
+                self._record_metrics(result, "generate", started)
+                generated_text = result.get("response", "")
+                logger.debug(f"Generated {len(generated_text)} characters")
+
+                return remove_think_tags(generated_text)
+
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Error calling Ollama API: {e}")
+                raise
+
+        return self._cached(payload, request)
+
+    def chat(self, messages: List[Dict[str, str]], system: Optional[str] = None, temperature: float = 0.7,
+             on_token: Optional[Callable[[str], None]] = None, options: Optional[Dict[str, Any]] = None,
+             model: Optional[str] = None, response_format: Optional[Any] = None) -> str:
+        """Chat using Ollama API
+
+        If on_token is given the response is streamed and on_token is called
+        with each visible chunk as it arrives. model overrides the client's
+        model for this call. response_format is sent as Ollama's format.
+        """
+        if on_token is not None:
+            return self._collect(self.stream_chat(messages, system, temperature, options, model, response_format),
+                                 on_token)
+
+        model = model or self.model
+        prompt_chars = sum(len(message.get("content", "")) for message in messages)
+        with span("ollama.chat", "llm", **self._span_args(prompt_chars, model)):
+            return self._chat(messages, system, temperature, options, model, response_format)
+
+    def _chat(self, messages: List[Dict[str, str]], system: Optional[str], temperature: float,
+              options: Optional[Dict[str, Any]], model: str, response_format: Optional[Any] = None) -> str:
+        payload = self._chat_payload(messages, system, self._options(temperature, options), model, stream=False,
+                                     response_format=response_format)
+
+        def request() -> str:
+            try:
+                logger.debug("Sending chat request to Ollama API: /api/chat")
+                started = time.perf_counter()
+                response = self._post("/api/chat", payload)
+                result = response.json()
+                self._record_metrics(result, "chat", started)
+                message = result.get("message", {})
+                content = message.get("content", "")
+                logger.debug(f"Generated {len(content)} characters")
+
+                return remove_think_tags(content)
+
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Error calling Ollama API: {e}")
+                raise
+
+        return self._cached(payload, request)
+
+    def stream_generate(self, prompt: str, system: Optional[str] = None, temperature: float = 0.7,
+                        options: Optional[Dict[str, Any]] = None, model: Optional[str] = None,
+                        response_format: Optional[Any] = None) -> Iterator[str]:
+        """Stream generated text chunk by chunk, with think spans removed"""
+        payload = self._generate_payload(prompt, system, self._options(temperature, options), model or self.model,
+                                         stream=True, response_format=response_format)
+        return self._cached_stream(payload, lambda: filter_think_stream(
+            self._stream("/api/generate", payload, lambda result: result.get("response", ""))))
+
+    def stream_chat(self, messages: List[Dict[str, str]], system: Optional[str] = None,
+                    temperature: float = 0.7, options: Optional[Dict[str, Any]] = None,
+                    model: Optional[str] = None, response_format: Optional[Any] = None) -> Iterator[str]:
+        """Stream a chat reply chunk by chunk, with think spans removed"""
+        payload = self._chat_payload(messages, system, self._options(temperature, options), model or self.model,
+                                     stream=True, response_format=response_format)
+        return self._cached_stream(payload, lambda: filter_think_stream(
+            self._stream("/api/chat", payload, lambda result: result.get("message", {}).get("content", ""))))
+
+    @staticmethod
+    def _options(temperature: float, options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge sampling settings into Ollama's options object"""
+        merged: Dict[str, Any] = {"temperature": temperature}
+        if OLLAMA_SEED is not None:
+            merged["seed"] = OLLAMA_SEED
+        merged.update(options or {})
+        return merged
+
+    @staticmethod
+    def _generate_payload(prompt: str, system: Optional[str], options: Dict[str, Any], model: str,
+                          stream: bool, response_format: Optional[Any] = None) -> Dict[str, Any]:
         payload = {
-            "model": self.model,
+            "model": model,
             "prompt": prompt,
-            "temperature": temperature,
-            "stream": False
+            "options": options,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "stream": stream
         }
-        
+
         if system:
             payload["system"] = system
-        
-        try:
-            logger.debug(f"Sending request to Ollama API: {url}")
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            
-            result = response.json()
-            generated_text = result.get("response", "")
-            logger.debug(f"Generated {len(generated_text)} characters")
-            
-            return re.sub(r'\s*<think>[\s\S]*?</think>\s*', generated_text, '')
-        
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error calling Ollama API: {e}")
-            raise
-    
-    def chat(self, messages: List[Dict[str, str]], system: Optional[str] = None, temperature: float = 0.7) -> str:
-        """Chat using Ollama API"""
-        url = f"{self.api_host}/api/chat"
-        
+        if response_format is not None:
+            payload["format"] = response_format
+        return payload
+
+    @staticmethod
+    def _chat_payload(messages: List[Dict[str, str]], system: Optional[str], options: Dict[str, Any], model: str,
+                      stream: bool, response_format: Optional[Any] = None) -> Dict[str, Any]:
         payload = {
-            "model": self.model,
+            "model": model,
             "messages": messages,
-            "temperature": temperature,
-            "stream": False
+            "options": options,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "stream": stream
         }
-        
+
         if system:
             payload["system"] = system
-        
+        if response_format is not None:
+            payload["format"] = response_format
+        return payload
+
+    def _cached(self, payload: Dict[str, Any], request: Callable[[], str]) -> str:
+        """Serve a non-streaming request from the response cache when allowed"""
+        if self.cache is None or not self.cache.is_cacheable(payload["options"]):
+            return request()
+        return self.cache.get_or_compute(self.cache.key(payload), request)
+
+    def _cached_stream(self, payload: Dict[str, Any], open_stream: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """Replay a cached response as a single chunk, or record a fresh stream into the cache"""
+        if self.cache is None or not self.cache.is_cacheable(payload["options"]):
+            return open_stream()
+        return self.cache.replay_or_record(self.cache.key(payload), open_stream)
+
+    def _stream(self, path: str, payload: Dict[str, Any], extract: Callable[[Dict[str, Any]], str]) -> Iterator[str]:
+        """Yield raw text chunks from an NDJSON streaming response"""
+        endpoint = path.rsplit("/", 1)[-1]
+        prompt_chars = len(payload.get("prompt", "")) or sum(len(m.get("content", "")) for m in payload.get("messages", []))
+        lease: Optional[HostLease] = None
+        completed = False
         try:
-            logger.debug(f"Sending chat request to Ollama API: {url}")
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            
-            result = response.json()
-            message = result.get("message", {})
-            content = message.get("content", "")
-            logger.debug(f"Generated {len(content)} characters")
-            
-            return re.sub(r'\s*<think>[\s\S]*?</think>\s*', content, '')
-        
+            logger.debug(f"Sending streaming request to Ollama API: {path}")
+            started = time.perf_counter()
+            with span(f"ollama.stream_{endpoint}", "llm", **self._span_args(prompt_chars, payload["model"])) as span_args, \
+                    self._post(path, payload, stream=True) as response:
+                lease = getattr(response, "host_lease", None)
+                received = 0
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    result = json.loads(line)
+                    if "error" in result:
+                        raise RuntimeError(f"Ollama stream error: {result['error']}")
+                    text = extract(result)
+                    received += len(text)
+                    if text:
+                        yield text
+                    if result.get("done"):
+                        self._record_metrics(result, endpoint, started)
+                        break
+                span_args["response_chars"] = received
+                logger.debug(f"Streamed {received} characters")
+                completed = True
+
         except requests.exceptions.RequestException as e:
             logger.error(f"Error calling Ollama API: {e}")
             raise
+        except GeneratorExit:
+            completed = True  # The caller stopped reading, the host did nothing wrong
+            raise
+        finally:
+            # A pooled host stays busy until its stream has been read to the end
+            if lease is not None:
+                self.host_pool.release(lease, success=completed)
+
+    def _post(self, path: str, payload: Dict[str, Any], stream: bool = False) -> requests.Response:
+        """POST with timeouts, exponential-backoff retries and the circuit breaker
+
+        Streaming requests are only retried until the response headers arrive;
+        a stream that fails part-way is not replayed. With a host pool every
+        attempt is routed separately, so a retry can land on another host, and
+        each host's own circuit breaker is used instead of the client's; a
+        streaming response carries its lease as `host_lease` for the caller to release.
+        """
+        with span("ollama.post", "http", path=path, stream=stream):
+            return self._post_with_retries(path, payload, stream)
+
+    def _post_with_retries(self, path: str, payload: Dict[str, Any], stream: bool) -> requests.Response:
+        attempt = 0
+        while True:
+            if self.host_pool:
+                lease: Optional[HostLease] = self.host_pool.acquire(payload["model"])
+                breaker = lease.host.breaker
+            else:
+                lease, breaker = None, self.circuit_breaker
+                if not breaker.allow():
+                    raise CircuitOpenError(f"Circuit open for {self.api_host}, not sending request")
+
+            url = f"{lease.url if lease else self.api_host}{path}"
+            self._count("requests")
+            served = False  # Whether the host answered 2xx, so it has the model
+            answered = False  # Whether the host rejected the request itself, a client error rather than a host fault
+            try:
+                response = self.session.post(url, json=payload, stream=stream, timeout=self.timeout)
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    response.close()
+                    raise requests.exceptions.HTTPError(f"{response.status_code} from {url}", response=response)
+                response.raise_for_status()
+                breaker.record_success()
+                served = True
+                if lease is not None and stream:
+                    response.host_lease = lease
+                    lease = None  # Released by the caller once the stream has been read
+                return response
+
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.HTTPError) as e:
+                if isinstance(e, requests.exceptions.Timeout):
+                    self._count("timeouts")
+                retryable = not isinstance(e, requests.exceptions.HTTPError) or (
+                    e.response is not None and e.response.status_code in RETRYABLE_STATUS_CODES)
+                if not retryable:
+                    # The server answered, so this still settles a half-open circuit's trial request
+                    breaker.record_success()
+                    answered = True
+                    raise
+                self._count("failures")
+                breaker.record_failure()
+                if attempt >= self.max_retries:
+                    logger.error(f"Giving up on {url} after {attempt + 1} attempts ({self.stats})")
+                    raise
+                delay = min(OLLAMA_BACKOFF_MAX, OLLAMA_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+                attempt += 1
+                self._count("retries")
+                logger.warning(f"Transient error calling {url}: {e}; retry {attempt}/{self.max_retries} "
+                               f"in {delay:.1f}s ({self.stats})")
+
+            except BaseException:
+                # Any other error (e.g. ChunkedEncodingError) is not retried, but must still settle the
+                # breaker, or a failed half-open trial would leave the circuit refusing every request
+                self._count("failures")
+                breaker.record_failure()
+                raise
+
+            finally:
+                # However the attempt ended, the host is no longer busy with it
+                if lease is not None:
+                    self.host_pool.release(lease, success=served, answered=answered)
+
+            time.sleep(delay)
+
+    @staticmethod
+    def _span_args(prompt_chars: int, model: str) -> Dict[str, Any]:
+        """Trace span arguments: model, prompt size and the telemetry stage/chapter tags"""
+        return {"model": model, "prompt_chars": prompt_chars, **current_tags()}
+
+    def _record_metrics(self, result: Dict[str, Any], endpoint: str, started: float):
+        """Hand Ollama's timing fields to the run telemetry, tagged with the calling stage"""
+        if TELEMETRY_ENABLED:
+            telemetry.record(result, endpoint, result.get("model", self.model), time.perf_counter() - started)
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def _collect(chunks: Iterator[str], on_token: Callable[[str], None]) -> str:
+        parts = []
+        for chunk in chunks:
+            on_token(chunk)
+            parts.append(chunk)
+        return "".join(parts)
@@ -0,0 +1,119 @@
+import difflib
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.structured_output import parse_object, schema_for
+from config import REVIEW_EDIT_MATCH_RATIO
+
+# Typographic characters models swap freely when quoting a passage
+_FOLD = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"', "–": "-", "—": "-"})
+_WORD = re.compile(r"\S+")
+
+@dataclass
+class TextEdit:
+    find: str  # Passage of the original text to replace
+    replace: str
+
+@dataclass
+class PatchResult:
+    text: str
+    applied: int = 0
+    fuzzy: int = 0  # Edits whose anchor was only found approximately
+    failed: List[TextEdit] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return self.applied + len(self.failed)
+
+def edits_schema() -> Dict[str, Any]:
+    """JSON schema of an edit script reply"""
+    return {"type": "object", "properties": {"edits": {"type": "array", "items": schema_for(TextEdit)}},
+            "required": ["edits"]}
+
+def parse_edits(text: str) -> List[TextEdit]:
+    """Parse an edit script reply, raising ValueError if it is malformed"""
+    edits = parse_object(text).get("edits")
+    if not isinstance(edits, list):
+        raise ValueError("expected an edits list")
+    result = []
+    for edit in edits:
+        if not isinstance(edit, dict) or not isinstance(edit.get("find"), str) or not isinstance(edit.get("replace"), str):
+            raise ValueError(f"malformed edit: {edit!r}")
+        if edit["find"].strip():
+            result.append(TextEdit(edit["find"], edit["replace"]))
+    return result
+
+def apply_edits(text: str, edits: List[TextEdit], min_ratio: float = REVIEW_EDIT_MATCH_RATIO) -> PatchResult:
+    """Apply edits in order, locating each anchor exactly, then ignoring whitespace and quote style, then fuzzily"""
+    result = PatchResult(text)
+    for edit in edits:
+        located = locate(result.text, edit.find, min_ratio)
+        if located is None:
+            result.failed.append(edit)
+            continue
+        start, end, exact = located
+        result.text = result.text[:start] + edit.replace + result.text[end:]
+        result.applied += 1
+        if not exact:
+            result.fuzzy += 1
+    return result
+
+def locate(text: str, anchor: str, min_ratio: float = REVIEW_EDIT_MATCH_RATIO) -> Optional[Tuple[int, int, bool]]:
+    """Find an anchor's span in text; returns (start, end, exact) or None"""
+    start = text.find(anchor)
+    if start != -1:
+        return start, start + len(anchor), True
+    span = _locate_normalized(text, anchor)
+    if span is not None:
+        return span[0], span[1], False
+    span = _locate_fuzzy(text, anchor, min_ratio)
+    if span is not None:
+        return span[0], span[1], False
+    return None
+
+def _normalize(text: str) -> Tuple[str, List[int]]:
+    """Collapse whitespace and fold quotes and dashes; returns the text and each character's original index"""
+    chars: List[str] = []
+    index: List[int] = []
+    for i, char in enumerate(text.translate(_FOLD)):
+        if char.isspace():
+            if not chars or chars[-1] == " ":
+                continue
+            char = " "
+        chars.append(char)
+        index.append(i)
+    return "".join(chars), index
+
+def _locate_normalized(text: str, anchor: str) -> Optional[Tuple[int, int]]:
+    normalized_anchor = _normalize(anchor)[0].strip()
+    if not normalized_anchor:
+        return None
+    normalized, index = _normalize(text)
+    start = normalized.find(normalized_anchor)
+    if start == -1:
+        return None
+    return index[start], index[start + len(normalized_anchor) - 1] + 1
+
+def _locate_fuzzy(text: str, anchor: str, min_ratio: float) -> Optional[Tuple[int, int]]:
+    """Best-matching run of words of about the anchor's length, if it is similar enough"""
+    words = list(_WORD.finditer(text))
+    anchor_words = len(_WORD.findall(anchor))
+    if not words or not anchor_words:
+        return None
+
+    folded = [match.group().translate(_FOLD) for match in words]
+    matcher = difflib.SequenceMatcher(autojunk=False)
+    matcher.set_seq2(_normalize(anchor)[0].strip())
+    best_ratio, best_span = min_ratio, None
+    for size in {max(1, anchor_words - 1), anchor_words, anchor_words + 1}:
+        for first in range(0, len(words) - size + 1):
+            start, end = words[first].start(), words[first + size - 1].end()
+            matcher.set_seq1(" ".join(folded[first:first + size]))
+            # The cheap upper bounds skip most windows before the full comparison
+            if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio > best_ratio or (ratio == best_ratio and best_span is None):
+                best_ratio, best_span = ratio, (start, end)
+    return best_span
@@ -0,0 +1,26 @@
+from src.novel import Novel
+from prompts.novel_context import NOVEL_CONTEXT
+
+def novel_context(novel: Novel) -> str:
+    """Render the shared novel context block
+
+    The block only depends on the planning artifacts, so it is byte-identical
+    for every chapter of the same novel.
+    """
+    return NOVEL_CONTEXT.format(
+        novel_title=novel.title,
+        idea=novel.idea,
+        style_guide=novel.style_guide,
+        world_lore=novel.world_lore,
+        plot=novel.plot,
+        characters=novel.characters
+    )
+
+def build_prompt(novel: Novel, template: str, **fields) -> str:
+    """Build a prompt as shared novel context followed by the task template
+
+    Task templates keep their fixed instructions first and per-call material
+    (chapter number, plan, content) last, so consecutive calls share the
+    longest possible prefix.
+    """
+    return novel_context(novel) + template.format(**fields)
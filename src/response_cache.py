@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from config import LLM_CACHE_DIR, LLM_CACHE_MAX_BYTES, LLM_CACHE_POLICY
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """On-disk LLM response cache with LRU eviction and single-flight requests
+
+    Entries are stored one file per key, where the key is a hash of the full
+    request (model, system, prompt or messages, options). Concurrent identical
+    requests share a single upstream call.
+    """
+
+    def __init__(self, cache_dir: Path = LLM_CACHE_DIR, max_bytes: int = LLM_CACHE_MAX_BYTES,
+                 policy: str = LLM_CACHE_POLICY):
+        if policy not in ("deterministic", "always"):
+            raise ValueError(f"Unknown cache policy: {policy}")
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size, least recently used first
+        self._total_bytes = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+        logger.info(f"Response cache at {self.cache_dir}: {len(self._entries)} entries, {self._total_bytes} bytes")
+
+    def _load_index(self):
+        """Rebuild the LRU order from file modification times, which hits refresh"""
+        files = sorted(self.cache_dir.glob("*.txt"), key=lambda path: path.stat().st_mtime)
+        for path in files:
+            size = path.stat().st_size
+            self._entries[path.stem] = size
+            self._total_bytes += size
+
+    @staticmethod
+    def key(request: Dict[str, Any]) -> str:
+        """Hash a request payload, ignoring transport-only fields"""
+        material = {k: v for k, v in request.items() if k not in ("stream", "keep_alive")}
+        encoded = json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def is_cacheable(self, options: Dict[str, Any]) -> bool:
+        """Whether a request with these options may be served from the cache"""
+        if self.policy == "always":
+            return True
+        return options.get("seed") is not None or options.get("temperature") == 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response and mark it recently used"""
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        try:
+            value = path.read_text(encoding="utf-8")
+            os.utime(path)
+            return value
+        except OSError:
+            with self._lock:
+                self._forget(key)
+            return None
+
+    def put(self, key: str, value: str):
+        """Store a response, evicting least recently used entries over the size cap"""
+        path = self._path(key)
+        # Unique per process and thread, since several processes may share the cache directory
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_text(value, encoding="utf-8")
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        size = path.stat().st_size
+
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._forget(oldest)
+                self._path(oldest).unlink(missing_ok=True)
+                self.stats["evictions"] += 1
+
+    def get_or_compute(self, key: str, compute: Callable[[], str]) -> str:
+        """Return the cached value, or compute it once for all concurrent callers"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            if key in self._entries:
+                # Stored by another caller since our lookup
+                owner, future = False, None
+            else:
+                future = self._in_flight.get(key)
+                owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+            elif future is not None:
+                self.stats["coalesced"] += 1
+
+        if future is None:
+            return self.get(key) or self.get_or_compute(key, compute)
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def replay_or_record(self, key: str, open_stream: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """Yield a cached response as one chunk, or pass a live stream through and cache it when complete"""
+        cached = self.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        for chunk in open_stream():
+            parts.append(chunk)
+            yield chunk
+        self.put(key, "".join(parts))
+
+    def _forget(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.txt"
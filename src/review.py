@@ -1,30 +1,160 @@
+import asyncio
+import bisect
 import logging
+from dataclasses import dataclass
+from typing import List
 
 from src.ollama_client import OllamaClient
-from src.novel import Novel
-from prompts.review import FINAL_REVIEW_SYSTEM
+from src.novel import Novel, Chapter
+from src.model_router import ModelRouter
+from src.prompt_builder import build_prompt
+from src.telemetry import tag, tagged
+from src.utils import map_concurrently
+from prompts.review import FINAL_REVIEW_SYSTEM, CHAPTER_NOTES_SYSTEM, MERGE_NOTES_SYSTEM
+from config import REVIEW_CONCURRENCY, REVIEW_GROUP_SIZE, REVIEW_NOTES_WORDS
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class ReviewNotes:
+    first_chapter: int
+    last_chapter: int
+    notes: str
+
+    @property
+    def span(self) -> str:
+        if self.first_chapter == self.last_chapter:
+            return f"Chapter {self.first_chapter}"
+        return f"Chapters {self.first_chapter}-{self.last_chapter}"
+
 class FinalReviewStage:
-    def __init__(self, ollama_client: OllamaClient):
+    def __init__(self, ollama_client: OllamaClient, concurrency: int = REVIEW_CONCURRENCY,
+                 group_size: int = REVIEW_GROUP_SIZE):
         self.ollama_client = ollama_client
+        self.router = ModelRouter(ollama_client)
+        self.concurrency = concurrency
+        self.group_size = max(2, group_size)
     
+    @tagged(stage="final_review")
     def conduct_final_review(self, novel: Novel) -> str:
         """Conduct final review of the novel"""
         logger.info("Starting final review...")
         
-        prompt = FINAL_REVIEW_SYSTEM.format(
+        # Map: review each chapter on its own, so no prompt holds more than one chapter
+        notes = map_concurrently(
+            lambda chapter: self._review_chapter(novel, chapter),
+            novel.chapters,
+            self.concurrency
+        )
+        
+        # Reduce: merge notes in bounded groups until one group remains
+        while len(notes) > self.group_size:
+            groups = self._group_notes(novel, notes)
+            logger.info(f"Merging {len(notes)} review notes into {len(groups)} groups")
+            notes = map_concurrently(
+                lambda group: group[0] if len(group) == 1 else self._merge_notes(novel, group),
+                groups,
+                self.concurrency
+            )
+        
+        final_review_result = self.router.generate("final_review", self._final_prompt(novel, notes))
+        
+        logger.info("Final review completed")
+        return final_review_result
+    
+    @tagged(stage="final_review")
+    async def conduct_final_review_async(self, novel: Novel) -> str:
+        """conduct_final_review() awaiting the async client, with each round of the map-reduce gathered"""
+        logger.info("Starting final review...")
+        
+        notes = list(await asyncio.gather(*(self._review_chapter_async(novel, chapter) for chapter in novel.chapters)))
+        
+        while len(notes) > self.group_size:
+            groups = self._group_notes(novel, notes)
+            logger.info(f"Merging {len(notes)} review notes into {len(groups)} groups")
+            notes = list(await asyncio.gather(*(self._merge_notes_async(novel, group) for group in groups)))
+        
+        final_review_result = await self.router.generate_async("final_review", self._final_prompt(novel, notes))
+        
+        logger.info("Final review completed")
+        return final_review_result
+    
+    def _final_prompt(self, novel: Novel, notes: List[ReviewNotes]) -> str:
+        return FINAL_REVIEW_SYSTEM.format(
             novel_title=novel.title,
             novel_idea=novel.idea,
             style_guide=novel.style_guide,
             world_lore=novel.world_lore,
             plot=novel.plot,
             characters=novel.characters,
-            chapters="\n\n".join([f"Chapter {chap.number}:\n{chap.content}" for chap in novel.chapters])
+            review_notes=self._format_notes(notes)
         )
+    
+    def _review_chapter(self, novel: Novel, chapter: Chapter) -> ReviewNotes:
+        """Write review notes for a single chapter"""
+        with tag(chapter=chapter.number):
+            notes = self.router.generate("review_notes", self._notes_prompt(novel, chapter))
+        return ReviewNotes(chapter.number, chapter.number, notes)
+    
+    async def _review_chapter_async(self, novel: Novel, chapter: Chapter) -> ReviewNotes:
+        with tag(chapter=chapter.number):
+            notes = await self.router.generate_async("review_notes", self._notes_prompt(novel, chapter))
+        return ReviewNotes(chapter.number, chapter.number, notes)
+    
+    @staticmethod
+    def _notes_prompt(novel: Novel, chapter: Chapter) -> str:
+        logger.info(f"Reviewing Chapter {chapter.number} for the final review")
+        return build_prompt(
+            novel,
+            CHAPTER_NOTES_SYSTEM,
+            max_words=REVIEW_NOTES_WORDS,
+            chapter_number=chapter.number,
+            chapter_title=chapter.title,
+            chapter_content=chapter.content
+        )
+    
+    def _group_notes(self, novel: Novel, notes: List[ReviewNotes]) -> List[List[ReviewNotes]]:
+        """Consecutive notes in groups of at most group_size, kept within acts while acts have several notes"""
+        plain = [notes[i:i + self.group_size] for i in range(0, len(notes), self.group_size)]
+        if not novel.acts:
+            return plain
         
-        final_review_result = self.ollama_client.generate(prompt)
-        
-        logger.info("Final review completed")
-        return final_review_result
+        act_ends = [act.last_chapter for act in novel.acts]
+        groups: List[List[ReviewNotes]] = []
+        group_act = None
+        for note in notes:
+            act = bisect.bisect_left(act_ends, note.first_chapter)
+            if act != bisect.bisect_left(act_ends, note.last_chapter):
+                act = None  # Spans acts already, so it only merges with its neighbours in plain groups
+            if groups and act is not None and act == group_act and len(groups[-1]) < self.group_size:
+                groups[-1].append(note)
+            else:
+                groups.append([note])
+                group_act = act
+        # Once every act is down to one note, the acts' notes are merged across act boundaries
+        return plain if len(groups) == len(notes) else groups
+    
+    def _merge_notes(self, novel: Novel, group: List[ReviewNotes]) -> ReviewNotes:
+        """Merge the notes of consecutive chapters into one set of notes"""
+        merged = ReviewNotes(group[0].first_chapter, group[-1].last_chapter, "")
+        merged.notes = self.router.generate("merge_notes", self._merge_prompt(novel, merged, group))
+        return merged
+    
+    async def _merge_notes_async(self, novel: Novel, group: List[ReviewNotes]) -> ReviewNotes:
+        if len(group) == 1:
+            return group[0]
+        merged = ReviewNotes(group[0].first_chapter, group[-1].last_chapter, "")
+        merged.notes = await self.router.generate_async("merge_notes", self._merge_prompt(novel, merged, group))
+        return merged
+    
+    def _merge_prompt(self, novel: Novel, merged: ReviewNotes, group: List[ReviewNotes]) -> str:
+        return MERGE_NOTES_SYSTEM.format(
+            novel_title=novel.title,
+            span=merged.span,
+            max_words=REVIEW_NOTES_WORDS,
+            notes=self._format_notes(group)
+        )
+    
+    @staticmethod
+    def _format_notes(notes: List[ReviewNotes]) -> str:
+        return "\n\n".join(f"{n.span}:\n{n.notes}" for n in notes)
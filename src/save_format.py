@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import threading
+import zipfile
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from src.novel import Novel
+from config import SAVE_DIR
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMAT = "ai-novel-maker-archive"
+ARCHIVE_VERSION = 1
+HEADER_ENTRY = "header.json"
+CATALOG_FILE = "catalog.json"
+
+_catalog_lock = threading.Lock()
+
+def novel_metadata(novel: Novel) -> Dict[str, Any]:
+    """Summarize a novel for listings"""
+    chapter_words = [len(chapter.content.split()) for chapter in novel.chapters]
+    return {
+        "title": novel.title,
+        "status": novel.status,
+        "chapter_count": len(novel.chapters),
+        "completed_chapters": sum(1 for chapter in novel.chapters if chapter.status == "completed"),
+        "word_count": sum(chapter_words),
+        "chapter_words": chapter_words,
+        "saved_at": datetime.now().isoformat(timespec="seconds")
+    }
+
+def _chapter_entry(number: int) -> str:
+    return f"chapters/{number:04d}.txt"
+
+def write_archive(novel: Novel, path: Path):
+    """Write a novel as a versioned archive
+
+    The archive is a zip file holding a JSON header (metadata plus everything
+    except chapter bodies) and one compressed entry per chapter body, so the
+    header can be read without touching any chapter.
+    """
+    novel_data = asdict(novel)
+    for chapter_data in novel_data["chapters"]:
+        chapter_data.pop("content")
+        chapter_data["content_entry"] = _chapter_entry(chapter_data["number"])
+
+    header = {
+        "format": ARCHIVE_FORMAT,
+        "version": ARCHIVE_VERSION,
+        "metadata": novel_metadata(novel),
+        "novel": novel_data
+    }
+
+    tmp_path = Path(path).with_suffix(".novel.tmp")
+    with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(HEADER_ENTRY, json.dumps(header, ensure_ascii=False))
+        for chapter in novel.chapters:
+            archive.writestr(_chapter_entry(chapter.number), chapter.content)
+    os.replace(tmp_path, path)
+
+def read_archive_header(path: Path) -> Dict[str, Any]:
+    """Read only the header of an archive"""
+    with zipfile.ZipFile(path) as archive:
+        header = json.loads(archive.read(HEADER_ENTRY))
+
+    if header.get("format") != ARCHIVE_FORMAT:
+        raise ValueError(f"{path} is not a novel archive")
+    if header.get("version", 0) > ARCHIVE_VERSION:
+        raise ValueError(f"{path} uses archive version {header['version']}, newer than supported {ARCHIVE_VERSION}")
+    return header
+
+def read_archive(path: Path) -> Novel:
+    """Load a novel from an archive; chapter bodies load on first access"""
+    header = read_archive_header(path)
+    novel_data = header["novel"]
+    entries = {}
+    for chapter_data in novel_data["chapters"]:
+        entries[chapter_data["number"]] = chapter_data.pop("content_entry")
+
+    novel = Novel.from_dict(novel_data)
+    for chapter in novel.chapters:
+        chapter.set_content_loader(_content_loader(path, entries[chapter.number]))
+    return novel
+
+def _content_loader(path: Path, entry: str):
+    def load() -> str:
+        with zipfile.ZipFile(path) as archive:
+            return archive.read(entry).decode("utf-8")
+    return load
+
+class SaveCatalog:
+    """Sidecar index of save metadata, so listing saves does not open them
+
+    Entries are keyed by file name and invalidated by size and modification
+    time; saves without an up-to-date entry are read once and indexed.
+    """
+
+    def __init__(self, save_dir: Path = SAVE_DIR):
+        self.path = Path(save_dir) / CATALOG_FILE
+
+    def update(self, save_path: Path, novel: Novel):
+        """Record the metadata of a save that was just written"""
+        metadata = novel_metadata(novel)
+        with _catalog_lock:
+            catalog = self._read()
+            catalog[Path(save_path).name] = self._entry(Path(save_path), metadata)
+            self._write(catalog)
+
+    def entries(self, saves: List[Path]) -> List[Dict[str, Any]]:
+        """Return metadata for the given saves, indexing any that are new or changed"""
+        with _catalog_lock:
+            catalog = self._read()
+            changed = False
+            result = []
+            for save_path in saves:
+                entry = catalog.get(save_path.name)
+                stat = save_path.stat()
+                if entry is None or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+                    entry = self._entry(save_path, self._read_metadata(save_path))
+                    catalog[save_path.name] = entry
+                    changed = True
+                result.append(dict(entry, path=save_path))
+
+            # Forget saves that no longer exist
+            names = {save_path.name for save_path in saves}
+            for name in [name for name in catalog if name not in names]:
+                del catalog[name]
+                changed = True
+
+            if changed:
+                self._write(catalog)
+        return result
+
+    @staticmethod
+    def _read_metadata(save_path: Path) -> Dict[str, Any]:
+        if save_path.suffix == ".novel":
+            return read_archive_header(save_path)["metadata"]
+        if save_path.suffix == ".snapshot":
+            from src.snapshot_store import SnapshotStore
+            return SnapshotStore.read_manifest(save_path)["metadata"]
+        logger.info(f"Indexing {save_path.name} for the save catalog")
+        return novel_metadata(Novel.load(str(save_path)))
+
+    @staticmethod
+    def _entry(save_path: Path, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        stat = save_path.stat()
+        return dict(metadata, size=stat.st_size, mtime=stat.st_mtime)
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, catalog: Dict[str, Any]):
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(catalog, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import zlib
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Set
+
+from src.novel import Novel
+from src.save_format import novel_metadata
+from config import SAVE_DIR, SNAPSHOT_KEEP
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "ai-novel-maker-snapshot"
+SNAPSHOT_VERSION = 1
+BLOB_FIELDS = ("idea", "style_guide", "world_lore", "plot", "characters", "story_digest", "acts")
+
+_store_lock = threading.RLock()  # Held by save and gc so collection never sees a half-written snapshot
+
+class SnapshotStore:
+    """Content-addressed save store
+
+    Artifacts and chapters are stored once as compressed blobs named by the
+    hash of their content; each snapshot is a small JSON manifest referencing
+    them, so unchanged parts cost nothing to save again.
+    """
+
+    def __init__(self, save_dir: Path = SAVE_DIR):
+        self.save_dir = Path(save_dir)
+        self.objects_dir = self.save_dir / "objects"
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def save(self, novel: Novel) -> Path:
+        """Write a snapshot manifest, storing only blobs not already present"""
+        with _store_lock:
+            path = self._save(novel)
+        if SNAPSHOT_KEEP > 0:
+            self.prune(novel.title, SNAPSHOT_KEEP)
+        return path
+
+    def _save(self, novel: Novel) -> Path:
+        data = asdict(novel)
+        written = 0
+        fields: Dict[str, Any] = {}
+        for name, value in data.items():
+            if name == "chapters":
+                continue
+            if name in BLOB_FIELDS:
+                blob, is_new = self._put(value)
+                fields[name] = {"blob": blob}
+                written += is_new
+            else:
+                fields[name] = value
+
+        chapters = []
+        for chapter_data in data["chapters"]:
+            content = chapter_data.pop("content")
+            content_blob, content_new = self._put(content)
+            chapter_blob, chapter_new = self._put(chapter_data)
+            chapters.append({"number": chapter_data["number"], "blob": chapter_blob, "content": content_blob})
+            written += content_new + chapter_new
+        fields["chapters"] = chapters
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "metadata": novel_metadata(novel),
+            "novel": fields
+        }
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        path = self.save_dir / f"{novel.title.replace(' ', '_')}_{timestamp}.snapshot"
+        self._write_atomic(path, json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+        logger.info(f"Saved snapshot {path.name} ({written} new blobs)")
+        return path
+
+    def load(self, path: Path) -> Novel:
+        """Reassemble a novel from a manifest; chapter bodies load on first access"""
+        manifest = self.read_manifest(path)
+        fields = dict(manifest["novel"])
+        for name in BLOB_FIELDS:
+            if name in fields:
+                fields[name] = self._get(fields[name]["blob"])
+
+        chapter_refs = fields.pop("chapters")
+        fields["chapters"] = [self._get(ref["blob"]) for ref in chapter_refs]
+        novel = Novel.from_dict(fields)
+        for chapter, ref in zip(novel.chapters, chapter_refs):
+            chapter.set_content_loader(self._loader(ref["content"]))
+        return novel
+
+    @staticmethod
+    def read_manifest(path: Path) -> Dict[str, Any]:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path} is not a snapshot manifest")
+        if manifest.get("version", 0) > SNAPSHOT_VERSION:
+            raise ValueError(f"{path} uses snapshot version {manifest['version']}, newer than supported {SNAPSHOT_VERSION}")
+        return manifest
+
+    def manifests(self) -> List[Path]:
+        return sorted(self.save_dir.glob("*.snapshot"))
+
+    def prune(self, title: str, keep: int):
+        """Delete all but the newest `keep` snapshots of a novel, then collect garbage"""
+        with _store_lock:
+            own = [path for path in self.manifests() if self.read_manifest(path)["metadata"]["title"] == title]
+            for path in own[:-keep]:
+                path.unlink(missing_ok=True)
+            if len(own) > keep:
+                self.gc()
+
+    def gc(self) -> int:
+        """Delete blobs no manifest references; returns the number removed"""
+        with _store_lock:
+            referenced: Set[str] = set()
+            for path in self.manifests():
+                fields = self.read_manifest(path)["novel"]
+                referenced.update(fields[name]["blob"] for name in BLOB_FIELDS if name in fields)
+                for ref in fields["chapters"]:
+                    referenced.update((ref["blob"], ref["content"]))
+
+            removed = 0
+            for blob_path in self.objects_dir.glob("*/*"):
+                if blob_path.name not in referenced and not blob_path.name.endswith(".tmp"):
+                    blob_path.unlink(missing_ok=True)
+                    removed += 1
+        logger.info(f"Snapshot garbage collection removed {removed} blobs")
+        return removed
+
+    def _put(self, value: Any):
+        """Store a JSON value by content hash; returns (hash, whether it was new)"""
+        encoded = json.dumps(value, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        blob = hashlib.sha256(encoded).hexdigest()
+        path = self._blob_path(blob)
+        if path.exists():
+            return blob, False
+        os.makedirs(path.parent, exist_ok=True)
+        self._write_atomic(path, zlib.compress(encoded))
+        return blob, True
+
+    def _get(self, blob: str) -> Any:
+        with open(self._blob_path(blob), 'rb') as f:
+            return json.loads(zlib.decompress(f.read()))
+
+    def _loader(self, blob: str):
+        return lambda: self._get(blob)
+
+    def _blob_path(self, blob: str) -> Path:
+        return self.objects_dir / blob[:2] / blob
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        tmp_path = path.with_name(path.name + f".{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
@@ -0,0 +1,144 @@
+import logging
+from typing import Dict, Iterator, List, Optional
+
+from src.ollama_client import OllamaClient
+from src.novel import Novel, Chapter
+from src.model_router import ModelRouter
+from src.telemetry import tag, tagged
+from src.utils import estimate_tokens
+from prompts.chapter_writing import CHAPTER_SUMMARY_SYSTEM, STORY_DIGEST_SYSTEM
+from config import STORY_MEMORY_BUDGET_TOKENS, STORY_DIGEST_TOKENS
+
+logger = logging.getLogger(__name__)
+
+class StoryMemory:
+    """Bounded memory of the chapters written so far
+
+    Each chapter gets a compact summary stored on the chapter. Recent summaries
+    are kept verbatim within a token budget; older ones are folded into a
+    digest on the novel, so the memory passed to a chapter prompt stays the
+    same size however many chapters precede it. Only summaries of reviewed
+    chapters that still match the chapter's content are folded, so a summary
+    written from a draft can be replaced once the review changes the chapter.
+    """
+
+    def __init__(self, ollama_client: OllamaClient, budget_tokens: int = STORY_MEMORY_BUDGET_TOKENS,
+                 digest_tokens: int = STORY_DIGEST_TOKENS):
+        self.ollama_client = ollama_client
+        self.router = ModelRouter(ollama_client)
+        self.budget_tokens = budget_tokens
+        self.digest_tokens = digest_tokens
+        self._sources: Dict[int, str] = {}  # Chapter number -> the content its summary was written from
+
+    def summarize_chapter(self, novel: Novel, chapter: Chapter):
+        """Summarize a finished chapter and fold old summaries into the digest if over budget"""
+        content = chapter.content
+        with tag(stage="chapter_summary", chapter=chapter.number):
+            chapter.summary = self.router.generate("chapter_summary", self._summary_prompt(chapter)).strip()
+        self._sources[chapter.number] = content
+        self._compact(novel)
+
+    async def summarize_chapter_async(self, novel: Novel, chapter: Chapter):
+        """summarize_chapter() awaiting the async client"""
+        content = chapter.content
+        with tag(stage="chapter_summary", chapter=chapter.number):
+            chapter.summary = (await self.router.generate_async("chapter_summary", self._summary_prompt(chapter))).strip()
+        self._sources[chapter.number] = content
+        await self._compact_async(novel)
+
+    def is_current(self, chapter: Chapter) -> bool:
+        """Whether the chapter's summary was written from its current content, e.g. not from a draft since revised"""
+        # Summaries from an earlier run are taken as current
+        return bool(chapter.summary) and self._sources.get(chapter.number, chapter.content) == chapter.content
+
+    def _summary_prompt(self, chapter: Chapter) -> str:
+        logger.info(f"Summarizing Chapter {chapter.number}: {chapter.title}")
+        return CHAPTER_SUMMARY_SYSTEM.format(
+            max_words=self._words(self.budget_tokens // 5),
+            chapter_number=chapter.number,
+            chapter_title=chapter.title,
+            chapter_content=chapter.content
+        )
+
+    def ensure_summaries(self, novel: Novel, before: int):
+        """Summarize completed chapters before the given number that have no summary yet (e.g. older saves)"""
+        for chapter in self._unsummarized(novel, before):
+            self.summarize_chapter(novel, chapter)
+
+    async def ensure_summaries_async(self, novel: Novel, before: int):
+        """ensure_summaries() awaiting the async client; in order, since each summary may fold the digest"""
+        for chapter in self._unsummarized(novel, before):
+            await self.summarize_chapter_async(novel, chapter)
+
+    @staticmethod
+    def _unsummarized(novel: Novel, before: int) -> Iterator[Chapter]:
+        for chapter in novel.chapters:
+            if chapter.number >= before:
+                break
+            if chapter.number > novel.digest_through and chapter.status == "completed" and not chapter.summary:
+                yield chapter
+
+    def context_for(self, novel: Novel, chapter: Chapter) -> str:
+        """Return the story-so-far text for the given chapter's prompt"""
+        parts = []
+        if novel.story_digest:
+            parts.append(f"Earlier chapters (1-{novel.digest_through}): {novel.story_digest}")
+        for previous in self._recent(novel, chapter.number):
+            parts.append(f"Chapter {previous.number} ({previous.title}): {previous.summary}")
+        return "\n".join(parts) if parts else "No earlier chapters have been written yet."
+
+    def _recent(self, novel: Novel, before: Optional[int] = None) -> List[Chapter]:
+        return [c for c in novel.chapters
+                if c.number > novel.digest_through and (before is None or c.number < before) and c.summary]
+
+    @tagged(stage="story_digest", chapter=None)
+    def _compact(self, novel: Novel):
+        """Fold the oldest recent summaries into the digest once they exceed the budget"""
+        to_fold = self._to_fold(novel)
+        if to_fold:
+            self._fold(novel, to_fold, self.router.generate("story_digest", self._digest_prompt(novel, to_fold)))
+
+    @tagged(stage="story_digest", chapter=None)
+    async def _compact_async(self, novel: Novel):
+        to_fold = self._to_fold(novel)
+        if to_fold:
+            digest = await self.router.generate_async("story_digest", self._digest_prompt(novel, to_fold))
+            self._fold(novel, to_fold, digest)
+
+    def _to_fold(self, novel: Novel) -> List[Chapter]:
+        """The oldest recent chapters to fold into the digest, or none while within the budget"""
+        recent = self._recent(novel)
+        total = sum(estimate_tokens(c.summary) for c in recent)
+        if total <= self.budget_tokens:
+            return []
+
+        # Fold down to half the budget so compaction runs once every few chapters, not every chapter; a
+        # summary that may still be replaced after review stays out of the digest, with every one after it
+        to_fold: List[Chapter] = []
+        while recent and total > self.budget_tokens // 2 and recent[0].status == "completed" \
+                and self.is_current(recent[0]):
+            chapter = recent.pop(0)
+            to_fold.append(chapter)
+            total -= estimate_tokens(chapter.summary)
+        return to_fold
+
+    def _digest_prompt(self, novel: Novel, to_fold: List[Chapter]) -> str:
+        logger.info(f"Folding chapters {to_fold[0].number}-{to_fold[-1].number} into the story digest")
+        return STORY_DIGEST_SYSTEM.format(
+            max_words=self._words(self.digest_tokens),
+            digest=novel.story_digest or "(none yet)",
+            summaries="\n".join(f"Chapter {c.number} ({c.title}): {c.summary}" for c in to_fold)
+        )
+
+    def _fold(self, novel: Novel, to_fold: List[Chapter], digest: str):
+        if novel.digest_through >= to_fold[0].number:
+            # Another compaction (the pipeline's drafter or reviewer) folded these first, this digest is stale
+            logger.debug(f"Discarding a digest through Chapter {to_fold[-1].number}, already folded")
+            return
+        # Hard cap in case the model ignores the word limit
+        novel.story_digest = digest.strip()[:self.digest_tokens * 4]
+        novel.digest_through = to_fold[-1].number
+
+    @staticmethod
+    def _words(tokens: int) -> int:
+        return max(50, tokens * 3 // 4)
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import logging
+import re
+import threading
+import typing
+from dataclasses import fields, is_dataclass
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
+
+from src.model_router import ModelRouter, ValidationFailed
+from prompts.structured_output import FIELD_REPAIR_SYSTEM
+from config import STRUCTURED_OUTPUT, STRUCTURED_REPAIR_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+def schema_for(cls: type) -> Dict[str, Any]:
+    """JSON schema of a dataclass, with every field required"""
+    hints = typing.get_type_hints(cls)
+    properties = {f.name: _type_schema(hints[f.name]) for f in fields(cls)}
+    return {"type": "object", "properties": properties, "required": list(properties)}
+
+def mapping_schema(cls: type) -> Dict[str, Any]:
+    """JSON schema of an object mapping names to instances of a dataclass"""
+    return {"type": "object", "additionalProperties": schema_for(cls)}
+
+def _type_schema(hint: Any) -> Dict[str, Any]:
+    origin, args = typing.get_origin(hint), typing.get_args(hint)
+    if origin is typing.Union:
+        return _type_schema(next(arg for arg in args if arg is not type(None)))
+    if origin is list:
+        return {"type": "array", "items": _type_schema(args[0] if args else str)}
+    if origin is dict:
+        return {"type": "object", "additionalProperties": _type_schema(args[1] if args else str)}
+    if is_dataclass(hint):
+        return schema_for(hint)
+    if hint is bool:
+        return {"type": "boolean"}
+    if hint is int:
+        return {"type": "integer"}
+    if hint is float:
+        return {"type": "number"}
+    return {"type": "string"}
+
+def parse_object(text: str) -> Dict[str, Any]:
+    """Parse a reply as a JSON object, tolerating code fences and text around it"""
+    text = text.strip()
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            raise
+        data = json.loads(text[start:end + 1])
+    if not isinstance(data, dict):
+        raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+    return data
+
+def _coerce(value: Any, hint: Any) -> Any:
+    """Convert a parsed JSON value to a field's type, raising ValueError if it does not fit"""
+    origin, args = typing.get_origin(hint), typing.get_args(hint)
+    if origin is typing.Union:
+        return _coerce(value, next(arg for arg in args if arg is not type(None)))
+    if origin is list:
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list):
+            raise ValueError("expected a list")
+        # Blank and invalid entries are dropped rather than failing the whole list
+        items, problems = [], []
+        for item in value:
+            if isinstance(item, str) and not item.strip():
+                continue
+            try:
+                items.append(_coerce(item, args[0] if args else str))
+            except (ValueError, TypeError) as e:
+                problems.append(str(e))
+        if problems:
+            logger.debug(f"Dropped {len(problems)} invalid list entries: {problems[0]}")
+            if not items:
+                raise ValueError(f"every entry is invalid: {problems[0]}")
+        return items
+    if origin is dict:
+        if not isinstance(value, dict):
+            raise ValueError("expected an object")
+        return {str(key): _coerce(item, args[1] if args else str) for key, item in value.items()}
+    if is_dataclass(hint):
+        if not isinstance(value, dict):
+            raise ValueError("expected an object")
+        values, problems = validate(hint, value)
+        if problems:
+            raise ValueError("; ".join(f"{name}: {problem}" for name, problem in problems.items()))
+        return hint(**values)
+    if hint in (int, float):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"expected a {hint.__name__}")
+        return hint(value)
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError("expected a string")
+    if not str(value).strip():
+        raise ValueError("empty")
+    return str(value).strip()
+
+def validate(cls: type, data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Coerce parsed data to a dataclass's field types; returns the valid values and the problem with each other field"""
+    hints = typing.get_type_hints(cls)
+    values: Dict[str, Any] = {}
+    problems: Dict[str, str] = {}
+    for f in fields(cls):
+        if data.get(f.name) is None:
+            problems[f.name] = "missing"
+            continue
+        try:
+            values[f.name] = _coerce(data[f.name], hints[f.name])
+        except (ValueError, TypeError) as e:
+            problems[f.name] = str(e)
+    return values, problems
+
+class StructuredGenerator:
+    """Generate dataclasses from JSON replies, repairing only the fields that fail validation
+
+    The dataclass's JSON schema is sent as Ollama's format, so the model is
+    constrained to parseable output. Fields that are still missing or invalid
+    are requested again on their own, with the original prompt and the valid
+    fields as context, instead of regenerating the whole object; fields that
+    stay invalid fall back to the given defaults or the dataclass defaults.
+    """
+
+    # Process-wide counters, shared by every generator
+    stats: Dict[str, int] = {"objects": 0, "invalid_objects": 0, "parse_failures": 0, "invalid_fields": 0,
+                             "repairs": 0, "unrepaired_fields": 0}
+    _stats_lock = threading.Lock()
+
+    def __init__(self, router: ModelRouter, structured: bool = STRUCTURED_OUTPUT,
+                 repair_attempts: int = STRUCTURED_REPAIR_ATTEMPTS):
+        self.router = router
+        self.structured = structured
+        self.repair_attempts = repair_attempts
+
+    def generate(self, call_type: str, prompt: str, cls: Type[T], fallback: Optional[Dict[str, Any]] = None) -> T:
+        """Generate one instance of a dataclass"""
+        schema = schema_for(cls)
+        data = self._reply(call_type, prompt, schema)
+        return cls(**self._complete(call_type, call_type, prompt, cls, schema, data, fallback or {}))
+
+    async def generate_async(self, call_type: str, prompt: str, cls: Type[T],
+                             fallback: Optional[Dict[str, Any]] = None) -> T:
+        """generate() awaiting the async client"""
+        schema = schema_for(cls)
+        data = await self._reply_async(call_type, prompt, schema)
+        return cls(**await self._complete_async(call_type, call_type, prompt, cls, schema, data, fallback or {}))
+
+    def generate_mapping(self, call_type: str, prompt: str, cls: Type[T], key_field: Optional[str] = None) -> Dict[str, T]:
+        """Generate an object of named dataclass instances; key_field is filled from each entry's name"""
+        data = self._reply(call_type, prompt, mapping_schema(cls))
+        for _ in range(self.repair_attempts):
+            if data:
+                break
+            self._count("repairs")
+            data = self._reply(call_type, prompt, mapping_schema(cls))
+
+        schema = schema_for(cls)
+        return {key: cls(**self._complete(call_type, f"{call_type} '{key}'", prompt, cls, schema, entry, {}))
+                for key, entry in self._entries(data, key_field)}
+
+    async def generate_mapping_async(self, call_type: str, prompt: str, cls: Type[T],
+                                     key_field: Optional[str] = None) -> Dict[str, T]:
+        """generate_mapping() awaiting the async client, with the entries completed concurrently"""
+        data = await self._reply_async(call_type, prompt, mapping_schema(cls))
+        for _ in range(self.repair_attempts):
+            if data:
+                break
+            self._count("repairs")
+            data = await self._reply_async(call_type, prompt, mapping_schema(cls))
+
+        schema = schema_for(cls)
+        entries = self._entries(data, key_field)
+        values = await asyncio.gather(*(
+            self._complete_async(call_type, f"{call_type} '{key}'", prompt, cls, schema, entry, {})
+            for key, entry in entries
+        ))
+        return {key: cls(**entry_values) for (key, _), entry_values in zip(entries, values)}
+
+    @staticmethod
+    def _entries(data: Dict[str, Any], key_field: Optional[str]) -> List[Tuple[str, Dict[str, Any]]]:
+        """The entries of a mapping reply, with key_field filled from each entry's name"""
+        entries = []
+        for key, entry in data.items():
+            entry = dict(entry) if isinstance(entry, dict) else {}
+            if key_field is not None and entry.get(key_field) is None:
+                entry[key_field] = key
+            entries.append((key, entry))
+        return entries
+
+    def _reply(self, call_type: str, prompt: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate and parse a reply; one that is not a JSON object on any model gives {}"""
+        try:
+            return self.router.generate(call_type, prompt, parse=parse_object, **self._format(schema))
+        except ValidationFailed as e:
+            return self._unparsed(call_type, e)
+
+    async def _reply_async(self, call_type: str, prompt: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return await self.router.generate_async(call_type, prompt, parse=parse_object, **self._format(schema))
+        except ValidationFailed as e:
+            return self._unparsed(call_type, e)
+
+    def _format(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        return {"response_format": schema} if self.structured else {}
+
+    def _unparsed(self, call_type: str, error: ValidationFailed) -> Dict[str, Any]:
+        self._count("parse_failures")
+        logger.warning(f"{call_type}: {error}")
+        return {}
+
+    def _complete(self, call_type: str, label: str, prompt: str, cls: type, schema: Dict[str, Any],
+                  data: Dict[str, Any], fallback: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate a reply and re-request its failed fields until they pass or attempts run out"""
+        values, problems = self._validate(cls, data)
+        for _ in range(self.repair_attempts):
+            if not problems:
+                break
+            repair_prompt, repair_schema = self._repair_request(label, prompt, schema, values, problems)
+            patch = self._reply(call_type, repair_prompt, repair_schema)
+            values, problems = validate(cls, {**{name: patch.get(name) for name in problems}, **values})
+        return self._finish(label, values, problems, fallback)
+
+    async def _complete_async(self, call_type: str, label: str, prompt: str, cls: type, schema: Dict[str, Any],
+                              data: Dict[str, Any], fallback: Dict[str, Any]) -> Dict[str, Any]:
+        values, problems = self._validate(cls, data)
+        for _ in range(self.repair_attempts):
+            if not problems:
+                break
+            repair_prompt, repair_schema = self._repair_request(label, prompt, schema, values, problems)
+            patch = await self._reply_async(call_type, repair_prompt, repair_schema)
+            values, problems = validate(cls, {**{name: patch.get(name) for name in problems}, **values})
+        return self._finish(label, values, problems, fallback)
+
+    def _validate(self, cls: type, data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        values, problems = validate(cls, data)
+        self._count("objects")
+        if problems:
+            self._count("invalid_objects")
+            self._count("invalid_fields", len(problems))
+        return values, problems
+
+    def _repair_request(self, label: str, prompt: str, schema: Dict[str, Any], values: Dict[str, Any],
+                        problems: Dict[str, str]) -> Tuple[str, Dict[str, Any]]:
+        """The prompt and schema re-requesting only the failed fields"""
+        logger.info(f"{label}: repairing fields {', '.join(problems)}")
+        self._count("repairs")
+        repair_schema = {
+            "type": "object",
+            "properties": {name: schema["properties"][name] for name in problems},
+            "required": list(problems)
+        }
+        repair_prompt = FIELD_REPAIR_SYSTEM.format(
+            prompt=prompt,
+            subject=label,
+            problems="\n".join(f"- {name}: {problem}" for name, problem in problems.items()),
+            valid=json.dumps(values, ensure_ascii=False)
+        )
+        return repair_prompt, repair_schema
+
+    def _finish(self, label: str, values: Dict[str, Any], problems: Dict[str, str],
+                fallback: Dict[str, Any]) -> Dict[str, Any]:
+        if problems:
+            logger.warning(f"{label}: fields {', '.join(problems)} still invalid, using defaults")
+            self._count("unrepaired_fields", len(problems))
+            values.update({name: fallback[name] for name in problems if name in fallback})
+        return values
+
+    @classmethod
+    def summary(cls) -> Dict[str, Any]:
+        """Counters plus the share of objects that needed repair or could not be parsed"""
+        with cls._stats_lock:
+            stats = dict(cls.stats)
+        stats["invalid_rate"] = round(stats["invalid_objects"] / stats["objects"], 3) if stats["objects"] else 0.0
+        return stats
+
+    @classmethod
+    def _count(cls, key: str, amount: int = 1):
+        with cls._stats_lock:
+            cls.stats[key] += amount
@@ -0,0 +1,197 @@
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import TELEMETRY_DIR, TELEMETRY_JSON, TELEMETRY_PROMETHEUS
+
+logger = logging.getLogger(__name__)
+
+# Stage/chapter tags of the code currently running; copied into worker threads by map_concurrently
+_tags: contextvars.ContextVar = contextvars.ContextVar("telemetry_tags", default={})
+
+TIMING_FIELDS = ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration")
+COUNT_FIELDS = ("prompt_eval_count", "eval_count")
+
+@contextmanager
+def tag(**tags: Any) -> Iterator[None]:
+    """Tag LLM calls made inside the block, e.g. with stage and chapter"""
+    token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+def tagged(**tags: Any):
+    """Decorator form of tag(), for functions and coroutine functions"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tag(**tags):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tag(**tags):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def current_tags() -> Dict[str, Any]:
+    return dict(_tags.get())
+
+def _percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+class Telemetry:
+    """Collects Ollama's per-request timing fields, tagged with stage and chapter"""
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def record(self, result: Dict[str, Any], endpoint: str, model: str, wall_seconds: float):
+        """Store the timing fields of a completed Ollama response"""
+        tags = current_tags()
+        entry = {
+            "time": time.time(),
+            "stage": tags.get("stage", "unknown"),
+            "chapter": tags.get("chapter"),
+            "endpoint": endpoint,
+            "model": model,
+            "wall_seconds": wall_seconds
+        }
+        entry.update({key: value for key, value in tags.items() if key not in ("stage", "chapter")})
+        for key in TIMING_FIELDS + COUNT_FIELDS:
+            entry[key] = result.get(key, 0)
+        with self._lock:
+            self.records.append(entry)
+
+        logger.debug(
+            f"[{entry['stage']}{'' if entry['chapter'] is None else ' ch' + str(entry['chapter'])}] "
+            f"prompt eval {entry['prompt_eval_count']} tokens in {entry['prompt_eval_duration'] / 1e6:.0f}ms, "
+            f"generated {entry['eval_count']} tokens in {entry['eval_duration'] / 1e6:.0f}ms"
+        )
+
+    def reset(self):
+        with self._lock:
+            self.records = []
+
+    @staticmethod
+    def _summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        latencies = [r["wall_seconds"] for r in records]
+        eval_seconds = sum(r["eval_duration"] for r in records) / 1e9
+        prompt_eval_seconds = sum(r["prompt_eval_duration"] for r in records) / 1e9
+        eval_tokens = sum(r["eval_count"] for r in records)
+        prompt_tokens = sum(r["prompt_eval_count"] for r in records)
+        return {
+            "requests": len(records),
+            "latency_p50_seconds": round(_percentile(latencies, 50), 3),
+            "latency_p95_seconds": round(_percentile(latencies, 95), 3),
+            "latency_total_seconds": round(sum(latencies), 3),
+            "prompt_tokens": prompt_tokens,
+            "eval_tokens": eval_tokens,
+            "prompt_eval_seconds": round(prompt_eval_seconds, 3),
+            "eval_seconds": round(eval_seconds, 3),
+            "load_seconds": round(sum(r["load_duration"] for r in records) / 1e9, 3),
+            "server_seconds": round(sum(r["total_duration"] for r in records) / 1e9, 3),
+            "prompt_tokens_per_second": round(prompt_tokens / prompt_eval_seconds, 1) if prompt_eval_seconds else 0.0,
+            "eval_tokens_per_second": round(eval_tokens / eval_seconds, 1) if eval_seconds else 0.0
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate the run overall and per stage"""
+        with self._lock:
+            records = list(self.records)
+        stages: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            stages.setdefault(record["stage"], []).append(record)
+        return {
+            "overall": self._summarize(records),
+            "stages": {stage: self._summarize(stage_records) for stage, stage_records in stages.items()}
+        }
+
+    def write_json(self, path: Path) -> str:
+        """Write the run report with per-call records as JSON"""
+        with self._lock:
+            records = list(self.records)
+        report = {"generated_at": datetime.now().isoformat(timespec="seconds"), **self.summary(), "calls": records}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return str(path)
+
+    def write_prometheus(self, path: Path) -> str:
+        """Write the per-stage aggregates in Prometheus text exposition format"""
+        summary = self.summary()["stages"]
+        with self._lock:
+            records = list(self.records)
+
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[str]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+        def per_stage(name: str, key: str) -> List[str]:
+            return [f'{name}{{stage="{stage}"}} {values[key]}' for stage, values in summary.items()]
+
+        latency_samples = []
+        for stage, values in summary.items():
+            stage_latencies = [r["wall_seconds"] for r in records if r["stage"] == stage]
+            for quantile in (0.5, 0.95):
+                latency_samples.append(f'novel_llm_request_seconds{{stage="{stage}",quantile="{quantile}"}} '
+                                       f'{_percentile(stage_latencies, quantile * 100):.6f}')
+            latency_samples.append(f'novel_llm_request_seconds_sum{{stage="{stage}"}} {sum(stage_latencies):.6f}')
+            latency_samples.append(f'novel_llm_request_seconds_count{{stage="{stage}"}} {len(stage_latencies)}')
+
+        metric("novel_llm_request_seconds", "summary", "Client-side LLM request latency by stage.", latency_samples)
+        metric("novel_llm_requests_total", "counter", "LLM requests by stage.",
+               per_stage("novel_llm_requests_total", "requests"))
+        metric("novel_llm_prompt_tokens_total", "counter", "Prompt tokens evaluated by stage.",
+               per_stage("novel_llm_prompt_tokens_total", "prompt_tokens"))
+        metric("novel_llm_eval_tokens_total", "counter", "Tokens generated by stage.",
+               per_stage("novel_llm_eval_tokens_total", "eval_tokens"))
+        metric("novel_llm_prompt_eval_seconds_total", "counter", "Server time spent evaluating prompts by stage.",
+               per_stage("novel_llm_prompt_eval_seconds_total", "prompt_eval_seconds"))
+        metric("novel_llm_eval_seconds_total", "counter", "Server time spent generating by stage.",
+               per_stage("novel_llm_eval_seconds_total", "eval_seconds"))
+        metric("novel_llm_load_seconds_total", "counter", "Server time spent loading models by stage.",
+               per_stage("novel_llm_load_seconds_total", "load_seconds"))
+        metric("novel_llm_eval_tokens_per_second", "gauge", "Generation throughput by stage.",
+               per_stage("novel_llm_eval_tokens_per_second", "eval_tokens_per_second"))
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        return str(path)
+
+    def write_reports(self, directory: Path = TELEMETRY_DIR, prefix: Optional[str] = None) -> List[str]:
+        """Write the reports enabled in config into a directory; returns their paths"""
+        if not self.records:
+            return []
+        prefix = prefix or f"run_{datetime.now():%Y%m%d_%H%M%S}"
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        if TELEMETRY_JSON:
+            paths.append(self.write_json(Path(directory) / f"{prefix}.json"))
+        if TELEMETRY_PROMETHEUS:
+            paths.append(self.write_prometheus(Path(directory) / f"{prefix}.prom"))
+        return paths
+
+# Process-wide collector used by OllamaClient
+telemetry = Telemetry()
@@ -0,0 +1,128 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import TRACE_ENABLED, TRACE_OUTPUT, TRACE_MEMORY
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TOP_ALLOCATIONS = 10  # Allocation sites kept per tracemalloc snapshot
+
+class Tracer:
+    """Records spans as Chrome trace events (viewable in chrome://tracing or Perfetto)
+
+    Each span becomes a complete ("X") event on its thread's track, so stages
+    and LLM calls running on worker threads show up side by side. With memory
+    tracing on, spans carry tracemalloc's traced memory and a counter track is
+    emitted; spans opened with snapshot=True also record the top allocation sites.
+    """
+
+    def __init__(self, enabled: bool = TRACE_ENABLED, memory: bool = TRACE_MEMORY):
+        self.enabled = enabled
+        self.memory = memory
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+        self._named_threads = set()
+        self.pid = os.getpid()
+        if self.enabled and self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _now_us(self) -> float:
+        return (time.perf_counter_ns() - self._origin) / 1000
+
+    @contextmanager
+    def span(self, name: str, category: str = "pipeline", snapshot: bool = False, **args: Any) -> Iterator[Dict[str, Any]]:
+        """Time the block as one trace event; the yielded dict is added to the event's args"""
+        if not self.enabled:
+            yield args
+            return
+
+        thread = threading.current_thread()
+        memory_before = tracemalloc.get_traced_memory()[0] if self.memory else 0
+        start = self._now_us()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = repr(e)
+            raise
+        finally:
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start,
+                "dur": self._now_us() - start,
+                "pid": self.pid,
+                "tid": thread.ident,
+                "args": {key: value if isinstance(value, (int, float, bool, type(None))) else str(value)
+                         for key, value in args.items()}
+            }
+            events = [event]
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                event["args"]["memory_kb"] = current // 1024
+                event["args"]["memory_delta_kb"] = (current - memory_before) // 1024
+                events.append({"name": "traced memory", "ph": "C", "ts": event["ts"] + event["dur"],
+                               "pid": self.pid, "args": {"current_kb": current // 1024, "peak_kb": peak // 1024}})
+                if snapshot:
+                    event["args"]["top_allocations"] = self._top_allocations()
+            self._add(events, thread)
+
+    def traced(self, name: Optional[str] = None, category: str = "pipeline", snapshot: bool = False):
+        """Decorator that wraps every call of a function in a span"""
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.span(span_name, category, snapshot=snapshot):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _top_allocations() -> List[str]:
+        statistics = tracemalloc.take_snapshot().statistics("lineno")
+        return [str(stat) for stat in statistics[:SNAPSHOT_TOP_ALLOCATIONS]]
+
+    def _add(self, events: List[Dict[str, Any]], thread: threading.Thread):
+        with self._lock:
+            if thread.ident not in self._named_threads:
+                self._named_threads.add(thread.ident)
+                self.events.append({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": thread.ident,
+                                    "args": {"name": thread.name}})
+            self.events.extend(events)
+
+    def write(self, path: Optional[Path] = None) -> Optional[str]:
+        """Write the recorded events as Chrome trace JSON; returns the path, or None if nothing was traced"""
+        with self._lock:
+            events = list(self.events)
+        if not events:
+            return None
+
+        if path is None:
+            os.makedirs(TRACE_OUTPUT, exist_ok=True)
+            path = Path(TRACE_OUTPUT) / f"trace_{datetime.now():%Y%m%d_%H%M%S}_{self.pid}.json"
+        trace = {
+            "traceEvents": [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": "ai-novel-maker"}}] + events,
+            "displayTimeUnit": "ms"
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f, ensure_ascii=False)
+        return str(path)
+
+# Process-wide tracer; spans are no-ops unless TRACE_ENABLED is set
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 import sys
@@ -7,10 +8,12 @@ from src.novel import Novel
 from src.idea_development import IdeaDevelopmentStage
 from src.planning import PlanningStage
 from src.chapter_planning import ChapterPlanningStage
-from src.chapter_writing import ChapterWritingStage
+from src.chapter_writing import ChapterWritingStage, WritingProgress
 from src.review import FinalReviewStage
 from src.ollama_client import OllamaClient
-from config import HEADLESS_MODE, SAVE_DIR
+from src.save_format import SaveCatalog
+from src.tracing import traced
+from config import HEADLESS_MODE, SAVE_DIR, SAVE_FORMAT
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +23,11 @@ class UserInterface:
         self.idea_stage = IdeaDevelopmentStage(self.ollama_client)
         self.planning_stage = PlanningStage(self.ollama_client)
         self.chapter_planning_stage = ChapterPlanningStage(self.ollama_client)
-        self.chapter_writing_stage = ChapterWritingStage(self.ollama_client)
+        self.chapter_writing_stage = ChapterWritingStage(
+            self.ollama_client,
+            progress_callback=None if HEADLESS_MODE else self.show_writing_progress,
+            checkpoint_callback=self.checkpoint_novel
+        )
         self.final_review_stage = FinalReviewStage(self.ollama_client)
         self.novel: Optional[Novel] = None
     
@@ -31,15 +38,21 @@ class UserInterface:
         else:
             self.run_interactive()
     
-    def run_headless(self):
+    def run_headless(self, novel: Optional[Novel] = None):
         """Run in headless mode without user interaction"""
         logger.info("Running in headless mode")
-        self.novel = self.load_or_create_novel()
+        self.novel = novel or self.latest_unfinished_novel()
+        if not self.novel:
+            logger.error("Headless mode needs a novel: pass --title and --idea, use --batch, "
+                         "or leave an unfinished save to resume")
+            sys.exit(1)
         
         if self.novel.status == "idea":
             self.develop_idea_headless()
         if self.novel.status == "planning":
             self.plan_novel_headless()
+        if self.novel.status == "writing" and not self.novel.chapters:
+            self.plan_chapters_headless()
         if self.novel.status == "writing":
             self.write_novel_headless()
         if self.novel.status == "reviewing":
@@ -47,6 +60,40 @@ class UserInterface:
         if self.novel.status == "completed":
             self.output_novel()
     
+    async def run_headless_async(self, novel: Novel):
+        """run_headless() on the event loop, so one loop can drive several novels through one client"""
+        logger.info(f"Running {novel.title} in headless mode on the event loop")
+        self.novel = novel
+        
+        if self.novel.status == "idea":
+            self.novel = await self.idea_stage.develop_idea_async(self.novel)
+            self.novel.status = "planning"
+            await asyncio.to_thread(self.save_novel)
+        if self.novel.status == "planning":
+            self.novel.style_guide = await self.planning_stage.develop_style_guide_async(self.novel)
+            self.novel.world_lore = await self.planning_stage.develop_world_lore_async(self.novel)
+            self.novel.plot = await self.planning_stage.develop_plot_async(self.novel)
+            self.novel.characters = await self.planning_stage.develop_characters_async(self.novel)
+            logger.info("Planning completed.")
+            self.novel.status = "writing"
+            await asyncio.to_thread(self.save_novel)
+        if self.novel.status == "writing" and not self.novel.chapters:
+            self.novel.chapters = await self.chapter_planning_stage.generate_chapter_plans_async(self.novel)
+            logger.info(f"{len(self.novel.chapters)} chapter plans generated.")
+            await asyncio.to_thread(self.save_novel)
+        if self.novel.status == "writing":
+            self.novel = await self.chapter_writing_stage.write_chapters_async(self.novel)
+            await asyncio.to_thread(self.save_novel)
+            logger.info("Chapters written.")
+            self.novel.status = "reviewing"
+        if self.novel.status == "reviewing":
+            final_review = await self.final_review_stage.conduct_final_review_async(self.novel)
+            logger.info("Final Review Result:\n" + final_review)
+            self.novel.status = "completed"
+            await asyncio.to_thread(self.save_novel)
+        if self.novel.status == "completed":
+            await asyncio.to_thread(self.output_novel)
+    
     def run_interactive(self):
         """Run in interactive mode with user interaction"""
         logger.info("Running in interactive mode")
@@ -83,8 +130,7 @@ class UserInterface:
             saves = Novel.list_saves()
             if saves:
                 print("Found saved novels:")
-                for i, save in enumerate(saves):
-                    print(f"{i+1}. {save.stem}")
+                self.print_saves(saves)
                 
                 while True:
                     try:
@@ -106,6 +152,21 @@ class UserInterface:
             os.makedirs(SAVE_DIR)
             return self.create_new_novel()
     
+    def latest_unfinished_novel(self) -> Optional[Novel]:
+        """Load the most recently saved novel that is not completed, without prompting"""
+        unfinished = [info for info in Novel.list_save_info() if info["status"] != "completed"]
+        if not unfinished:
+            return None
+        latest = max(unfinished, key=lambda info: info["mtime"])
+        logger.info(f"Resuming {latest['path'].name}: {latest['title']} [{latest['status']}]")
+        return Novel.load(str(latest["path"]))
+    
+    def print_saves(self, saves):
+        """Print saves with their metadata from the save catalog"""
+        for i, info in enumerate(SaveCatalog().entries(saves)):
+            print(f"{i+1}. {info['path'].name} - {info['title']} [{info['status']}], "
+                  f"{info['completed_chapters']}/{info['chapter_count']} chapters, {info['word_count']} words")
+    
     def create_new_novel(self) -> Novel:
         """Create a new novel"""
         title = input("Enter novel title: ")
@@ -127,6 +188,7 @@ class UserInterface:
         print("9. Exit")
     
     # Idea Development
+    @traced("UserInterface.develop_idea", "stage", snapshot=True)
     def develop_idea(self):
         """Develop the novel idea"""
         if not self.novel:
@@ -136,6 +198,7 @@ class UserInterface:
         self.novel = self.idea_stage.develop_idea(self.novel)
         self.novel.status = "planning"
     
+    @traced("UserInterface.develop_idea_headless", "stage", snapshot=True)
     def develop_idea_headless(self):
         """Develop the novel idea in headless mode"""
         if not self.novel:
@@ -148,6 +211,7 @@ class UserInterface:
             self.save_novel()
     
     # Planning
+    @traced("UserInterface.plan_novel", "stage", snapshot=True)
     def plan_novel(self):
         """Plan the novel"""
         if not self.novel or self.novel.status != "planning":
@@ -172,6 +236,7 @@ class UserInterface:
         
         self.novel.status = "writing"
     
+    @traced("UserInterface.plan_novel_headless", "stage", snapshot=True)
     def plan_novel_headless(self):
         """Plan the novel in headless mode"""
         if not self.novel or self.novel.status != "planning":
@@ -198,6 +263,7 @@ class UserInterface:
         self.save_novel()
     
     # Chapter Planning
+    @traced("UserInterface.plan_chapters", "stage", snapshot=True)
     def plan_chapters(self):
         """Plan the chapters"""
         if not self.novel or self.novel.status != "writing":
@@ -208,7 +274,19 @@ class UserInterface:
         print("Chapter plans generated.")
         self.novel.status = "writing"
     
+    @traced("UserInterface.plan_chapters_headless", "stage", snapshot=True)
+    def plan_chapters_headless(self):
+        """Plan the chapters in headless mode"""
+        if not self.novel or self.novel.status != "writing":
+            print("Please plan the novel first.")
+            sys.exit(1)
+        
+        self.novel.chapters = self.chapter_planning_stage.generate_chapter_plans(self.novel)
+        logger.info(f"{len(self.novel.chapters)} chapter plans generated.")
+        self.save_novel()
+    
     # Writing Chapters
+    @traced("UserInterface.write_chapters", "stage", snapshot=True)
     def write_chapters(self):
         """Write the chapters"""
         if not self.novel or self.novel.status != "writing":
@@ -220,6 +298,14 @@ class UserInterface:
         print("Chapters written.")
         self.novel.status = "reviewing"
     
+    def show_writing_progress(self, progress: WritingProgress):
+        """Show live progress of the chapter being drafted"""
+        ttft = f"{progress.time_to_first_token:.1f}s" if progress.time_to_first_token is not None else "-"
+        line = (f"\rChapter {progress.chapter.number}: {progress.characters} chars, "
+                f"first token {ttft}, elapsed {progress.elapsed:.1f}s")
+        print(line, end="\n" if progress.done else "", flush=True)
+    
+    @traced("UserInterface.write_novel_headless", "stage", snapshot=True)
     def write_novel_headless(self):
         """Write the novel in headless mode"""
         if not self.novel or self.novel.status != "writing":
@@ -232,6 +318,7 @@ class UserInterface:
         self.novel.status = "reviewing"
     
     # Review Novel
+    @traced("UserInterface.review_novel", "stage", snapshot=True)
     def review_novel(self):
         """Review the novel"""
         if not self.novel or self.novel.status != "reviewing":
@@ -243,6 +330,7 @@ class UserInterface:
         print(final_review)
         self.novel.status = "completed"
     
+    @traced("UserInterface.review_novel_headless", "stage", snapshot=True)
     def review_novel_headless(self):
         """Review the novel in headless mode"""
         if not self.novel or self.novel.status != "reviewing":
@@ -255,6 +343,7 @@ class UserInterface:
         self.save_novel()
     
     # Output Novel
+    @traced("UserInterface.output_novel", "stage", snapshot=True)
     def output_novel(self):
         """Output the novel"""
         if not self.novel or self.novel.status != "completed":
@@ -266,6 +355,7 @@ class UserInterface:
         print(f"Novel exported to: {output_path}")
     
     # Save and Load
+    @traced("UserInterface.save_novel", "io")
     def save_novel(self):
         """Save the novel"""
         if not self.novel:
@@ -275,6 +365,14 @@ class UserInterface:
         save_path = self.novel.save()
         print(f"Novel saved to: {save_path}")
     
+    def checkpoint_novel(self, novel: Novel):
+        """Save progress after each chapter when saves are journaled"""
+        # Full-copy pickles per chapter would pile up, so only journals checkpoint mid-stage
+        if SAVE_FORMAT == "journal":
+            novel.save(update_catalog=False)
+            logger.debug(f"Checkpointed novel: {novel.title}")
+    
+    @traced("UserInterface.load_novel", "io")
     def load_novel(self):
         """Load a novel"""
         saves = Novel.list_saves()
@@ -283,8 +381,7 @@ class UserInterface:
             return
         
         print("Saved novels:")
-        for i, save in enumerate(saves):
-            print(f"{i+1}. {save.stem}")
+        self.print_saves(saves)
         
         while True:
             try:
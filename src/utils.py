@@ -1,6 +1,109 @@
-import re
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+class ThinkTagFilter:
+    """Incrementally strip <think>...</think> spans from streamed text.
+
+    Chunks are fed in arrival order; anything that could still be the start of
+    a tag is held back until the next chunk disambiguates it.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._in_think = False
+        self._strip_leading = True  # Drop whitespace at the start and after a think span
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk and return the visible text it completes"""
+        self._buffer += chunk
+        output = []
+
+        while self._buffer:
+            tag = THINK_CLOSE if self._in_think else THINK_OPEN
+            index = self._buffer.find(tag)
+
+            if index == -1:
+                # Keep a possible partial tag at the end of the buffer
+                keep = _partial_tag_length(self._buffer, tag)
+                if not self._in_think:
+                    output.append(self._emit(self._buffer[:len(self._buffer) - keep]))
+                self._buffer = self._buffer[len(self._buffer) - keep:] if keep else ""
+                break
+
+            if not self._in_think:
+                output.append(self._emit(self._buffer[:index]))
+            self._buffer = self._buffer[index + len(tag):]
+            self._in_think = not self._in_think
+            if not self._in_think:
+                self._strip_leading = True
+
+        return "".join(output)
+
+    def flush(self) -> str:
+        """Return any held-back text once the stream has ended"""
+        remaining = "" if self._in_think else self._emit(self._buffer)
+        self._buffer = ""
+        return remaining
+
+    def _emit(self, text: str) -> str:
+        if self._strip_leading:
+            text = text.lstrip()
+            if text:
+                self._strip_leading = False
+        return text
+
+
+def _partial_tag_length(text: str, tag: str) -> int:
+    """Length of the longest suffix of text that is a proper prefix of tag"""
+    for length in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+def filter_think_stream(chunks: Iterable[str]) -> Iterator[str]:
+    """Yield the visible part of a stream of text chunks"""
+    think_filter = ThinkTagFilter()
+    for chunk in chunks:
+        visible = think_filter.feed(chunk)
+        if visible:
+            yield visible
+    tail = think_filter.flush()
+    if tail:
+        yield tail
+
 
 def remove_think_tags(text: str) -> str:
     """Remove thinking tags from text"""
-    pattern = r"[\s\S]*?<\/think>\s*"
-    return re.sub(pattern, "", text)
+    # Output that closes a think span without opening one hides everything before it
+    if THINK_CLOSE in text and THINK_OPEN not in text.split(THINK_CLOSE, 1)[0]:
+        text = text.split(THINK_CLOSE, 1)[1]
+    return "".join(filter_think_stream([text]))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting prompts (about four characters per token)"""
+    return (len(text) + 3) // 4
+
+
+def map_concurrently(func: Callable[[T], R], items: Iterable[T], max_workers: int) -> List[R]:
+    """Apply func to items on at most max_workers threads, keeping input order
+
+    Each call runs in a copy of the caller's context, so context variables
+    such as telemetry tags carry over into the worker threads.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, func, item) for item in items]
+        return [future.result() for future in futures]
@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.novel import Act, ActSequence, Chapter, ChapterPlan, Character, Novel, StyleGuide
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory, so config's relative output/ paths land there"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "output" / "saves").mkdir(parents=True)
+    return tmp_path
+
+@pytest.fixture
+def novel():
+    """A novel part way through writing, with every kind of field set"""
+    novel = Novel(title="Test Novel", idea="A lighthouse keeper finds a map")
+    novel.status = "writing"
+    novel.style_guide = StyleGuide(tone="Quiet", pov="Third person", themes=["solitude", "the sea"])
+    novel.characters = {"Mara": Character(name="Mara", description="The keeper", relationships={"Tom": "brother"})}
+    novel.acts = [Act(number=1, title="Act One", summary="The map",
+                      sequences=[ActSequence(number=1, title="Arrival", first_chapter=1, last_chapter=3)])]
+    novel.story_digest = "Nothing yet."
+    novel.chapters = [
+        Chapter(number=1, title="The Map", plan=ChapterPlan(title="The Map", summary="The map washes up"),
+                content="The tide brought it in.\n\nShe unrolled it by lamplight.", status="completed",
+                summary="A map washes up."),
+        Chapter(number=2, title="The Crossing", plan=ChapterPlan(title="The Crossing", summary="She sets out"),
+                content="The boat was older than she was. \u2014 \u201cIt floats,\u201d said Tom.", status="writing"),
+        Chapter(number=3, title="The Island", plan=ChapterPlan(title="The Island", summary="She lands"))
+    ]
+    return novel
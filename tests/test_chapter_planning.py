@@ -0,0 +1,48 @@
+import pytest
+
+from src.chapter_planning import ChapterPlanningStage
+from src.novel import ChapterOutline, ChapterPlan, Novel, OutlineEntry
+from src.ollama_client import OllamaClient
+
+class FakeStructured:
+    """Answers outline calls with the given outlines in turn, and plan calls with a plan per prompt"""
+
+    def __init__(self, *outline_lengths):
+        self.outlines = [ChapterOutline(chapters=[OutlineEntry(title=f"Chapter {i}", summary=f"Summary {i}")
+                                                  for i in range(1, length + 1)])
+                         for length in outline_lengths]
+        self.outline_calls = 0
+
+    def generate(self, call_type, prompt, cls, fallback=None):
+        if cls is ChapterOutline:
+            self.outline_calls += 1
+            return self.outlines.pop(0)
+        return ChapterPlan(title="Plan", summary="Plan")
+
+def _stage(structured, num_chapters=10):
+    stage = ChapterPlanningStage(OllamaClient(model="test"), num_chapters=num_chapters, mode="outline",
+                                 hierarchical_chapters=0, concurrency=1, outline_attempts=2)
+    stage.structured = structured
+    return stage
+
+def test_long_outline_is_cut_to_the_requested_chapters():
+    chapters = _stage(FakeStructured(14)).generate_chapter_plans(Novel(title="T", idea="I"))
+
+    assert [chapter.number for chapter in chapters] == list(range(1, 11))
+
+def test_short_outline_is_requested_again():
+    structured = FakeStructured(7, 10)
+
+    chapters = _stage(structured).generate_chapter_plans(Novel(title="T", idea="I"))
+
+    assert structured.outline_calls == 2
+    assert len(chapters) == 10
+
+def test_outline_still_short_fails_planning():
+    with pytest.raises(ValueError, match="7 chapters instead of 10"):
+        _stage(FakeStructured(7, 7)).generate_chapter_plans(Novel(title="T", idea="I"))
+
+def test_empty_outline_plans_chapters_independently():
+    chapters = _stage(FakeStructured(0, 0)).generate_chapter_plans(Novel(title="T", idea="I"))
+
+    assert len(chapters) == 10
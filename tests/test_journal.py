@@ -0,0 +1,80 @@
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+
+import src.journal
+from src.journal import NovelJournal
+from src.novel import Chapter, Novel
+
+def _lines(path):
+    return path.read_text(encoding="utf-8").splitlines()
+
+def test_round_trip(workdir, novel):
+    path = NovelJournal.for_novel(novel).checkpoint(novel)
+
+    assert asdict(Novel.load(path)) == asdict(novel)
+
+def test_checkpoints_append_only_what_changed(workdir, novel):
+    journal = NovelJournal.for_novel(novel)
+    path = journal.checkpoint(novel)
+    assert len(_lines(journal.path)) == 1
+
+    journal.checkpoint(novel)
+    assert len(_lines(journal.path)) == 1
+
+    novel.chapters[2].content = "Sand, and then rock."
+    novel.chapters[2].status = "writing"
+    journal.checkpoint(novel)
+    assert len(_lines(journal.path)) == 2
+
+    assert asdict(Novel.load(path)) == asdict(novel)
+
+def test_reloaded_journal_keeps_appending(workdir, novel):
+    path = NovelJournal.for_novel(novel).checkpoint(novel)
+    loaded = Novel.load(path)
+    loaded.chapters.append(Chapter(number=4, title="The Return", content="Home.", status="completed"))
+    loaded.status = "reviewing"
+
+    assert loaded.save() == path
+    assert asdict(Novel.load(path)) == asdict(loaded)
+
+def test_torn_final_record_is_dropped(workdir, novel):
+    journal = NovelJournal.for_novel(novel)
+    path = journal.checkpoint(novel)
+    intact = journal.path.stat().st_size
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"op": "set", "key": "status", "val')
+
+    loaded = Novel.load(path)
+
+    assert loaded.status == "writing"
+    assert journal.path.stat().st_size == intact
+
+def test_compaction_keeps_the_novel(workdir, novel, monkeypatch):
+    monkeypatch.setattr(src.journal, "JOURNAL_COMPACT_RECORDS", 3)
+    journal = NovelJournal.for_novel(novel)
+    path = journal.checkpoint(novel)
+    for i in range(5):
+        novel.chapters[2].content = f"Draft {i}"
+        journal.checkpoint(novel)
+
+    assert len(_lines(journal.path)) < 5
+    assert asdict(Novel.load(path)) == asdict(novel)
+
+def test_a_second_novel_with_the_same_title_gets_its_own_journal(workdir, novel):
+    first = NovelJournal.for_novel(novel).checkpoint(novel)
+    other = Novel(title=novel.title, idea="A different idea")
+
+    second = NovelJournal.for_novel(other).checkpoint(other)
+
+    assert second != first
+    assert Novel.load(first).idea == novel.idea
+    assert Novel.load(second).idea == "A different idea"
+
+def test_first_save_never_replaces_an_existing_journal(workdir, novel):
+    path = NovelJournal.for_novel(novel).checkpoint(novel)
+    stranger = NovelJournal(Path(path))
+
+    with pytest.raises(FileExistsError):
+        stranger.checkpoint(Novel(title=novel.title, idea="Another"))
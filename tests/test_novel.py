@@ -0,0 +1,42 @@
+import pickle
+
+import pytest
+
+import src.novel
+from src.novel import Chapter, ChapterPlan, Novel
+
+def _baseline_pickle(path):
+    """Write a pickle like the original code did, from before Novel.acts and Chapter.summary existed"""
+    chapter = Chapter.__new__(Chapter)
+    chapter.__dict__.update(number=1, title="One", plan=ChapterPlan(title="One", summary="It begins"),
+                            content="Chapter one.", status="completed")
+    novel = Novel.__new__(Novel)
+    novel.__dict__.update(title="Legacy Novel", idea="An old idea", style_guide=None, world_lore=None, plot=None,
+                          characters={}, chapters=[chapter], status="writing")
+    path.write_bytes(pickle.dumps(novel))
+    assert b"acts" not in path.read_bytes()
+
+def test_baseline_pickle_loads_with_defaults(workdir):
+    path = workdir / "output" / "saves" / "Legacy_Novel_20240101_000000.pkl"
+    _baseline_pickle(path)
+
+    novel = Novel.load(str(path))
+
+    assert novel.acts == []
+    assert novel.story_digest == "" and novel.digest_through == 0
+    assert novel.chapters[0].summary == ""
+    assert '"acts": []' in novel.to_json()
+
+@pytest.mark.parametrize("save_format", ["journal", "archive", "snapshot", "pickle"])
+def test_baseline_pickle_saves_and_reloads(workdir, monkeypatch, save_format):
+    monkeypatch.setattr(src.novel, "SAVE_FORMAT", save_format)
+    path = workdir / "output" / "saves" / "Legacy_Novel_20240101_000000.pkl"
+    _baseline_pickle(path)
+
+    novel = Novel.load(str(path))
+    novel.chapters.append(Chapter(number=2, title="Two", content="Chapter two.", status="completed"))
+    reloaded = Novel.load(novel.save())
+
+    assert reloaded.title == "Legacy Novel"
+    assert reloaded.acts == []
+    assert [chapter.content for chapter in reloaded.chapters] == ["Chapter one.", "Chapter two."]
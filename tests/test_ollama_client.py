@@ -0,0 +1,71 @@
+import pytest
+import requests
+
+from src.host_pool import HostPool
+from src.ollama_client import OllamaClient
+
+class FakeSession:
+    """Answers every POST with the given status code"""
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.payloads = []
+
+    def post(self, url, json=None, stream=False, timeout=None):
+        self.payloads.append(json)
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.url = url
+        response._content = b'{"response": "ok", "done": true}'
+        response._content_consumed = True
+        return response
+
+    def close(self):
+        pass
+
+def _pooled_client(status_code, eject_failures=2):
+    pool = HostPool(["http://host-a:11434"], eject_failures=eject_failures)
+    client = OllamaClient(model="test", session=FakeSession(status_code), host_pool=pool, max_retries=0)
+    return client, pool.hosts[0]
+
+def test_client_errors_do_not_count_against_the_host():
+    client, host = _pooled_client(404)
+
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client._post("/api/generate", {"model": "missing-model"})
+
+    assert host.failures == 0
+    assert host.available(float("inf")) and host.ejected_until == 0.0
+    assert "missing-model" not in host.loaded_models
+    assert host.breaker.state == "closed"
+    assert host.outstanding == 0
+
+def test_server_errors_eject_the_host():
+    client, host = _pooled_client(503)
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client._post("/api/generate", {"model": "test"})
+
+    assert host.failures == 2
+    assert host.ejected_until > 0
+
+def test_served_requests_mark_the_model_loaded():
+    client, host = _pooled_client(200)
+
+    client._post("/api/generate", {"model": "test"})
+
+    assert "test" in host.loaded_models
+    assert host.outstanding == 0
+
+@pytest.mark.parametrize("method, first_argument", [("generate", "Say hi"), ("chat", [{"role": "user", "content": "Hi"}])])
+def test_streamed_calls_keep_the_response_format(method, first_argument):
+    session = FakeSession(200)
+    client = OllamaClient(model="test", session=session)
+    tokens = []
+
+    getattr(client, method)(first_argument, on_token=tokens.append, response_format="json")
+
+    assert session.payloads[0]["stream"] is True
+    assert session.payloads[0]["format"] == "json"
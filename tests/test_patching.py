@@ -0,0 +1,49 @@
+import pytest
+
+from src.patching import TextEdit, apply_edits, parse_edits
+
+TEXT = "Mara crossed the dunes at dawn.\nShe said, “We’re close now” — and kept walking."
+
+def test_exact_edit_is_applied():
+    result = apply_edits(TEXT, [TextEdit("at dawn", "at dusk")])
+
+    assert result.text.startswith("Mara crossed the dunes at dusk.")
+    assert (result.applied, result.fuzzy, result.failed) == (1, 0, [])
+
+def test_whitespace_and_quote_style_are_ignored():
+    anchor = 'She said,  "We\'re close now" - and'
+
+    result = apply_edits(TEXT, [TextEdit(anchor, "She whispered, and")])
+
+    assert result.text.endswith("\nShe whispered, and kept walking.")
+    assert (result.applied, result.fuzzy) == (1, 1)
+
+def test_misquoted_anchor_is_matched_fuzzily():
+    result = apply_edits(TEXT, [TextEdit("Mara crosed the dune at dawn.", "Mara waited.")], min_ratio=0.8)
+
+    assert result.text.startswith("Mara waited.\nShe said")
+    assert (result.applied, result.fuzzy) == (1, 1)
+
+def test_unmatched_edit_fails_and_leaves_text_alone():
+    edit = TextEdit("The city burned behind them.", "Nothing.")
+
+    result = apply_edits(TEXT, [edit, TextEdit("at dawn", "at dusk")], min_ratio=0.8)
+
+    assert result.failed == [edit]
+    assert result.applied == 1 and result.total == 2
+    assert "Nothing." not in result.text
+
+def test_edits_apply_in_order_against_the_edited_text():
+    result = apply_edits(TEXT, [TextEdit("at dawn", "at noon"), TextEdit("at noon", "at dusk")])
+
+    assert "at dusk" in result.text and result.applied == 2
+
+def test_parse_edits_drops_blank_anchors():
+    edits = parse_edits('{"edits": [{"find": "at dawn", "replace": "at dusk"}, {"find": "  ", "replace": "x"}]}')
+
+    assert edits == [TextEdit("at dawn", "at dusk")]
+
+@pytest.mark.parametrize("reply", ['{"edits": "none"}', '{"edits": [{"find": "at dawn"}]}', '{"edits": [3]}'])
+def test_parse_edits_rejects_malformed_scripts(reply):
+    with pytest.raises(ValueError):
+        parse_edits(reply)
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+
+import pytest
+
+from src.response_cache import ResponseCache
+
+def _cache(tmp_path, max_bytes=1000):
+    return ResponseCache(tmp_path / "cache", max_bytes=max_bytes, policy="always")
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = _cache(tmp_path, max_bytes=25)
+    cache.put("a", "x" * 10)
+    cache.put("b", "y" * 10)
+    assert cache.get("a") == "x" * 10  # Now "b" is the least recently used
+
+    cache.put("c", "z" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10 and cache.get("c") == "z" * 10
+    assert cache.stats["evictions"] == 1
+    assert not (cache.cache_dir / "b.txt").exists()
+
+def test_new_instance_rebuilds_lru_order_from_disk(tmp_path):
+    cache = _cache(tmp_path, max_bytes=25)
+    cache.put("a", "x" * 10)
+    cache.put("b", "y" * 10)
+    os.utime(cache.cache_dir / "a.txt", (time.time() + 10, time.time() + 10))
+
+    reopened = _cache(tmp_path, max_bytes=25)
+    reopened.put("c", "z" * 10)
+
+    assert reopened.get("b") is None and reopened.get("a") == "x" * 10
+
+def test_concurrent_identical_requests_compute_once(tmp_path):
+    cache = _cache(tmp_path)
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    deadline = time.time() + 5
+    while cache.stats["coalesced"] < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["answer"] * 4
+    assert len(calls) == 1 and cache.stats["coalesced"] == 3
+    assert cache.get("k") == "answer"
+
+def test_failed_compute_is_raised_and_not_cached(tmp_path):
+    cache = _cache(tmp_path)
+
+    def compute():
+        raise RuntimeError("host down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("k", compute)
+
+    assert cache.get_or_compute("k", lambda: "answer") == "answer"
+
+def test_only_completed_streams_are_recorded(tmp_path):
+    cache = _cache(tmp_path)
+
+    def broken_stream():
+        yield "Once "
+        raise ConnectionError("dropped")
+
+    with pytest.raises(ConnectionError):
+        list(cache.replay_or_record("k", broken_stream))
+    assert cache.get("k") is None
+
+    assert list(cache.replay_or_record("k", lambda: iter(["Once ", "upon"]))) == ["Once ", "upon"]
+    assert list(cache.replay_or_record("k", lambda: pytest.fail("stream reopened"))) == ["Once upon"]
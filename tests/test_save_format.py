@@ -0,0 +1,55 @@
+import json
+import pickle
+import zipfile
+from dataclasses import asdict
+
+import pytest
+
+from src.save_format import HEADER_ENTRY, read_archive, read_archive_header, write_archive
+
+def test_archive_round_trip(workdir, novel):
+    path = workdir / "novel.novel"
+    write_archive(novel, path)
+
+    assert asdict(read_archive(path)) == asdict(novel)
+
+def test_archive_chapters_load_on_first_access(workdir, novel):
+    path = workdir / "novel.novel"
+    write_archive(novel, path)
+
+    loaded = read_archive(path)
+
+    assert "content" not in loaded.chapters[0].__dict__
+    assert loaded.chapters[0].content == novel.chapters[0].content
+    assert "content" in loaded.chapters[0].__dict__
+
+def test_archive_header_has_metadata(workdir, novel):
+    path = workdir / "novel.novel"
+    write_archive(novel, path)
+
+    metadata = read_archive_header(path)["metadata"]
+
+    assert metadata["title"] == "Test Novel"
+    assert metadata["chapter_count"] == 3 and metadata["completed_chapters"] == 1
+    assert metadata["word_count"] == sum(len(chapter.content.split()) for chapter in novel.chapters)
+
+def test_newer_archive_version_is_refused(workdir, novel):
+    path = workdir / "novel.novel"
+    write_archive(novel, path)
+    with zipfile.ZipFile(path) as archive:
+        header = json.loads(archive.read(HEADER_ENTRY))
+    header["version"] += 1
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(HEADER_ENTRY, json.dumps(header))
+
+    with pytest.raises(ValueError, match="newer than supported"):
+        read_archive(path)
+
+def test_loaded_archive_can_be_pickled(workdir, novel):
+    path = workdir / "novel.novel"
+    write_archive(novel, path)
+    loaded = read_archive(path)
+
+    copy = pickle.loads(pickle.dumps(loaded))
+
+    assert [chapter.content for chapter in copy.chapters] == [chapter.content for chapter in novel.chapters]
@@ -0,0 +1,48 @@
+from dataclasses import asdict
+
+import pytest
+
+import src.snapshot_store
+from src.snapshot_store import SnapshotStore
+
+@pytest.fixture(autouse=True)
+def no_auto_prune(monkeypatch):
+    monkeypatch.setattr(src.snapshot_store, "SNAPSHOT_KEEP", 0)
+
+def _blobs(store):
+    return sorted(path.name for path in store.objects_dir.glob("*/*"))
+
+def test_snapshot_round_trip(workdir, novel):
+    store = SnapshotStore(workdir / "saves")
+
+    loaded = store.load(store.save(novel))
+
+    assert asdict(loaded) == asdict(novel)
+
+def test_unchanged_parts_are_stored_once(workdir, novel):
+    store = SnapshotStore(workdir / "saves")
+    store.save(novel)
+    blobs = _blobs(store)
+
+    store.save(novel)
+    assert _blobs(store) == blobs
+
+    novel.chapters[2].content = "Sand, and then rock."
+    store.save(novel)
+    assert len(_blobs(store)) == len(blobs) + 1  # Only the new body; the chapter record is unchanged
+
+def test_prune_collects_unreferenced_blobs(workdir, novel):
+    store = SnapshotStore(workdir / "saves")
+    store.save(novel)
+    novel.chapters[2].content = "Sand, and then rock."
+    latest = store.save(novel)
+
+    store.prune(novel.title, keep=1)
+
+    assert store.manifests() == [latest]
+    assert asdict(store.load(latest)) == asdict(novel)
+    referenced = set()
+    for ref in SnapshotStore.read_manifest(latest)["novel"]["chapters"]:
+        referenced.update((ref["blob"], ref["content"]))
+    assert referenced <= set(_blobs(store))
+    assert store.gc() == 0
@@ -0,0 +1,76 @@
+from src.chapter_writing import ChapterWritingStage
+from src.novel import Chapter, ChapterPlan, Novel
+from src.ollama_client import OllamaClient
+from src.story_memory import StoryMemory
+
+class FakeRouter:
+    """Drafts "Draft text", reviews it into "Revised text", and summarizes whichever version the prompt holds"""
+
+    def __init__(self):
+        self.calls = []
+
+    def stream_generate(self, call_type, prompt, **kwargs):
+        self.calls.append(call_type)
+        yield "Draft "
+        yield "text"
+
+    def generate(self, call_type, prompt, parse=None, **kwargs):
+        self.calls.append(call_type)
+        if call_type == "chapter_review":
+            return "Revised Content: Revised text"
+        if call_type == "chapter_summary":
+            return "Summary of the revised chapter" if "Revised text" in prompt else "Summary of the draft"
+        return "Digest"
+
+def _novel(chapters):
+    novel = Novel(title="T", idea="I")
+    novel.chapters = [Chapter(number=i, title=f"Chapter {i}", plan=ChapterPlan(title=f"Chapter {i}"))
+                      for i in range(1, chapters + 1)]
+    return novel
+
+def test_pipelined_review_replaces_draft_summaries():
+    stage = ChapterWritingStage(OllamaClient(model="test"), pipeline_depth=1, review_mode="rewrite", draft_mode="whole")
+    stage.router = stage.memory.router = FakeRouter()
+    novel = _novel(4)
+
+    stage.write_chapters(novel)
+
+    assert [chapter.content for chapter in novel.chapters] == ["Revised text"] * 4
+    assert [chapter.summary for chapter in novel.chapters] == ["Summary of the revised chapter"] * 4
+
+def _memory(budget_tokens):
+    memory = StoryMemory(OllamaClient(model="test"), budget_tokens=budget_tokens)
+    memory.router = FakeRouter()
+    return memory
+
+def _summarized(novel, memory, status="completed"):
+    for chapter in novel.chapters:
+        chapter.content, chapter.status = f"Text of chapter {chapter.number}", status
+        chapter.summary = "word " * 40
+        memory._sources[chapter.number] = chapter.content
+
+def test_unreviewed_and_stale_summaries_stay_out_of_the_digest():
+    memory = _memory(budget_tokens=60)
+    novel = _novel(4)
+    _summarized(novel, memory)
+    novel.chapters[1].status = "writing"
+
+    assert [chapter.number for chapter in memory._to_fold(novel)] == [1]
+
+    novel.chapters[1].status = "completed"
+    novel.chapters[0].content = "Revised after the summary was written"
+    assert not memory.is_current(novel.chapters[0])
+    assert memory._to_fold(novel) == []
+
+def test_digest_folded_by_another_compaction_is_discarded():
+    memory = _memory(budget_tokens=60)
+    novel = _novel(4)
+    _summarized(novel, memory)
+    to_fold = memory._to_fold(novel)
+
+    memory._compact(novel)
+    folded_through = novel.digest_through
+    memory._fold(novel, to_fold, "A stale digest")
+
+    assert folded_through >= to_fold[-1].number
+    assert novel.story_digest == "Digest"
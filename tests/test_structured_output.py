@@ -0,0 +1,84 @@
+from dataclasses import dataclass, field
+from typing import List
+
+from src.model_router import ValidationFailed
+from src.structured_output import StructuredGenerator
+
+@dataclass
+class Place:
+    name: str
+    population: int
+    landmarks: List[str] = field(default_factory=list)
+
+class FakeRouter:
+    """Replies with queued texts, parsing them the way the real router does"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    def generate(self, call_type, prompt, parse=None, response_format=None):
+        self.calls.append(response_format)
+        text = self.replies.pop(0)
+        try:
+            return parse(text)
+        except ValueError as e:
+            raise ValidationFailed(str(e), text)
+
+def test_valid_reply_needs_no_repair():
+    router = FakeRouter('{"name": "Qasr", "population": "1200", "landmarks": ["The well"]}')
+
+    place = StructuredGenerator(router).generate("place", "Describe a town", Place)
+
+    assert place == Place("Qasr", 1200, ["The well"])
+    assert len(router.calls) == 1
+
+def test_only_failed_fields_are_requested_again():
+    router = FakeRouter('{"name": "Qasr", "population": "many", "landmarks": ["The well"]}',
+                        '{"population": 1200}')
+
+    place = StructuredGenerator(router).generate("place", "Describe a town", Place)
+
+    assert place == Place("Qasr", 1200, ["The well"])
+    repair_schema = router.calls[1]
+    assert list(repair_schema["properties"]) == ["population"] and repair_schema["required"] == ["population"]
+
+def test_unparseable_reply_is_repaired_field_by_field():
+    router = FakeRouter("I cannot answer in JSON.", '{"name": "Qasr", "population": 5, "landmarks": []}')
+
+    place = StructuredGenerator(router).generate("place", "Describe a town", Place)
+
+    assert place == Place("Qasr", 5, [])
+    assert router.calls[1]["required"] == ["name", "population", "landmarks"]
+
+def test_fields_still_invalid_use_the_fallback():
+    router = FakeRouter('{"name": "Qasr", "landmarks": ["The well"]}', '{}', '{"population": null}')
+
+    place = StructuredGenerator(router, repair_attempts=2).generate(
+        "place", "Describe a town", Place, fallback={"population": 0})
+
+    assert place == Place("Qasr", 0, ["The well"])
+    assert len(router.calls) == 3
+
+def test_invalid_list_entries_are_dropped():
+    router = FakeRouter('{"name": "Qasr", "population": 5, "landmarks": ["The well", {"bad": 1}, " "]}')
+
+    place = StructuredGenerator(router).generate("place", "Describe a town", Place)
+
+    assert place.landmarks == ["The well"]
+    assert len(router.calls) == 1
+
+def test_mapping_fills_the_key_field_and_repairs_each_entry():
+    router = FakeRouter('{"Qasr": {"population": 5, "landmarks": []}, "Tal": {"population": "?", "landmarks": []}}',
+                        '{"population": 40}')
+
+    places = StructuredGenerator(router).generate_mapping("places", "Describe towns", Place, key_field="name")
+
+    assert places == {"Qasr": Place("Qasr", 5, []), "Tal": Place("Tal", 40, [])}
+
+def test_unstructured_mode_sends_no_schema():
+    router = FakeRouter('{"name": "Qasr", "population": 5, "landmarks": []}')
+
+    StructuredGenerator(router, structured=False).generate("place", "Describe a town", Place)
+
+    assert router.calls == [None]